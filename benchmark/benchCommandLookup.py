@@ -0,0 +1,60 @@
+import os,sys
+import time
+import argparse
+import importlib
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","source"))
+import Device
+import CommandTable
+
+def log(log_type="i",text=""):
+    source = "benchCommandLookup:"
+    if "i" in log_type:
+        print(source,"[INFO]     ",text)
+    elif "n" in log_type:
+        print("                    ",text)
+    elif "w" in log_type:
+        print(source,"[WARNING]  ",text)
+
+#Typical calls issued by sweep engine per bias point and readout parsing
+CMDS = [("SVOLT","100"),("VOLT?",""),("SCAUTORANGE?",""),("SSCRANGE","1e-6"),("SCRANGE?",""),
+        ("LIMSTAT","ON"),("SCURRLIM","1e-5"),("CURRLIM?",""),("CLRBUFF",""),("TRIGGERINIT","ON"),
+        ("READOUT?","1, 10, \"defbuffer1\", READ"),("TRIGGERINIT","OFF"),("TRIGGERABORT",""),("ZCHECK","OFF")]
+PARS = ["readoutIdentifier","readoutDelim","maxNSamples","triggerType","minV","readTimeout"]
+
+def timeCalls(routine,nRepeat):
+    ##############################################
+    #Return time per call in microseconds
+    ##############################################
+    start = time.perf_counter()
+    for irep in range(nRepeat):
+        routine()
+    return (time.perf_counter()-start)/nRepeat*1e6
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dev', dest='dev', help='Device class to benchmark.', default="NEWKEITHLEY" )
+    parser.add_argument('--repeat', dest='nRepeat', help='Number of repetitions.', type=int, default=20000 )
+    parser.add_argument('--logname', dest='logname', help='Log file name.', default="benchCommandLookup.log" )
+    args = parser.parse_args()
+    args.verbosity = 0
+
+    driver = getattr(importlib.import_module(args.dev),args.dev)()
+    start = time.perf_counter()
+    table = CommandTable.CommandTable(driver)
+    log("i","Compiled "+args.dev+" tables in "+"{:.3f}".format((time.perf_counter()-start)*1e3)+" ms ("+str(len(table.cmds))+" commands, "+str(len(table.pars))+" parameters).")
+
+    dev = Device.Device(args)
+    dev.devs[args.dev] = driver
+    com = {'id' : args.dev, 'com' : None}
+    cmdCalls = lambda: [dev.__cmd__(com,cmd_type,arg=arg) for cmd_type,arg in CMDS]
+    parCalls = lambda: [dev.__par__(com,par_type) for par_type in PARS]
+
+    results = {}
+    for name,lookup in [("driver",driver),("compiled",table)]:
+        #driver itself provides the same cmd/par interface as compiled table
+        dev.tables[args.dev] = lookup
+        results[name] = (timeCalls(cmdCalls,args.nRepeat)/len(CMDS),timeCalls(parCalls,args.nRepeat)/len(PARS))
+        log("n",name.ljust(9)+": __cmd__ "+"{:.2f}".format(results[name][0])+" us/call, __par__ "+"{:.2f}".format(results[name][1])+" us/call")
+    log("i","Speed-up: __cmd__ "+"{:.1f}".format(results["driver"][0]/results["compiled"][0])+"x, __par__ "+"{:.1f}".format(results["driver"][1]/results["compiled"][1])+"x")
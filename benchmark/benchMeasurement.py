@@ -0,0 +1,328 @@
+import os,sys
+import time
+import json
+import argparse
+import tempfile
+import threading
+import functools
+import subprocess
+import collections
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","source"))
+import Simulator
+import SerialConnector
+import SocketConnector
+import Device
+
+def log(log_type="i",text=""):
+    source = "benchMeasurement:"
+    if "i" in log_type:
+        print(source,"[INFO]     ",text)
+    elif "n" in log_type:
+        print("                  ",text)
+    elif "w" in log_type:
+        print(source,"[WARNING]  ",text)
+
+#Routines timed as phases (owner, routine, phase). Times are exclusive,
+#nested phases are subtracted, so phases of main thread sum to wall time.
+PHASES = [(SerialConnector.SerialConnector,"connect_RS232","discovery"),
+          (SocketConnector.SocketConnector,"gateway","discovery"),
+          (Device.Device,"load","load"),
+          (Device.Device,"load_serial","load"),
+          (Device.Device,"load_socket","load"),
+          (Device.Device,"__initDevice__","initDevice"),
+          (Device.Device,"__prepMeasurement__","prepMeasurement"),
+          (Device.Device,"__prepMeasurementExternal__","prepMeasurement"),
+          (Device.Device,"singleIV","biasSetup"),
+          (Device.Device,"continuousIV","biasSetup"),
+          (Device.Device,"multiIV","biasSetup"),
+          (Device.Device,"standbyIV","biasSetup"),
+          (Device.Device,"contENV","enviro"),
+          (Device.Device,"__enviroPoint__","enviro"),
+          (Device.Device,"__readEnviro__","enviro"),
+          (Device.Device,"__waitCharging__","charging"),
+          (Device.Device,"__waitBuffer__","bufferWait"),
+          (Device.Device,"__readBuffer__","readout"),
+          (Device.Device,"__processReadout__","parse"),
+          (Device.Device,"__parseReadout__","parse"),
+          (Device.Device,"__waitMotion__","motion"),
+          (Device.Device,"__terminate__","finalize"),
+          (Device.Device,"finalize","finalize")]
+
+#Driver routines exchanging data with instrument
+DRIVERS = ["NEWKEITHLEY","KEITHLEY","NHQ201","ESP100","EnvServ","ServerEnvServ"]
+IO_ROUTINES = ["read","write","readBuffer","readBatch","writeBatch","waitBuffer"]
+
+class Profiler():
+    def __init__(self):
+        ###########################################################
+        #Phase times, sleep time and driver I/O time. Sleeps done
+        #by simulator itself emulate blocking I/O and are counted
+        #as I/O, not as sleep.
+        ###########################################################
+        self.main = threading.main_thread()
+        self.local = threading.local()
+        self.patched = []
+        self.realSleep = time.sleep
+        self.reset()
+
+    def reset(self):
+        self.phases = collections.defaultdict(lambda: {'calls' : 0, 'time' : 0., 'self' : 0.})
+        self.devices = collections.defaultdict(lambda: {'roundTrips' : 0, 'io' : 0., 'sleep' : 0.})
+        self.sleep = {'main' : 0., 'background' : 0.}
+        self.io = {'main' : 0., 'background' : 0.}
+
+    def __state__(self):
+        if not hasattr(self.local,'stack'):
+            self.local.stack = []
+            self.local.sleep = 0.
+            self.local.depth = 0
+        return self.local
+
+    def patch(self,owner,name,wrapper):
+        routine = getattr(owner,name)
+        setattr(owner,name,functools.wraps(routine)(wrapper(routine)))
+        self.patched.append((owner,name,routine))
+
+    def restore(self):
+        for owner,name,routine in reversed(self.patched):
+            setattr(owner,name,routine)
+        self.patched = []
+        time.sleep = self.realSleep
+
+    def wrapPhase(self,owner,name,phase):
+        profiler = self
+        def wrapper(routine):
+            def timed(*args,**kwargs):
+                if threading.current_thread() is not profiler.main:
+                    return routine(*args,**kwargs)
+                stack = profiler.__state__().stack
+                stack.append(0.)
+                start = time.perf_counter()
+                try:
+                    return routine(*args,**kwargs)
+                finally:
+                    elapsed = time.perf_counter()-start
+                    child = stack.pop()
+                    entry = profiler.phases[phase]
+                    entry['calls'] += 1
+                    entry['time']  += elapsed
+                    entry['self']  += elapsed-child
+                    if len(stack) != 0:
+                        stack[-1] += elapsed
+            return timed
+        if hasattr(owner,name):
+            self.patch(owner,name,wrapper)
+
+    def wrapIO(self,owner,name,dev_id):
+        profiler = self
+        def wrapper(routine):
+            def timed(*args,**kwargs):
+                state = profiler.__state__()
+                state.depth += 1
+                sleep = state.sleep
+                start = time.perf_counter()
+                try:
+                    return routine(*args,**kwargs)
+                finally:
+                    state.depth -= 1
+                    if state.depth == 0:
+                        #only outermost call is a round trip
+                        elapsed = time.perf_counter()-start
+                        slept = state.sleep-sleep
+                        entry = profiler.devices[dev_id]
+                        entry['roundTrips'] += 1
+                        entry['io']    += elapsed-slept
+                        entry['sleep'] += slept
+                        profiler.io['main' if threading.current_thread() is profiler.main else 'background'] += elapsed-slept
+            return timed
+        if hasattr(owner,name):
+            self.patch(owner,name,wrapper)
+
+    def wrapSleep(self):
+        profiler = self
+        def sleep(seconds):
+            if sys._getframe(1).f_globals.get('__name__') == "Simulator":
+                return profiler.realSleep(seconds)
+            start = time.perf_counter()
+            try:
+                return profiler.realSleep(seconds)
+            finally:
+                elapsed = time.perf_counter()-start
+                profiler.__state__().sleep += elapsed
+                profiler.sleep['main' if threading.current_thread() is profiler.main else 'background'] += elapsed
+        time.sleep = sleep
+
+    def install(self):
+        for owner,name,phase in PHASES:
+            self.wrapPhase(owner,name,phase)
+        for dev_id in DRIVERS:
+            try:
+                driver = getattr(__import__(dev_id),dev_id)
+            except (ImportError,AttributeError):
+                continue
+            for name in IO_ROUTINES:
+                self.wrapIO(driver,name,dev_id)
+        self.wrapSleep()
+
+def makeArgs(options,scenario):
+    ##############################################
+    #Arguments as prepared by mkMeasure
+    ##############################################
+    addPort = []
+    if options.probe:
+        addPort.append('probe')
+    if options.zstation and scenario != "contENV":
+        addPort.append('zstation')
+    if options.extVSource and scenario != "contENV":
+        addPort.append('source')
+    return argparse.Namespace(logname=options.logname,verbosity=options.verbosity,debug=False,simulate=options.simConfig,
+                              selectPort=False,extVSource=options.extVSource and scenario != "contENV",addPort=addPort,addSocket=[],
+                              isEnviroOnly=(scenario == "contENV"),isStandByZOnly=False,probeFast=False,
+                              autoRange=False,autoSensing=False,expOhm=[1e9],isDB=False,
+                              outputDir=options.outputDir,outputFile=scenario,outTXT=True,outJSON=True,outCSV=True,
+                              outXML=False,outROOT=False,outPNG=False,outPDF=False)
+
+def measure(dev,options,scenario):
+    ##############################################
+    #Run scenario the way mkMeasure does, return
+    #results in OutputHandler format
+    ##############################################
+    bias = options.bias
+    biasRange = [bias*(istep+1)/options.nBias for istep in range(options.nBias)]
+    if scenario == "singleIV":
+        current,_bias,enviro = dev.singleIV(biasPoint=bias,sampleTime=options.sampleTime,nSamples=options.nSamples,isLast=True,isFirst=True)
+        return { 'type' : scenario, 'data' : [(current,_bias)], 'enviro' : [enviro], 'stats' : [dev.lastStats] }
+    elif scenario == "continuousIV":
+        results = dev.continuousIV(biasRange=biasRange,sampleTime=[options.sampleTime],nSamples=[options.nSamples],isLast=True,isFirst=True)
+        results['type'] = "contIV"
+        return results
+    elif scenario == "multiIV":
+        results = dev.multiIV(biasRange=biasRange,sampleTime=[options.sampleTime],nSamples=[options.nSamples],isLast=True,isFirst=True)
+        results['type'] = scenario
+        return results
+    elif scenario == "standbyIV":
+        results = dev.standbyIV(biasPoint=bias,sampleTime=options.sampleTime,nSamples=options.nSamples,waitingTime=0,isLast=True,isFirst=True)
+        results['type'] = "contIV"
+        return results
+    elif scenario == "contENV":
+        return { 'type' : scenario, 'data' : [], 'enviro' : dev.contENV("all",options.timeStep,options.nBias,isLast=True,isFirst=True) }
+
+def run(profiler,options,scenario):
+    ##############################################
+    #Single scenario against fresh simulator
+    ##############################################
+    Simulator.reset()
+    profiler.reset()
+    args = makeArgs(options,scenario)
+    report = { 'scenario' : scenario, 'completed' : False }
+    start = time.perf_counter()
+    try:
+        connectorSerial = SerialConnector.SerialConnector(args)
+        connectorSocket = SocketConnector.SocketConnector(args)
+        dev = Device.Device(args)
+        COMS = connectorSerial.connect_RS232()
+        SOCKETS = connectorSocket.gateway()
+        if args.isEnviroOnly:
+            dev.load_serial(COMS,False)
+        else:
+            dev.load(COMS,SOCKETS,False)
+        results = measure(dev,options,scenario)
+        dev.finalize()
+        report['nPoints'] = max(len(results['data']),len(results['enviro']))
+        report['output'] = output(profiler,args,results)
+        report['completed'] = True
+    except SystemExit:
+        log("w","Scenario "+scenario+" exited early (see "+options.logname+").")
+    wall = time.perf_counter()-start
+
+    phases = { phase : { key : (round(value,6) if isinstance(value,float) else value) for key,value in entry.items() } for phase,entry in profiler.phases.items() }
+    unaccounted = wall-sum([entry['self'] for entry in profiler.phases.values()])
+    phases['other'] = { 'calls' : 0, 'time' : round(unaccounted,6), 'self' : round(unaccounted,6) }
+    wire = Simulator.statistics()
+    devices = {}
+    for dev_id,entry in profiler.devices.items():
+        devices[dev_id] = { 'roundTrips' : entry['roundTrips'], 'io' : round(entry['io'],6), 'sleep' : round(entry['sleep'],6) }
+        devices[dev_id].update({ 'wire'+key.capitalize() : value for key,value in wire.get(dev_id,{}).items() })
+    report.update({ 'wall' : round(wall,6),
+                    'phases' : phases,
+                    'perBias' : round(phases.get('biasSetup',{'self':0.})['self']/max(report.get('nPoints',1),1),6),
+                    'sleep' : { key : round(value,6) for key,value in profiler.sleep.items() },
+                    'io' : { key : round(value,6) for key,value in profiler.io.items() },
+                    'compute' : round(wall-profiler.sleep['main']-profiler.io['main'],6),
+                    'devices' : devices })
+    return report
+
+def output(profiler,args,results):
+    ##############################################
+    #Output phase (needs full output dependencies)
+    ##############################################
+    try:
+        import OutputHandler
+    except ImportError as e:
+        log("w","Output phase skipped: "+str(e))
+        return False
+    start = time.perf_counter()
+    outputHandler = OutputHandler.OutputHandler(args)
+    outputHandler.load(0,results)
+    outputHandler.save()
+    elapsed = time.perf_counter()-start
+    entry = profiler.phases['output']
+    entry['calls'] += 1
+    entry['time']  += elapsed
+    entry['self']  += elapsed
+    return True
+
+def gitCommit():
+    try:
+        return subprocess.check_output(["git","rev-parse","--short","HEAD"],cwd=os.path.dirname(os.path.abspath(__file__)),stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scenarios', dest='scenarios', nargs='+', help='Measurements to run.', default=["singleIV","continuousIV","multiIV","contENV","standbyIV"],
+                        choices=["singleIV","continuousIV","multiIV","contENV","standbyIV"] )
+    parser.add_argument('--bias', dest='bias', help='(Last) bias point [V].', type=float, default=100. )
+    parser.add_argument('--nBias', dest='nBias', help='Number of bias points (enviro samples for contENV).', type=int, default=5 )
+    parser.add_argument('--sampleTime', dest='sampleTime', help='Sample time per reading.', type=float, default=0.5 )
+    parser.add_argument('--nSamples', dest='nSamples', help='Number of readings per bias point.', type=int, default=10 )
+    parser.add_argument('--timeStep', dest='timeStep', help='Time step of contENV [s].', type=float, default=1. )
+    parser.add_argument('--zstation', dest='zstation', help='Use simulated z-station.', action='store_true', default=False )
+    parser.add_argument('--velocityScale', dest='velocityScale', help='Speed-up of simulated z-station (at 1.0 full top-to-bottom return exceeds 21s motion limit).', type=float, default=1.5 )
+    parser.add_argument('--noProbe', dest='probe', help='Do not use simulated enviro probe.', action='store_false', default=True )
+    parser.add_argument('--extVSource', dest='extVSource', help='Use simulated NHQ201 as VSource.', action='store_true', default=False )
+    parser.add_argument('--simConfig', dest='simConfig', help='JSON file overriding simulator settings.', default="" )
+    parser.add_argument('--out', dest='out', help='JSON report file.', default="benchMeasurement.json" )
+    parser.add_argument('--outputDir', dest='outputDir', help='Directory for measurement output files.', default=None )
+    parser.add_argument('--logname', dest='logname', help='Log file name.', default="benchMeasurement.log" )
+    parser.add_argument('-v', '--verbosity', action="count", help="Verbosity of measurement.", default=0 )
+    options = parser.parse_args()
+    if options.outputDir is None:
+        options.outputDir = os.path.join(tempfile.mkdtemp(),"results")
+    Simulator.configure(velocityScale=options.velocityScale)
+
+    profiler = Profiler()
+    profiler.install()
+    reports = []
+    try:
+        for scenario in options.scenarios:
+            log("i","Running "+scenario+" against simulated instruments.")
+            reports.append(run(profiler,options,scenario))
+    finally:
+        profiler.restore()
+
+    summary = { 'commit' : gitCommit(), 'timestamp' : time.strftime("%Y-%m-%dT%H:%M:%S"), 'options' : vars(options),
+                'simulator' : Simulator.settings, 'scenarios' : reports }
+    with open(options.out,"w") as f:
+        json.dump(summary,f,indent=1)
+
+    for report in reports:
+        log("i",report['scenario']+": "+"{:.2f}".format(report['wall'])+" s wall, "+"{:.2f}".format(report['sleep']['main'])+" s sleep, "
+                +"{:.2f}".format(report['io']['main'])+" s I/O, "+"{:.2f}".format(report["compute"])+" s CPU/blocked"+("" if report['completed'] else " (INCOMPLETE)"))
+        for phase,entry in sorted(report['phases'].items(),key=lambda item: -item[1]['self']):
+            if entry['self'] > 0.0005:
+                log("n",phase.ljust(16)+"{:8.3f}".format(entry['self'])+" s  ("+str(entry['calls'])+" calls)")
+        log("n","round trips: "+", ".join([dev_id+"="+str(entry['roundTrips']) for dev_id,entry in report['devices'].items()]))
+    log("i","Report written to "+options.out)
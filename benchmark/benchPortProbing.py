@@ -0,0 +1,80 @@
+import os,sys
+import pty
+import tty
+import time
+import argparse
+import tempfile
+
+import serial
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","source"))
+import SerialConnector
+
+def log(log_type="i",text=""):
+    source = "benchPortProbing:"
+    if "i" in log_type:
+        print(source,"[INFO]     ",text)
+    elif "n" in log_type:
+        print("                  ",text)
+    elif "w" in log_type:
+        print(source,"[WARNING]  ",text)
+
+class SlowSerial(serial.Serial):
+    #####################################################
+    #Emulate slow open of real (or dead ttyS) port nodes,
+    #ports named ttyHANG* never answer
+    #####################################################
+    delay = 0.
+    def open(self):
+        time.sleep(3600. if "ttyHANG" in str(self.port) else SlowSerial.delay)
+        return super().open()
+
+def fakePorts(nGood,nDead,nHang=0):
+    ##############################################
+    #Pty-based working ports, dead port nodes and
+    #hanging port nodes (placed first)
+    ##############################################
+    ports = []
+    handles = []
+    deadDir = tempfile.mkdtemp()
+    ports += [os.path.join(deadDir,"ttyHANG"+str(iport)) for iport in range(nHang)]
+    for iport in range(max(nGood,nDead)):
+        if iport < nGood:
+            master,slave = pty.openpty()
+            tty.setraw(slave)
+            handles += [master,slave]
+            ports.append(os.ttyname(slave))
+        if iport < nDead:
+            ports.append(os.path.join(deadDir,"ttyS"+str(iport)))
+    return ports,handles
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--good', dest='nGood', help='Number of working fake ports.', type=int, default=4 )
+    parser.add_argument('--dead', dest='nDead', help='Number of dead port nodes.', type=int, default=32 )
+    parser.add_argument('--delay', dest='delay', help='Emulated open latency per port [s].', type=float, default=0.05 )
+    parser.add_argument('--hang', dest='nHang', help='Number of port nodes which never answer.', type=int, default=0 )
+    parser.add_argument('--workers', dest='workers', help='Number of probing threads.', type=int, default=16 )
+    parser.add_argument('--logname', dest='logname', help='Log file name.', default="benchPortProbing.log" )
+    args = parser.parse_args()
+    args.verbosity = 0
+
+    ports,handles = fakePorts(args.nGood,args.nDead,args.nHang)
+    SlowSerial.delay = args.delay
+    SerialConnector.serial.Serial = SlowSerial
+    connector = SerialConnector.SerialConnector(args)
+    log("i","Probing "+str(len(ports))+" ports ("+str(args.nGood)+" working, "+str(args.nHang)+" hanging), emulated open latency "+str(args.delay)+"s.")
+
+    results = {}
+    for name,workers in [("sequential",1),("parallel",args.workers)]:
+        start = time.perf_counter()
+        working_ports = connector.__probe_ports__(ports,timeout=max(1.,10*args.delay),workers=workers)
+        results[name] = (time.perf_counter()-start,working_ports)
+        log("n",name.ljust(10)+": "+"{:.3f}".format(results[name][0])+" s, "+str(len(working_ports))+" working ports")
+
+    if results["sequential"][1] != results["parallel"][1]:
+        log("w","Parallel probing returned different port list!")
+    log("i","Speed-up: "+"{:.1f}".format(results["sequential"][0]/results["parallel"][0])+"x")
+    for handle in handles:
+        os.close(handle)
@@ -0,0 +1,126 @@
+import os,sys
+import pty
+import tty
+import time
+import argparse
+import threading
+
+import serial
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","source"))
+from Transport import BufferedReader
+
+def log(log_type="i",text=""):
+    source = "benchSerialRead: "
+    if "i" in log_type:
+        print(source,"[INFO]     ",text)
+    elif "n" in log_type:
+        print("                  ",text)
+    elif "w" in log_type:
+        print(source,"[WARNING]  ",text)
+
+def _payload(nReadings):
+    ##############################################
+    #Fake READOUT? reply, KEITHLEY-like formatting
+    ##############################################
+    readings = ["+1.234567E-09NADC,+0000012.345secs,+00001RDNG#" for ireading in range(nReadings)]
+    return (",".join(readings)+"\r\n").encode()
+
+def _fill(master,payload,chunk=1024):
+    ##############################################
+    #Feed payload into pty from writer thread in
+    #chunks. Tty input queue holds only ~4 KB, so
+    #large dumps must be drained while written.
+    ##############################################
+    def write():
+        for ibyte in range(0,len(payload),chunk):
+            os.write(master,payload[ibyte:ibyte+chunk])
+    writer = threading.Thread(target=write,daemon=True)
+    writer.start()
+    return writer
+
+def legacyLoop(com,cmd,sleepTime,mediumSleepTime):
+    #Pre-series KEITHLEY.read (baseline): fixed sleeps around write, then drain
+    #byte by byte while inWaiting() reports data. Drain time returned separately.
+    time.sleep(sleepTime)
+    com.write((cmd+'\n').encode())
+    time.sleep(mediumSleepTime)
+    start = time.perf_counter()
+    read_value = ""
+    while com.inWaiting() > 0:
+        part = com.read(1).decode().strip('\r')
+        read_value += part
+    return read_value.rstrip(),time.perf_counter()-start
+
+def readLoop(com):
+    #Current implementation: one read(1) call per byte until terminator
+    read_value = ""
+    while True:
+        part = com.read(1)
+        if len(part) == 0 or part == b'\n':
+            break
+        read_value += part.decode().strip('\r')
+    return read_value.rstrip()
+
+def readBuffered(reader):
+    #Buffered implementation: bulk drain until terminator, decode once
+    return reader.readline(1.).decode().replace('\r','').rstrip()
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--readings', dest='nReadings', help='Number of readings in fake buffer dump.', type=int, default=200 )
+    parser.add_argument('--repeat', dest='nRepeat', help='Number of repetitions.', type=int, default=20 )
+    parser.add_argument('--legacyRepeat', dest='nLegacy', help='Number of repetitions of legacy loop (2 s of sleeps each).', type=int, default=3 )
+    parser.add_argument('--legacySleep', dest='legacySleep', help='Legacy sleep_time and medium_sleep_time of KEITHLEY driver [s].', type=float, nargs=2, default=[0.5,1.5] )
+    args = parser.parse_args()
+
+    #pseudo-terminal stand-in for serial device
+    master,slave = pty.openpty()
+    tty.setraw(slave)
+    com = serial.Serial(os.ttyname(slave),timeout=1)
+    reader = BufferedReader(com,'\n')
+    payload = _payload(args.nReadings)
+    log("i","Payload size: "+str(len(payload))+" bytes, repetitions: "+str(args.nRepeat))
+
+    results = {}
+    for name,routine in [("per-byte loop", lambda: readLoop(com)), ("BufferedReader", lambda: readBuffered(reader))]:
+        elapsed = 0.
+        reference = None
+        for irep in range(args.nRepeat):
+            writer = _fill(master,payload)
+            start = time.perf_counter()
+            value = routine()
+            elapsed += time.perf_counter()-start
+            writer.join()
+            if reference is None:
+                reference = value
+            elif value != reference:
+                log("w","Inconsistent reply for "+name)
+        results[name] = (elapsed/args.nRepeat,reference)
+
+    #legacy inWaiting() polling loop on the same feed
+    elapsed,drained,nTruncated = 0.,0.,0
+    for irep in range(args.nLegacy):
+        writer = _fill(master,payload)
+        start = time.perf_counter()
+        value,drain = legacyLoop(com,"TRAC:DATA? 1, "+str(args.nReadings)+", \"defbuffer1\", READ",*args.legacySleep)
+        elapsed += time.perf_counter()-start
+        drained += drain
+        writer.join()
+        com.reset_input_buffer()
+        os.read(master,1024) #command written by legacy loop
+        if value != results["BufferedReader"][1]:
+            nTruncated += 1
+    results["legacy polling"] = (elapsed/max(args.nLegacy,1),None)
+
+    if results["per-byte loop"][1] != results["BufferedReader"][1]:
+        log("w","Readers returned different replies!")
+    for name in results:
+        log("n",name.ljust(16)+": "+"{:.3f}".format(results[name][0]*1000.)+" ms per readout")
+    if args.nLegacy > 0:
+        log("n","".ljust(16)+"  (legacy drain only: "+"{:.3f}".format(drained/args.nLegacy*1000.)+" ms, incomplete replies: "+str(nTruncated)+"/"+str(args.nLegacy)+")")
+        log("i","Speed-up vs legacy polling: "+"{:.1f}".format(results["legacy polling"][0]/results["BufferedReader"][0])+"x (drain only: "+"{:.1f}".format(drained/args.nLegacy/results["BufferedReader"][0])+"x)")
+    log("i","Speed-up vs per-byte loop: "+"{:.1f}".format(results["per-byte loop"][0]/results["BufferedReader"][0])+"x")
+    com.close()
+    os.close(master)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+import os, sys
+import time
+
+class PollWait():
+    def __init__(self,countCmd,minInterval=0.1,maxInterval=2.0,factor=1.5):
+        ###########################################################
+        #Buffer-fill wait strategy polling number of readings in
+        #buffer with adaptive backoff. First poll is sent after the
+        #expected fill time. Next poll is scheduled from observed
+        #fill rate, otherwise interval grows from 'minInterval' by
+        #'factor' up to 'maxInterval'.
+        ###########################################################
+        self.countCmd = countCmd
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval
+        self.factor = factor
+
+    def count(self,query,timeout=None):
+        ##############################################
+        #Return number of readings in buffer or -1
+        ##############################################
+        try:
+            return int(float(str(query(self.countCmd,timeout)).strip()))
+        except ValueError:
+            return -1
+
+    def wait(self,query,nReadings,expected=0.,timeout=60.):
+        ###################################################
+        #Wait until buffer holds at least nReadings.
+        #query(cmd,timeout) returns raw device reply.
+        #Returns last number of readings seen (-1 unknown).
+        ###################################################
+        start = time.time()
+        if expected > 0:
+            time.sleep(min(expected,timeout))
+        interval = self.minInterval
+        nInBuffer = -1
+        while True:
+            nInBuffer = self.count(query)
+            if nInBuffer >= nReadings:
+                break
+            remaining = timeout-(time.time()-start)
+            if remaining <= 0:
+                break
+            elapsed = time.time()-start
+            if nInBuffer > 0 and elapsed > 0:
+                #expected time to missing readings from fill rate so far
+                toGo = (nReadings-nInBuffer)*elapsed/nInBuffer
+                time.sleep(min(max(toGo,self.minInterval),self.maxInterval,remaining))
+            else:
+                time.sleep(min(interval,remaining))
+                interval = min(interval*self.factor,self.maxInterval)
+        return nInBuffer
+
+class OPCWait(PollWait):
+    def __init__(self,countCmd,opcCmd="*OPC?",minInterval=0.1,maxInterval=2.0,factor=1.5):
+        ###########################################################
+        #Buffer-fill wait strategy for devices finishing trigger
+        #model on their own. Single operation-complete query blocks
+        #until pending operations are done, buffer count is then
+        #checked once. Falls back to polling if OPC query fails.
+        ###########################################################
+        PollWait.__init__(self,countCmd,minInterval,maxInterval,factor)
+        self.opcCmd = opcCmd
+
+    def wait(self,query,nReadings,expected=0.,timeout=60.):
+        ###################################################
+        #Wait for operation complete, then check buffer
+        ###################################################
+        start = time.time()
+        if str(query(self.opcCmd,timeout)).strip() == "1":
+            nInBuffer = self.count(query)
+            if nInBuffer >= nReadings:
+                return nInBuffer
+        remaining = max(timeout-(time.time()-start),0.)
+        return PollWait.wait(self,query,nReadings,0.,remaining)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+import os, sys
+import json
+import datetime as dt
+
+class ChargingModel():
+    def __init__(self,decay=0.8):
+        ###########################################################
+        #Persistent per-setup model of charging (settling) time.
+        #Settling times observed for bias steps are fitted with
+        #linear model t = offset + slope*|dV| per setup key
+        #(source, measurement device and DUT). Sums are weighted
+        #with exponential 'decay' per update, so the fit follows
+        #recent sweeps. Model is used to skip polling while
+        #charging is surely not finished.
+        #Updates are kept in memory (isDirty) until save().
+        ###########################################################
+        exe = sys.executable
+        exeDir = exe[:exe.rfind("/")]
+        self.cacheDir = exeDir[:exeDir.rfind("/")]+"/cache"
+        self.cacheFile = self.cacheDir+"/chargingModel.json"
+        self.decay = decay
+        self.models = {}
+        self.isDirty = False
+        self.load()
+
+    def load(self):
+        ##############################################
+        #Load models from disk, broken file is ignored
+        ##############################################
+        try:
+            with open(self.cacheFile,"r") as f:
+                self.models = json.load(f)
+        except (OSError,ValueError):
+            self.models = {}
+        return self.models
+
+    def save(self):
+        ##############################################
+        #Write models atomically
+        ##############################################
+        try:
+            if not os.path.isdir(self.cacheDir):
+                os.mkdir(self.cacheDir)
+            with open(self.cacheFile+".tmp","w") as f:
+                json.dump(self.models,f,indent=4)
+            os.replace(self.cacheFile+".tmp",self.cacheFile)
+            self.isDirty = False
+            return True
+        except OSError:
+            return False
+
+    def update(self,setup,delta,settleTime):
+        ###################################################
+        #Add observed settling time for bias step delta.
+        #Older observations are down-weighted by decay
+        #('n' is sum of weights, 'count' of observations).
+        ###################################################
+        if setup not in self.models:
+            self.models[setup] = { 'n' : 0., 'count' : 0, 'sx' : 0., 'sy' : 0., 'sxx' : 0., 'sxy' : 0. }
+        model = self.models[setup]
+        x = abs(float(delta))
+        y = float(settleTime)
+        for key in ['n','sx','sy','sxx','sxy']:
+            model[key] *= self.decay
+        model['count'] = model.get('count',int(model['n']))+1
+        model['n']   += 1.
+        model['sx']  += x
+        model['sy']  += y
+        model['sxx'] += x*x
+        model['sxy'] += x*y
+        model['date'] = dt.datetime.now().isoformat(timespec='seconds')
+        self.isDirty = True
+        return model
+
+    def predict(self,setup,delta,minPoints=3):
+        ###################################################
+        #Return predicted settling time for bias step delta
+        #or None if model is not trained yet
+        ###################################################
+        if setup not in self.models or self.models[setup].get('count',self.models[setup]['n']) < minPoints:
+            return None
+        model = self.models[setup]
+        n = float(model['n'])
+        det = n*model['sxx']-model['sx']**2
+        if abs(det) < 1e-12:
+            #all steps of same size
+            return max(model['sy']/n,0.)
+        slope = (n*model['sxy']-model['sx']*model['sy'])/det
+        offset = (model['sy']-slope*model['sx'])/n
+        return max(offset+slope*abs(float(delta)),0.)
@@ -1,6 +1,10 @@
 import os,sys
 import select
+import queue
+import atexit
+import threading
 import logging
+import logging.handlers
 
 class Colors:
     INFO    = '\033[39m'
@@ -28,6 +32,100 @@ class StreamToLogger(object):
    def flush(self):
     pass
 
+class SinkHandler(logging.Handler):
+    #########################################################################
+    #Handler run by background listener. Writes records to log file through
+    #one persistent handle and colored text to terminal. File is flushed
+    #whenever queue runs empty.
+    #########################################################################
+
+    def __init__(self, path, queue, terminal):
+        #file first: handler is registered for shutdown by Handler.__init__
+        self.filelog = open(path, "a")
+        logging.Handler.__init__(self)
+        self.queue = queue
+        self.terminal = terminal
+
+    def emit(self, record):
+        try:
+            flushed = getattr(record, 'flushed', None)
+            if flushed is None:
+                text = getattr(record, 'terminal', None)
+                if text is not None:
+                    print(text, file=self.terminal)
+                print(record.getMessage(), file=self.filelog)
+            if flushed is not None or self.queue.empty():
+                self.filelog.flush()
+                self.terminal.flush()
+            if flushed is not None:
+                flushed.set()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.filelog.close()
+        logging.Handler.close(self)
+
+class LogSink():
+    #########################################################################
+    #Process-wide sink of one log file. Records are put to queue and written
+    #by background listener, so logging does not block measurement loops.
+    #########################################################################
+
+    def __init__(self, path):
+        self.queue = queue.SimpleQueue()
+        handler = SinkHandler(path, self.queue, sys.stdout)
+        self.logger = logging.getLogger("mkMeasure:"+path)
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+        self.logger.addHandler(logging.handlers.QueueHandler(self.queue))
+        self.listener = logging.handlers.QueueListener(self.queue, handler)
+        self.listener.start()
+
+    def write(self, text, terminal=None, log_level=logging.INFO):
+        self.logger.log(log_level, "%s", text, extra={ 'terminal' : terminal })
+
+    def flush(self, timeout=5.):
+        ##############################################
+        #Wait until everything queued so far is written
+        ##############################################
+        flushed = threading.Event()
+        self.logger.log(logging.INFO, "", extra={ 'flushed' : flushed })
+        flushed.wait(timeout)
+
+    def stop(self):
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+#Log sinks shared by all ColorLogger instances (one per log file)
+sinks = {}
+sinksLock = threading.Lock()
+
+def sink(path):
+    ##############################################
+    #Return sink of given log file (created once).
+    #First sink also takes over stderr.
+    ##############################################
+    with sinksLock:
+        if path not in sinks:
+            sinks[path] = LogSink(path)
+            if len(sinks) == 1:
+                #to fully redirect stderr
+                sys.stderr = StreamToLogger(sinks[path].logger, logging.ERROR)
+        return sinks[path]
+
+@atexit.register
+def shutdown():
+    ##############################################
+    #Write out pending records before exit
+    ##############################################
+    with sinksLock:
+        for path in sinks:
+            sinks[path].stop()
+        sinks.clear()
+        sys.stderr = sys.__stderr__
+
 class ColorLogger(Colors):
     ############################################################
     #Print stdout and stderr to terminal and log file in color
@@ -40,61 +138,48 @@ class ColorLogger(Colors):
         exeDir = exe[:exe.rfind("/")]
         self.logDir = exeDir[:exeDir.rfind("/")]+"/logs" 
         if not os.path.isdir(self.logDir):
-            os.mkdir(self.logDir) 
-
-        #to fully redirect stderr
-        logging.basicConfig(
-            level=logging.DEBUG,
-            format='%(message)s',
-            filename=self.logDir+"/"+self.logname,
-            filemode='a'
-        )
-        stderr_logger = logging.getLogger('STDERR')
-        sl = StreamToLogger(stderr_logger, logging.ERROR)
-        sys.stderr = sl
+            os.makedirs(self.logDir,exist_ok=True)
+        self.sink = sink(self.logDir+"/"+self.logname)
+
+    def __write__(self,color,*text):
+        ##############################################
+        #Queue line for terminal (in color) and file
+        ##############################################
+        line = " ".join(str(part) for part in text)
+        self.sink.write(line," ".join([color,line,self.ENDC]))
 
     def log(self,log_type="i",text=""):
         try:
-            #to redirect stdout but preserving original stdout
-            self.filelog = open(self.logDir+"/"+self.logname, "a")
-
             if "i" in log_type:
-                print(self.INFO,self.source,"[INFO]     ",text,self.ENDC)
-                print(self.source,"[INFO]     ",text,file=self.filelog)
+                self.__write__(self.INFO,self.source,"[INFO]     ",text)
             elif "n" in log_type:
-                print(self.INFO,"                  ",text,self.ENDC)
-                print("                  ",text,file=self.filelog)
+                self.__write__(self.INFO,"                  ",text)
             elif "w" in log_type:
-                print(self.WARNING,self.source,"[WARNING]  ",text,self.ENDC)
-                print(self.source,"[WARNING]  ",text,file=self.filelog)
+                self.__write__(self.WARNING,self.source,"[WARNING]  ",text)
             elif "h" in log_type:
-                print(self.HAZARD,self.source,"[HAZARD]   ",text,self.ENDC)
-                print(self.source,"[HAZARD]   ",text,file=self.filelog)
+                self.__write__(self.HAZARD,self.source,"[HAZARD]   ",text)
             elif "e" in log_type:
-                print(self.ERROR,self.source,"[ERROR]    ",text,self.ENDC)
-                print(self.source,"[ERROR]    ",text,file=self.filelog)
+                self.__write__(self.ERROR,self.source,"[ERROR]    ",text)
             elif "f" in log_type:
-                print(self.FATAL,self.source,"[FATAL]    ",text,self.ENDC)
-                print(self.source,"[FATAL]    ",text,file=self.filelog)
+                self.__write__(self.FATAL,self.source,"[FATAL]    ",text)
             elif "t" in log_type and "tt" not in log_type:
-                print(self.INPUT,"<<     ",text,self.ENDC)
-                print("<<     ",text,file=self.filelog)
+                self.__write__(self.INPUT,"<<     ",text)
             elif "tt" in log_type and "ttt" not in log_type:
+                #pending lines must be shown before prompt
+                self.sink.flush()
                 _input = input(self.INPUT+text+"  >>"+self.ENDC)
-                print(text+"  >>",file=self.filelog)
-                print(str(_input),file=self.filelog)          
+                self.sink.write(text+"  >>")
+                self.sink.write(str(_input))
                 return _input
             elif "ttt" in log_type:
-                print(self.INPUT+text+"  >>"+self.ENDC)
-                print(text+"  >>",file=self.filelog)
+                self.sink.flush()
+                print(self.INPUT+text+"  >>"+self.ENDC,flush=True)
+                self.sink.write(text+"  >>")
                 _input,_output,_error = select.select( [sys.stdin], [], [], 5 )
                 if (_input): 
                     return sys.stdin.readline().strip()
                 else:
                     return ''               
- 
-            #apply changes to logfile
-            self.filelog.close()
 
         except KeyboardInterrupt:
             self.log(log_type,text)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+import os, sys
+
+class CommandTable():
+    def __init__(self,dev):
+        ###########################################################
+        #Flat lookup tables compiled once from device-specific
+        #'cmds' and 'pars' tables. Commands are keyed by
+        #(category, name, arg), set commands and get commands
+        #with argument (e.g. READOUT? range) by (category, name)
+        #prefix and parameters by name and alt-name. Results are
+        #taken from device class itself, so device-specific rules
+        #(e.g. 'children' commands) are preserved.
+        ###########################################################
+        self.dev = dev
+        self.cmds = {}
+        self.prefixes = {}
+        self.pars = {}
+        module = sys.modules[dev.__class__.__module__]
+        self.compile(getattr(module,"cmds",{}),getattr(module,"pars",{}))
+
+    def compile(self,cmds,pars):
+        ##############################################
+        #Build flat tables
+        ##############################################
+        mark = "\x00"
+        for cat in cmds:
+            for cmd_type in cmds[cat]:
+                if cat == "switch":
+                    for arg in ["ON","OFF"]:
+                        self.cmds[(cat,cmd_type,arg)] = self.dev.cmd(cmd_type,arg=arg,cat=cat)
+                else:
+                    if cat in ["set","get"]:
+                        #argument is appended to constant prefix (or ignored)
+                        (raw_cmd,isOK,isNOT) = self.dev.cmd(cmd_type,arg=mark,cat=cat)
+                        if raw_cmd.endswith(mark) and raw_cmd.count(mark) == 1:
+                            self.prefixes[(cat,cmd_type)] = (raw_cmd[:-1],isOK,isNOT)
+                        elif mark not in raw_cmd:
+                            self.prefixes[(cat,cmd_type)] = None
+                            self.cmds[(cat,cmd_type,None)] = (raw_cmd,isOK,isNOT)
+                    if cat != "set":
+                        self.cmds[(cat,cmd_type,"")] = self.dev.cmd(cmd_type,arg="",cat=cat)
+        for par_type in pars:
+            self.pars[par_type] = self.dev.par(par_type)
+            alt = pars[par_type].get('alt',"")
+            if len(alt) != 0:
+                self.pars[alt] = self.dev.par(alt)
+
+    def cmd(self,cmd_type,arg="",cat=""):
+        ###################################################
+        #Return (cmd,isOK,isNOT) as device class 'cmd' does
+        ###################################################
+        key = (cat,cmd_type,arg)
+        if key in self.cmds:
+            return self.cmds[key]
+        if (cat,cmd_type) in self.prefixes:
+            template = self.prefixes[(cat,cmd_type)]
+            if template is None:
+                return self.cmds[(cat,cmd_type,None)]
+            return (template[0]+str(arg),template[1],template[2])
+        return self.dev.cmd(cmd_type,arg=arg,cat=cat)
+
+    def par(self,par_type):
+        ##############################################
+        #Return parameter as device class 'par' does
+        ##############################################
+        if par_type in self.pars:
+            return self.pars[par_type]
+        return self.dev.par(par_type)
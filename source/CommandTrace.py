@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+import os, sys
+import json
+import threading
+import collections
+
+#Upper edges of latency histogram buckets in seconds
+buckets = [0.001,0.003,0.01,0.03,0.1,0.3,1.0]
+
+class CommandTrace():
+    def __init__(self,size=10000):
+        ###########################################################
+        #Per-command latency trace of instrument traffic. Every
+        #exchange passing Device.__read__/__write__ is recorded
+        #as single tuple in ring buffer of 'size' entries, so
+        #overhead and memory stay bounded for long measurements.
+        #Summary and Chrome-trace (Perfetto) JSON are produced
+        #from recorded entries on request.
+        ###########################################################
+        self.entries = collections.deque(maxlen=size)
+        self.lock = threading.Lock()
+        self.nRecorded = 0
+
+    def record(self,start,acquired,end,slept,dev_id,cmd_type,raw_cmd,op,result=None,error=None):
+        ###################################################
+        #Record single exchange. Times are absolute (start,
+        #lock acquired, end), 'slept' is time spent in
+        #driver sleeps. Bytes are payload estimates.
+        ###################################################
+        bytesOut = len(raw_cmd)+1 if op in ["write","read","readBuffer","writeBatch","readBatch"] else 0
+        if error is not None:
+            bytesIn = 0
+            reply = "ERROR: "+type(error).__name__
+        elif op == "write" or op == "writeBatch":
+            bytesIn = 0
+            reply = str(result)
+        elif hasattr(result,'nbytes'):
+            bytesIn = int(result.nbytes)
+            reply = "<"+str(len(result))+" values>"
+        elif isinstance(result,list):
+            bytesIn = sum(len(str(value))+1 for value in result)
+            reply = ";".join(str(value) for value in result)
+        else:
+            bytesIn = len(str(result))+1 if op != "waitBuffer" else 0
+            reply = str(result)
+        if len(reply) > 40:
+            reply = reply[:37]+"..."
+        with self.lock:
+            self.entries.append((start,end-start,acquired-start,slept,dev_id,cmd_type,raw_cmd,op,bytesOut,bytesIn,reply,threading.current_thread().name))
+            self.nRecorded += 1
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.entries)
+
+    def summary(self,top=10):
+        ###################################################
+        #Return summary lines: latency per device command
+        #(top-N by total time) and latency histogram
+        ###################################################
+        entries = self.snapshot()
+        if len(entries) == 0:
+            return ["No instrument traffic recorded."]
+        groups = {}
+        for entry in entries:
+            groups.setdefault((entry[4],entry[5]),[]).append(entry)
+        lines = []
+        lines.append("Command trace: "+str(len(entries))+" of "+str(self.nRecorded)+" exchanges kept.")
+        lines.append("  "+"device".ljust(12)+"command".ljust(16)+"count".rjust(6)+"total[s]".rjust(10)+"mean[ms]".rjust(10)+"p50[ms]".rjust(10)+"p95[ms]".rjust(10)+"max[ms]".rjust(10)+"sleep[s]".rjust(10)+"lock[s]".rjust(10)+"out[B]".rjust(9)+"in[B]".rjust(9))
+        ranked = sorted(groups.items(),key=lambda item: -sum(entry[1] for entry in item[1]))
+        for (dev_id,cmd_type),group in ranked[:top]:
+            elapsed = sorted(entry[1] for entry in group)
+            total = sum(elapsed)
+            lines.append("  "+str(dev_id).ljust(12)+str(cmd_type)[:15].ljust(16)+str(len(group)).rjust(6)
+                         +"{:.3f}".format(total).rjust(10)
+                         +"{:.2f}".format(total/len(group)*1e3).rjust(10)
+                         +"{:.2f}".format(percentile(elapsed,0.5)*1e3).rjust(10)
+                         +"{:.2f}".format(percentile(elapsed,0.95)*1e3).rjust(10)
+                         +"{:.2f}".format(elapsed[-1]*1e3).rjust(10)
+                         +"{:.3f}".format(sum(entry[3] for entry in group)).rjust(10)
+                         +"{:.3f}".format(sum(entry[2] for entry in group)).rjust(10)
+                         +str(sum(entry[8] for entry in group)).rjust(9)
+                         +str(sum(entry[9] for entry in group)).rjust(9))
+        if len(ranked) > top:
+            lines.append("  ... "+str(len(ranked)-top)+" more commands.")
+        counts = [0]*(len(buckets)+1)
+        for entry in entries:
+            ibucket = 0
+            while ibucket < len(buckets) and entry[1] >= buckets[ibucket]:
+                ibucket += 1
+            counts[ibucket] += 1
+        lines.append("Latency histogram:")
+        width = 40./max(counts)
+        for ibucket,count in enumerate(counts):
+            label = ("<"+bucketLabel(buckets[ibucket])) if ibucket < len(buckets) else (">="+bucketLabel(buckets[-1]))
+            lines.append("  "+label.rjust(8)+" "+str(count).rjust(7)+" "+"#"*int(round(count*width)))
+        return lines
+
+    def chromeTrace(self,path):
+        ###################################################
+        #Write trace in Chrome-trace JSON format (viewable
+        #in chrome://tracing or Perfetto). Each device is
+        #shown as separate track, exchange is complete
+        #event with command details in 'args'.
+        ###################################################
+        entries = self.snapshot()
+        tids = {}
+        events = []
+        for start,elapsed,lockWait,slept,dev_id,cmd_type,raw_cmd,op,bytesOut,bytesIn,reply,thread in entries:
+            if dev_id not in tids:
+                tids[dev_id] = len(tids)+1
+                events.append({ 'name' : "thread_name", 'ph' : "M", 'pid' : 1, 'tid' : tids[dev_id], 'args' : { 'name' : dev_id } })
+            events.append({ 'name' : cmd_type, 'cat' : op, 'ph' : "X", 'pid' : 1, 'tid' : tids[dev_id],
+                            'ts' : start*1e6, 'dur' : elapsed*1e6,
+                            'args' : { 'cmd' : raw_cmd, 'reply' : reply, 'lockWait_ms' : lockWait*1e3, 'sleep_ms' : slept*1e3,
+                                       'bytesOut' : bytesOut, 'bytesIn' : bytesIn, 'thread' : thread } })
+        with open(path,"w") as traceFile:
+            json.dump({ 'traceEvents' : events, 'displayTimeUnit' : "ms" },traceFile)
+        return len(events)
+
+def percentile(values,fraction):
+    ##############################################
+    #Nearest-rank percentile of sorted values
+    ##############################################
+    return values[min(int(fraction*len(values)),len(values)-1)]
+
+def bucketLabel(seconds):
+    return str(int(seconds))+"s" if seconds >= 1 else str(int(round(seconds*1e3)))+"ms"
@@ -4,8 +4,32 @@ import os, sys
 import time
 import datetime as dt
 import importlib
+import concurrent.futures
+import contextlib
+import threading
+import BufferWait
+import ChargingModel
+import CommandTable
+import CommandTrace
+import EnviroSampler
+import Readout
 import ColorLogger
 import DelayedKeyboardInterrupt as warden
+from Transport import Transport
+
+#Writing command (key) invalidates also readings and set values of these commands
+shadowLinks = { 'SCAUTORANGE' : ['SCRANGE'],
+                'SENSEF'      : ['SCAUTORANGE','SCRANGE'],
+                'LIMSTAT'     : ['CURRLIM','VOLTLIM'],
+                'STRIGGER'    : ['STRIGGERCOUNT','STRIGGERDELAY','STRIGGERCLEAR','STRIGGERMDIG','STRIGGERALWAYSBRANCH','STRIGGERLIMITBRANCH','STRIGGERSOURCE'] }
+
+class DeferredExit(Exception):
+    ###########################################################
+    #Exit requested inside concurrent task, executed afterwards
+    ###########################################################
+    def __init__(self,routine):
+        Exception.__init__(self,"Deferred "+routine+" EXIT")
+        self.routine = routine
 
 class Device:
     def __init__(self,args):
@@ -22,7 +46,20 @@ class Device:
         self.sec = str(now.second)
         self.args = args
         self.devs = {}
+        self.tables = {}
         self.coms = {}
+        self.enviroBatch = {}
+        self.enviroSampler = None
+        self.realIds = {}
+        self.taskState = threading.local()
+        self.comLocks = {}
+        self.chargingModel = ChargingModel.ChargingModel()
+        self.shadow = {}
+        self.skippedRoundTrips = 0
+        self.lastStats = {}
+        self.resultStream = None
+        self.keepPoints = 100
+        self.trace = CommandTrace.CommandTrace() if getattr(self.args,'trace',None) is not None else None
         self.clogger = ColorLogger.ColorLogger("Device:          ",self.args.logname)
 
     def log(self,log_type="i",text=""):
@@ -63,6 +100,7 @@ class Device:
             sys.exit(0)
 
         self.devs[com['id']] = _devs[com['id']]                      #Enable access to device routines
+        self.tables[com['id']] = CommandTable.CommandTable(_devs[com['id']]) #Compiled command/parameter tables
         if iAttempt == 0:
             self.__write__(self.__cmd__(com,"CMDINIT"))              #Some devices require initial sequence to enable sending commands
         real_id = self.__read__(self.__cmd__(com,"ID?",vital=True))  #Real ID may contain more strings than predefined keyword
@@ -102,36 +140,422 @@ class Device:
 
         return real_id,com
 
-    def __write__(self,cmd):
+    def __getResponses__(self, COMS, iAttempt=0):
+        #######################################################
+        #Run ID handshake for all given devices concurrently,
+        #one worker thread per port. Returns dict of device
+        #type -> (real_id, com) as from __getResponse__.
+        #######################################################
+        responses = {}
+        if len(COMS) == 0:
+            return responses
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(COMS)) as executor:
+            futures = { dev_type : executor.submit(self.__getResponse__,COMS[dev_type],iAttempt) for dev_type in COMS.keys() }
+            for dev_type in COMS.keys():
+                #exceptions (including sys.exit) are re-raised here in main thread
+                responses[dev_type] = futures[dev_type].result()
+        return responses
+
+    def __comLock__(self,dev_id):
+        ##############################################
+        #Single exchange with device must not be
+        #interleaved by other threads
+        ##############################################
+        if dev_id not in self.comLocks:
+            self.comLocks.setdefault(dev_id,threading.RLock())
+        return self.comLocks[dev_id]
+
+    def __exchange__(self,op,cmd,routine,*args):
+        ##############################################
+        #Run driver routine under device lock. If
+        #tracing is enabled, exchange is recorded with
+        #lock wait and time slept in driver.
+        ##############################################
+        if self.trace is None:
+            with self.__comLock__(cmd['id']):
+                return routine(*args)
+        start = time.time()
+        result = None
+        error = None
+        with self.__comLock__(cmd['id']):
+            acquired = time.time()
+            slept = Transport.slept()
+            try:
+                result = routine(*args)
+            except Exception as exc:
+                error = exc
+                raise
+            finally:
+                self.trace.record(start,acquired,time.time(),Transport.slept()-slept,cmd['id'],cmd['key'].split(":")[-1] if 'key' in cmd else cmd['cmd'].strip(),cmd['cmd'],op,result,error)
+        return result
+
+    def __write__(self,cmd,cached=False):
         #####################################
         #Write command in device-specific way
         #unless command is not vital and 
         #string is empty or unknown.
+        #If cached, command is skipped when
+        #device already holds the same value.
         #####################################
 
         if cmd['cmd'] == "" or cmd['cmd'] == "UNKNOWN":
             return False
+        shadow = self.shadow.setdefault(cmd['id'],{})
+        if cached and 'key' in cmd and shadow.get(cmd['key']) == cmd['arg']:
+            self.skippedRoundTrips += 1
+            return True
+        batch = getattr(self.taskState,'batches',{}).get(cmd['id'])
+        if batch is not None:
+            #sent on batch exit
+            batch.append(cmd)
+            self.__updateShadow__(cmd)
+            return True
         if self.args.verbosity > 2:
             self.log("i",cmd['id']+" : WRITECMD : \""+str(cmd['cmd'])+"\".")
 
-        write_status = self.devs[cmd['id']].write(cmd['com'],cmd['cmd'])
+        write_status = self.__exchange__("write",cmd,self.devs[cmd['id']].write,cmd['com'],cmd['cmd'])
+        self.__updateShadow__(cmd)
         return write_status
 
-    def __read__(self,cmd):
+    @contextlib.contextmanager
+    def __batch__(self,dev_type):
+        ##############################################
+        #Collect set/switch/do commands for device and
+        #send them as single transfer on exit. Errors
+        #are checked once after the transfer.
+        #   with self.__batch__('meas'):
+        #       self.__write__(...)
+        ##############################################
+        dev_id = self.coms[dev_type]['id']
+        if not hasattr(self.taskState,'batches'):
+            self.taskState.batches = {}
+        if dev_id in self.taskState.batches:
+            #nested batch is part of the outer one
+            yield
+            return
+        self.taskState.batches[dev_id] = []
+        try:
+            yield
+        finally:
+            cmds = self.taskState.batches.pop(dev_id)
+        self.__sendBatch__(cmds)
+
+    def __sendBatch__(self,cmds):
+        ##############################################
+        #Send collected commands in single transfer if
+        #device supports it. Status is cleared at the
+        #head of the same transfer (CLRSTATUS), so one
+        #EVENTS query afterwards tells if the batch
+        #failed; error queue is read only then. On
+        #error, set/switch commands are resent one by
+        #one, 'do' commands are not (they are not
+        #idempotent, e.g. CLRBUFF).
+        ##############################################
+        if len(cmds) == 0:
+            return True
+        dev_id = cmds[0]['id']
+        if len(cmds) == 1 or not hasattr(self.devs[dev_id],'writeBatch'):
+            for cmd in cmds:
+                self.__exchange__("write",cmd,self.devs[dev_id].write,cmd['com'],cmd['cmd'])
+            return True
+        raw_cmds = [cmd['cmd'] for cmd in cmds]
+        if self.args.verbosity > 2:
+            self.log("i",dev_id+" : WRITEBATCH : \""+";".join(raw_cmds)+"\".")
+        clearCmd = self.__cmd__(cmds[0],"CLRSTATUS")
+        if clearCmd['cmd'] not in ["","UNKNOWN"]:
+            raw_cmds = [clearCmd['cmd']]+raw_cmds
+        batchCmd = { 'id' : dev_id, 'com' : cmds[0]['com'], 'cmd' : ";".join(raw_cmds), 'key' : "BATCH["+str(len(cmds))+"]" }
+        self.__exchange__("writeBatch",batchCmd,self.devs[dev_id].writeBatch,cmds[0]['com'],raw_cmds)
+        errors = self.__readErrors__(cmds[0]) if self.__hasErrorEvent__(cmds[0]) else []
+        if len(errors) != 0:
+            self.log("w",dev_id+": Batched commands failed ("+"; ".join(errors)+"). Resending set/switch commands one by one.")
+            for cmd in cmds:
+                if cmd.get('key',"").startswith("do:"):
+                    if self.args.verbosity > 1:
+                        self.log("i",dev_id+": Command \""+str(cmd['cmd'])+"\" is not resent.")
+                    continue
+                self.__exchange__("write",cmd,self.devs[dev_id].write,cmd['com'],cmd['cmd'])
+            errors = self.__readErrors__(cmds[0])
+            if len(errors) != 0:
+                self.log("w",dev_id+": Device reports errors: "+"; ".join(errors))
+                return False
+        return True
+
+    def __hasErrorEvent__(self,com):
+        ##############################################
+        #Check error bits of event status register
+        #(query, device, execution, command error).
+        #Without EVENTS command error queue decides.
+        ##############################################
+        eventCmd = self.__cmd__(com,"EVENTS?")
+        if eventCmd['cmd'] in ["","UNKNOWN"]:
+            return True
+        try:
+            return int(float(str(self.__read__(eventCmd)).strip())) & 0b111100 != 0
+        except ValueError:
+            return True
+
+    def __readErrors__(self,com,maxErrors=10):
+        ##############################################
+        #Return list of errors in device error queue
+        ##############################################
+        errors = []
+        errorCmd = self.__cmd__(com,"ERROR?")
+        for ierror in range(maxErrors):
+            error = str(self.__read__(errorCmd))
+            try:
+                if int(error.split(",")[0]) == 0:
+                    break
+            except ValueError:
+                break
+            errors.append(error)
+        return errors
+
+    def __updateShadow__(self,cmd):
+        ##############################################
+        #Keep shadow copy of device state after write.
+        #Readings depending on written value and
+        #settings reset by it (shadowLinks) are
+        #forgotten, reset forgets everything.
+        ##############################################
+        if 'key' not in cmd:
+            self.shadow[cmd['id']] = {}
+            return
+        cat,cmd_type = cmd['key'].split(":",1)
+        shadow = self.shadow.setdefault(cmd['id'],{})
+        if cat == "do":
+            if cmd_type in ["RESET","POSETUP"]:
+                shadow.clear()
+            return
+        shadow[cmd['key']] = cmd['arg']
+        dependent = [cmd_type]+shadowLinks.get(cmd_type,[])
+        if cmd_type.startswith("S"):
+            dependent.append(cmd_type[1:])
+        for _cmd_type in dependent:
+            shadow.pop("get:"+_cmd_type,None)
+        for _cmd_type in shadowLinks.get(cmd_type,[]):
+            #linked settings are reset by device (e.g. new trigger model)
+            for _cat in ["set","switch"]:
+                shadow.pop(_cat+":"+_cmd_type,None)
+
+    def __read__(self,cmd,cached=False):
         #################################################
         #Read command return value in device-specific way
         #unless command is not vital and string is empty
         #or unknown.
+        #If cached, value known from shadow copy of
+        #device state is returned without query.
         #################################################
 
         if cmd['cmd'] == "" or cmd['cmd'] == "UNKNOWN":
             return False   
+        shadow = self.shadow.setdefault(cmd['id'],{})
+        if cached and 'key' in cmd and cmd['key'] in shadow:
+            self.skippedRoundTrips += 1
+            return shadow[cmd['key']]
+        batch = getattr(self.taskState,'batches',{}).get(cmd['id'])
+        if batch:
+            #queued commands must be done before query
+            self.__sendBatch__(batch[:])
+            del batch[:]
         if self.args.verbosity > 2:
             self.log("i",cmd['id']+" : READCMD : \""+str(cmd['cmd'])+"\".")
 
-        read_value = self.devs[cmd['id']].read(cmd['com'],cmd['cmd'])
+        read_value = self.__exchange__("read",cmd,self.devs[cmd['id']].read,cmd['com'],cmd['cmd'])
+        if cached and 'key' in cmd:
+            shadow[cmd['key']] = read_value
         return read_value
 
+    def __readBuffer__(self,cmd):
+        #################################################
+        #Read buffer data. Device-specific readout (e.g.
+        #binary transfer) returns float array, otherwise
+        #raw readout string is returned as by __read__.
+        #################################################
+
+        if cmd['cmd'] == "" or cmd['cmd'] == "UNKNOWN" or not hasattr(self.devs[cmd['id']],'readBuffer'):
+            return self.__read__(cmd)
+        batch = getattr(self.taskState,'batches',{}).get(cmd['id'])
+        if batch:
+            #queued commands must be done before query
+            self.__sendBatch__(batch[:])
+            del batch[:]
+        if self.args.verbosity > 2:
+            self.log("i",cmd['id']+" : READCMD : \""+str(cmd['cmd'])+"\".")
+
+        return self.__exchange__("readBuffer",cmd,self.devs[cmd['id']].readBuffer,cmd['com'],cmd['cmd'])
+
+    def __waitBuffer__(self,dev_type,nReadings,expected=0.,timeout=None):
+        #################################################
+        #Wait until device buffer holds nReadings using
+        #device-specific strategy (operation complete or
+        #adaptive polling). Generic INBUFFER? polling is
+        #used if device does not provide any.
+        #################################################
+
+        com = self.coms[dev_type]
+        if timeout is None:
+            timeout = max(10.*expected,self.sleep_time[dev_type]['long']*10.)
+        start = time.time()
+        if hasattr(self.devs[com['id']],'waitBuffer'):
+            waitCmd = { 'id' : com['id'], 'com' : com['com'], 'cmd' : "", 'key' : "WAITBUFFER" }
+            nInBuffer = self.__exchange__("waitBuffer",waitCmd,self.devs[com['id']].waitBuffer,com['com'],nReadings,expected,timeout)
+        else:
+            query = lambda cmd,t: self.__read__({'id' : com['id'], 'com' : com['com'], 'cmd' : cmd})
+            nInBuffer = BufferWait.PollWait(self.__cmd__(com,"INBUFFER?")['cmd']).wait(query,nReadings,expected,timeout)
+        if nInBuffer < nReadings:
+            self.log("w","Buffer not filled within "+"{:.1f}".format(timeout)+"s ("+str(nInBuffer)+"/"+str(nReadings)+" readouts).")
+        elif self.args.verbosity > 0:
+            self.log("i","Readouts in buffer: "+str(nInBuffer)+" (after "+"{:.2f}".format(time.time()-start)+"s)")
+        return nInBuffer
+
+    def __readEnviro__(self,mtype="all"):
+        #################################################
+        #Read enviro channels from probe. Batched ALL?
+        #query is used only if enabled by batchQuery par,
+        #otherwise queries are sent as one pipelined burst.
+        #Support is decided by the first ALL? reply, later
+        #bad replies fall back to burst for that sample.
+        #################################################
+
+        channels = [('temp1',"TEMP0?",True),('temp2',"TEMP1?",False),('temp3',"TEMP2?",False),('humi',"HUMI?",True),('lumi',"LUMI?",True)]
+        selected = { 'all'  : ['temp1','temp2','temp3','humi','lumi'],
+                     'temp' : ['temp1','temp2','temp3'],
+                     'humi' : ['humi'],
+                     'lumi' : ['lumi'],
+                     'fast' : ['temp1','humi'],
+                     'box'  : ['temp1','humi','lumi'] }[mtype]
+        enviro = { 'temp1' : "N/A", 'temp2' : "N/A", 'temp3' : "N/A", 'humi' : "N/A", 'lumi' : "N/A" }
+        com = self.coms['probe']
+
+        #Batched query (support is checked once per device)
+        if len(selected) > 1 and self.enviroBatch.get(com['id'],self.__par__(com,"batchQuery") is True):
+            values = str(self.__read__(self.__cmd__(com,"ALL?"))).split(self.__par__(com,"readoutDelim",vital=True))
+            isBatch = len(values) == len(channels)
+            if isBatch:
+                for value in values:
+                    try:
+                        float(value)
+                    except ValueError:
+                        isBatch = False
+            if com['id'] not in self.enviroBatch:
+                if not isBatch and self.args.verbosity > 1:
+                    self.log("i","Batched enviro query not supported by "+com['id']+". Pipelined queries will be used.")
+                self.enviroBatch[com['id']] = isBatch
+            elif not isBatch and self.args.verbosity > 1:
+                self.log("w","Invalid reply to batched enviro query ("+";".join(values)+"). Pipelined queries used for this sample.")
+            if isBatch:
+                for ich,(key,cmd_type,vital) in enumerate(channels):
+                    if key in selected:
+                        enviro[key] = values[ich].strip()
+                return enviro
+
+        #Pipelined burst of single-channel queries
+        cmds = [(key,self.__cmd__(com,cmd_type,vital=vital)) for key,cmd_type,vital in channels if key in selected]
+        if hasattr(self.devs[com['id']],'readBatch'):
+            raw_cmds = [cmd['cmd'] for key,cmd in cmds if cmd['cmd'] != "" and cmd['cmd'] != "UNKNOWN"]
+            if self.args.verbosity > 2:
+                self.log("i",com['id']+" : READCMD : \""+str(";".join(raw_cmds))+"\".")
+            batchCmd = { 'id' : com['id'], 'com' : com['com'], 'cmd' : ";".join(raw_cmds), 'key' : "BATCH["+str(len(raw_cmds))+"]" }
+            values = self.__exchange__("readBatch",batchCmd,self.devs[com['id']].readBatch,com['com'],raw_cmds)
+            for key,cmd in cmds:
+                if cmd['cmd'] == "" or cmd['cmd'] == "UNKNOWN":
+                    enviro[key] = False
+                else:
+                    enviro[key] = values.pop(0)
+        else:
+            for key,cmd in cmds:
+                enviro[key] = self.__read__(cmd)
+        return enviro
+
+    def __startEnviroSampler__(self):
+        #################################################
+        #Start background sampling of probe (once) if
+        #probe is used and sampling period is positive
+        #################################################
+
+        if self.enviroSampler is not None or 'probe' not in self.coms:
+            return self.enviroSampler
+        com = self.coms['probe']
+        interval = self.__par__(com,"sampleInterval")
+        if not interval or float(interval) <= 0.:
+            return None
+        size = self.__par__(com,"sampleBuffer")
+        self.enviroSampler = EnviroSampler.EnviroSampler(self.__sampleEnviro__,float(interval),int(size) if size else 600,fatal=(DeferredExit,))
+        self.enviroSampler.start()
+        if self.args.verbosity > 0:
+            self.log("i","Enviro sampled in background every "+str(interval)+"s.")
+        return self.enviroSampler
+
+    def __sampleEnviro__(self):
+        #################################################
+        #Single background reading. Exit requested while
+        #reading is deferred to the main thread.
+        #################################################
+
+        self.taskState.deferExit = True
+        return self.__readEnviro__("fast" if self.args.probeFast else "all")
+
+    def __checkEnviroSampler__(self):
+        #################################################
+        #Execute exit requested by sampling thread here
+        #in the main thread
+        #################################################
+
+        failure = self.enviroSampler.failure if self.enviroSampler is not None else None
+        if failure is None:
+            return
+        self.enviroSampler = None
+        self.log("e","Background enviro sampling stopped.")
+        if isinstance(failure,DeferredExit):
+            self.__deferredExit__(failure)
+        raise failure
+
+    def __stopEnviroSampler__(self):
+        #################################################
+        #Stop background sampling of probe
+        #################################################
+
+        if self.enviroSampler is not None:
+            self.enviroSampler.stop()
+            if self.enviroSampler.nFailed > 0:
+                self.log("w","Background enviro sampling failed "+str(self.enviroSampler.nFailed)+" times.")
+            self.__checkEnviroSampler__()
+            self.enviroSampler = None
+
+    def __enviroPoint__(self,mtype="all",start=None,end=None,dryRun=False):
+        #################################################
+        #Return enviro conditions of single IV point.
+        #Background snapshots are averaged over window
+        #[start,end] if sampler runs, otherwise probe is
+        #read directly (after dry run if requested).
+        #################################################
+
+        enviro = { 'temp1' : "N/A", 'temp2' : "N/A", 'temp3' : "N/A", 'humi' : "N/A", 'lumi' : "N/A" }
+        if 'probe' not in self.args.addSocket and 'probe' not in self.args.addPort:
+            return enviro
+        self.__checkEnviroSampler__()
+        if self.enviroSampler is not None:
+            snapshot = self.enviroSampler.window(start,end)
+            if snapshot is not None:
+                enviro.update(snapshot)
+                return enviro
+        if dryRun:
+            self.__readEnviro__(mtype)
+        enviro.update(self.__readEnviro__(mtype))
+        return enviro
+
+    def __logEnviro__(self,enviro,when="before"):
+        #################################################
+        #Print enviro conditions of single IV point
+        #################################################
+
+        self.log("i","Temperature CH0 "+when+" measurement: "+str(enviro['temp1']))
+        self.log("i","Temperature CH1 "+when+" measurement: "+str(enviro['temp2']))
+        self.log("i","Temperature CH2 "+when+" measurement: "+str(enviro['temp3']))
+        self.log("i","Humidity "+when+" measurement: "+str(enviro['humi']))
+        self.log("i","Lumi "+when+" measurement: "+str(enviro['lumi']))
+
     def __cmd__(self,com,cmd_type,arg="",vital=False,check=""):
         ##########################################
         #Return device specific command to be used 
@@ -157,7 +581,7 @@ class Device:
             _cmd_type = cmd_type
 
         #Vital commands must be defined in corresponding class
-        (raw_cmd,isOK,isNOT) = self.devs[com['id']].cmd(_cmd_type, arg = arg, cat = cat)
+        (raw_cmd,isOK,isNOT) = self.tables[com['id']].cmd(_cmd_type, arg = arg, cat = cat)
         if (vital and len(raw_cmd)==0) or (vital and raw_cmd=="UNKNOWN"):
             self.log("e","Command: "+_cmd_type+" not defined in "+com['id']+" class. RAW_CMD = "+raw_cmd)
             self.__terminate__("EXIT") #TODO: crosscheck for abort commands in device class must be done when importing
@@ -184,7 +608,7 @@ class Device:
                     return False
 
         #construct final command
-        _cmd = {'id' : com['id'], 'com' : com['com'], 'cmd' : raw_cmd}
+        _cmd = {'id' : com['id'], 'com' : com['com'], 'cmd' : raw_cmd, 'key' : cat+":"+_cmd_type, 'arg' : str(arg)}
         
         return _cmd
 
@@ -194,7 +618,7 @@ class Device:
         #######################################
 
         #Vital parameters must be defined in corresponding class
-        raw_par = self.devs[com['id']].par(par_type)
+        raw_par = self.tables[com['id']].par(par_type)
         if (vital and len(str(raw_par))==0) or (vital and str(raw_par)=="UNKNOWN"):
             self.log("e","Parameter: "+str(par_type)+" not defined in "+com['id']+" class.")
             self.__terminate__("EXIT")
@@ -348,24 +772,76 @@ class Device:
         
         return _biasRange        
 
-    def __checkReadout__(self, readings):
+    def __processReadout__(self,readout,sigma=None):
+        #################################################
+        #Parse readout of measurement device into array.
+        #Returns (values,nInvalid,stats), readings out of
+        #sigma*|mean| are masked as outliers if requested.
+        #################################################
+        values,nInvalid = Readout.parse(readout,self.__par__(self.coms['meas'],"readoutDelim",vital=True),self.__par__(self.coms['meas'],"readoutIdentifier"))
+        if self.args.verbosity > 0:
+            for value in values:
+                self.log("i","Current reading: "+str(value))
+        stats = Readout.statistics(values,sigma)
+        for value in values[~stats['mask']]:
+            self.log("w","Outlier removed: "+str(value))
+        return values,nInvalid,stats
+
+    def __settleSettings__(self,nSamples):
+        ######################################################
+        #Settle-then-acquire settings for continuous IV:
+        # FULL   = discard maxNSamples-1 readings (default)
+        # COUNT  = discard fixed number of readings
+        # WINDOW = discard windows until current is stable
+        ######################################################
+        com = self.coms['meas']
+        mode = str(self.__par__(com,"settleMode")).upper()
+        if mode not in ["COUNT","WINDOW","FULL"]:
+            mode = "FULL"
+        settle = { 'mode' : mode }
+        if mode == "COUNT":
+            settle['nDiscard'] = int(self.__par__(com,"settleCount"))
+            settle['nTrigger'] = settle['nDiscard']+nSamples
+        elif mode == "WINDOW":
+            settle['window']    = max(int(self.__par__(com,"settleWindow")),2)
+            settle['tolerance'] = float(self.__par__(com,"settleTolerance"))
+            settle['maxCount']  = int(self.__par__(com,"settleMaxCount"))
+            settle['nDiscard'] = 0
+            settle['nTrigger'] = nSamples
+        else:
+            settle['nDiscard'] = int(self.__par__(com,"maxNSamples"))-1
+            settle['nTrigger'] = int(self.__par__(com,"maxNSamples"))*2
+        return settle
+
+    def __acquireBuffer__(self,nTrigger,firstIdx,lastIdx,sampleTime):
+        ######################################################
+        #Run programmable trigger model for nTrigger readings
+        #and return raw readout of buffer range firstIdx-lastIdx
+        ######################################################
+        with self.__batch__('meas'):
+            self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCOUNT",arg="3, "+str(nTrigger)+", 2"),cached=True)
+            self.__write__(self.__cmd__(self.coms['meas'],"CLRBUFF",vital=True))
+            self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERINIT",arg="ON",vital=True))
+        self.__waitBuffer__('meas',lastIdx,expected=lastIdx*(sampleTime/60.))
+        readout = self.__readBuffer__(self.__cmd__(self.coms['meas'],"READOUT?", arg=str(firstIdx)+", "+str(lastIdx)+", \"defbuffer1\", READ", vital=True))
+        self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERINIT",arg="OFF",vital=False))
+        self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERABORT"))
+        return readout
+
+    def __parseReadout__(self,readout):
         ###################################
-        #Return readout without outliers
+        #Return readout as array of floats
         ###################################
-        if len(readings) == 0: return readings
-        avg = sum(readings)/float(len(readings))
-        sigma = 0.15
-        checkedReadout = [] 
-        for readout in readings:
-            if abs(readout-avg) > abs(avg)*sigma:
-                self.log("w","Outlier removed: "+str(readout))
-                continue
-            else:
-                checkedReadout.append(readout)
-        if len(checkedReadout) == 0:
-            return readings
-        else:
-            return checkedReadout
+        return Readout.parse(readout,self.__par__(self.coms['meas'],"readoutDelim"),self.__par__(self.coms['meas'],"readoutIdentifier"))[0]
+
+    def __isStable__(self,readings,tolerance):
+        ###################################################
+        #Standard deviation of readings within relative
+        #tolerance of their mean
+        ###################################################
+        if len(readings) < 2: return False
+        stats = Readout.statistics(readings)
+        return stats['std'] <= abs(stats['mean'])*tolerance
 
     def __setRemote__(self,dev_type="ALL"):
         ##########################################
@@ -455,6 +931,82 @@ class Device:
             nSteps = int(delta//biasStep)
         return (nSteps*timeStep)+offset     
 
+    def __waitCharging__(self,dev_type,initBias,targetBias):
+        #######################################################
+        #Wait until bias is settled after bias step. Readback
+        #voltage and current are polled until dV/dt and dI/dt
+        #drop below device thresholds. Fixed charging time is
+        #used as upper bound and as fallback if readback is not
+        #available. Settling times are learned per setup and
+        #DUT and polling starts only when charging may be
+        #finished. Learned time is the start of the stable
+        #readback, not the end of detection. If readback is
+        #stable already at first poll, the pre-sleep is learned
+        #as upper limit, so prediction drifts down only.
+        #######################################################
+
+        com = self.coms[dev_type]
+        start = time.time()
+        upperBound = self.__chargingTime__(initBias,targetBias)
+        delta = abs(targetBias-initBias)
+        setup = com['id']+"/"+self.coms['meas']['id']+"/"+str(getattr(self.args,'outputFile',""))
+        voltCmd = self.__cmd__(com,"VOLTREAD?")
+        currCmd = self.__cmd__(com,"CURRREAD?")
+        if voltCmd['cmd'] in ["","UNKNOWN"] and currCmd['cmd'] in ["","UNKNOWN"]:
+            time.sleep(upperBound)
+            return upperBound
+
+        #Thresholds (defaults if not specified for device)
+        maxVoltRate = self.__par__(com,"settleVoltRate")
+        maxCurrRate = self.__par__(com,"settleCurrRate")
+        pollTime    = self.__par__(com,"settlePoll")
+        maxVoltRate = float(maxVoltRate) if str(maxVoltRate) not in ["","UNKNOWN"] else 0.5
+        maxCurrRate = float(maxCurrRate) if str(maxCurrRate) not in ["","UNKNOWN"] else 1e-9
+        pollTime    = float(pollTime) if str(pollTime) not in ["","UNKNOWN"] else 0.25
+
+        #Skip part of charging surely not finished
+        predicted = self.chargingModel.predict(setup,delta)
+        if predicted is not None:
+            time.sleep(min(0.8*predicted,upperBound))
+
+        #Poll readback until both rates are low in two consecutive intervals
+        previous = None
+        nStable = 0
+        stableSince = None
+        isSettled = False
+        while time.time()-start < upperBound:
+            now = time.time()
+            volt = Readout.toFloat(self.__read__(voltCmd)) if voltCmd['cmd'] not in ["","UNKNOWN"] else 0.
+            curr = Readout.toFloat(self.__read__(currCmd)) if currCmd['cmd'] not in ["","UNKNOWN"] else 0.
+            if volt is None or curr is None:
+                #unreadable readback, rely on upper bound
+                time.sleep(max(upperBound-(time.time()-start),0.))
+                return time.time()-start
+            if previous is not None:
+                dtime = max(now-previous[0],1e-3)
+                voltRate = abs(volt-previous[1])/dtime
+                currRate = abs(curr-previous[2])/dtime
+                if self.args.verbosity > 2:
+                    self.log("i","Charging: dV/dt = "+"{:.3g}".format(voltRate)+" V/s, dI/dt = "+"{:.3g}".format(currRate)+" A/s")
+                #ramp may not be started yet, readback must reach target
+                isOnTarget = voltCmd['cmd'] in ["","UNKNOWN"] or abs(abs(volt)-abs(targetBias)) <= max(1.0,0.01*abs(targetBias))
+                nStable = nStable+1 if voltRate <= maxVoltRate and currRate <= maxCurrRate and isOnTarget else 0
+                if nStable == 1:
+                    stableSince = previous[0]
+                if nStable >= 2:
+                    isSettled = True
+                    break
+            previous = (now,volt,curr)
+            time.sleep(min(pollTime,max(upperBound-(time.time()-start),0.)))
+
+        settleTime = time.time()-start
+        if isSettled:
+            #saved once per sweep (see __terminate__ and finalize)
+            self.chargingModel.update(setup,delta,stableSince-start)
+            if self.args.verbosity > 0:
+                self.log("i","Bias settled after "+"{:.2f}".format(stableSince-start)+"s, detected after "+"{:.2f}".format(settleTime)+"s (upper bound "+"{:.2f}".format(upperBound)+"s).")
+        return settleTime
+
     def __detectMalfunction__(self,motionIsDone,dev_type="zstation"):
         ###########################################################
         #Aux function to detect malfunction of given station device
@@ -480,6 +1032,79 @@ class Device:
         else:
             return False
 
+    def __waitMotion__(self,dev_type="zstation",timeout=15.,com=None,background=False,extension=0.):
+        ###########################################################
+        #Wait until motion of given station is done. Motion status
+        #is polled from short interval with exponential backoff,
+        #so short moves are not rounded up to a long sleep.
+        #Timeout is hard limit unless 'extension' is given: then
+        #waiting is prolonged by 'extension' seconds if station is
+        #still moving (non-zero real velocity) when timeout passes.
+        #Returns motionIsDone, or future resolving to it if waiting
+        #runs in background (e.g. while other devices are being
+        #set up). Exit requested in background is deferred, see
+        #__motionResult__.
+        ###########################################################
+
+        if background:
+            def run():
+                self.taskState.deferExit = True
+                try:
+                    return self.__waitMotion__(dev_type,timeout,com,extension=extension)
+                finally:
+                    self.taskState.deferExit = False
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+            future = executor.submit(run)
+            executor.shutdown(wait=False)
+            return future
+
+        if com is None:
+            com = self.coms[dev_type]
+        interval = float(self.__par__(com,"motionPollMin") or self.sleep_time[dev_type]['short'])
+        maxInterval = float(self.__par__(com,"motionPollMax") or self.sleep_time[dev_type]['long'])
+        start = time.time()
+        deadline = start+timeout
+        motionIsDone = False
+        while not motionIsDone:
+            time.sleep(max(min(interval,deadline-time.time()),0.))
+            returnValue = str(self.__read__(self.__cmd__(com,"MOVE?",vital=True)))
+            if len(returnValue) != 0:
+                motionIsDone = bool(int(returnValue))
+            if not motionIsDone and time.time() >= deadline:
+                if extension <= 0. or deadline >= start+timeout+extension:
+                    break
+                realVelo = Readout.toFloat(self.__read__(self.__cmd__(com,"VELOCITY?")))
+                if realVelo is None or realVelo == 0.:
+                    break
+                self.log("w","Motion of "+dev_type+" not done within "+"{:.1f}".format(timeout)+"s, station still moving (velocity "+str(realVelo)+"). Waiting longer.")
+                deadline = start+timeout+extension
+            interval = min(interval*1.5,maxInterval)
+        if self.args.verbosity > 1:
+            self.log("i","Motion of "+dev_type+(" done" if motionIsDone else " not done")+" after "+"{:.2f}".format(time.time()-start)+"s.")
+        return motionIsDone
+
+    def __motionResult__(self,motion):
+        ###########################################################
+        #Return result of motion waited in background. Exit
+        #requested by the waiting thread is executed here in the
+        #main thread.
+        ###########################################################
+
+        try:
+            return motion.result()
+        except DeferredExit as failure:
+            self.__deferredExit__(failure)
+
+    def __deferredExit__(self,failure):
+        ###########################################################
+        #Execute exit postponed by concurrent task
+        ###########################################################
+
+        if failure.routine == "abort":
+            self.__abort__("EXIT")
+        else:
+            self.__terminate__("EXIT")
+
     def __initDevice__(self,coms,EMG):
         #############################################
         #Run sequence of commands initializing device
@@ -513,91 +1138,153 @@ class Device:
         self.sleep_time = {}
         self.interlock =  {}
         self.stations = 0
-        dev_type_info = ""
+        tasks = {}
         for dev_type in coms:
-            #Setup measurement device and HVSource
-            if dev_type in ['meas','source']:
-                if not self.args.extVSource and dev_type == 'source': continue
-
-                #Reset device and Reset power-on default settings
-                self.__write__(self.__cmd__(coms[dev_type],"RESET",vital=True))
-                self.__write__(self.__cmd__(coms[dev_type],"POSETUP"))
+            if not self.args.extVSource and dev_type == 'source': continue
 
-                #Setting up system date and time
-                self.__write__(self.__cmd__(coms[dev_type],"STIME",arg=self.hr+", "+self.min+", "+self.sec))
-                self.__write__(self.__cmd__(coms[dev_type],"SDATE",arg=self.year+", "+self.month+", "+self.day))
-
-                #Setup output panel to FRONT/REAR for device if available #FIXME
-                self.__write__(self.__cmd__(coms[dev_type],"SPANEL",arg="REAR"))
-                self.__write__(self.__cmd__(coms[dev_type],"INTERLOCK",arg="OFF")) 
-
-            #General
             #Sleep time constants
             self.sleep_time[dev_type] = {'short'  : self.__par__(coms[dev_type],"tShort"),
                                          'medium' : self.__par__(coms[dev_type],"tMedium"),
                                          'long'   : self.__par__(coms[dev_type],"tLong")
                                         }
-
-            #Disable time consuming redundant functions
-            self.__write__(self.__cmd__(coms[dev_type],"MATH",arg="OFF"))
-
-            #Zero Check Interlock (safeMode=False)
-            self.__checkInterlock__(dev_type)
-            #Setup xyz station(s)
             if "station" in dev_type:
                 self.stations += 1
-                if "x" in dev_type: dev_type_info = "x-station"
-                if "y" in dev_type: dev_type_info = "y-station"
-                if "z" in dev_type: dev_type_info = "z-station"
 
-                #set velocity    
-                self.__write__(self.__cmd__(coms[dev_type],"SVELOCITY",arg=self.__par__(coms[dev_type],"safeVelo")))
-                if self.args.verbosity > 0:
-                    setVelo = self.__read__(self.__cmd__(coms[dev_type],"SETVELO?"))
-                    self.log("i",dev_type_info.capitalize()+" control velocity set to "+str(setVelo))
-
-                #turn ON motor    
-                self.__write__(self.__cmd__(coms[dev_type],"MOTOR",arg="ON",vital=True))
-                time.sleep(self.sleep_time[dev_type]['medium'])
-                isMotorOn = bool(int(self.__read__(self.__cmd__(coms[dev_type],"MOTOR?",vital=True))))
-                if not isMotorOn:
-                    self.log("e",str(dev_type_info).capitalize()+" motor is turned OFF while expected working!")
-                    self.__terminate__("EXIT")
-                else:
-                    if self.args.verbosity > 0:
-                        self.log("i",str(dev_type_info).capitalize()+" motor is ON.")    
-                
-                #goto home position
-                self.__write__(self.__cmd__(coms[dev_type],"GOHOME",vital=True))
-                motionIsDone = False
-                runTime = 0.
-                runTimeError = 15.
-                while not motionIsDone and runTime < runTimeError:
-                    time.sleep(self.sleep_time[dev_type]['long'])
-                    returnValue = str(self.__read__(self.__cmd__(coms[dev_type],"MOVE?",vital=True)))
-                    if len(returnValue) != 0:
-                        motionIsDone = bool(int(returnValue))
-                    runTime += self.sleep_time[dev_type]['long']
-                self.__detectMalfunction__(motionIsDone,dev_type)
+            #Stations move only after HV devices are reset, others are independent
+            tasks[dev_type] = []
+            if "station" in dev_type:
+                tasks[dev_type] = [_dev_type for _dev_type in ['meas','source'] if _dev_type in coms and (_dev_type != 'source' or self.args.extVSource)]
 
-                #goto top position with z-station only
-                if "z" in dev_type:
-                    self.__write__(self.__cmd__(coms[dev_type],"SGOTO",arg=self.__par__(coms[dev_type],"topPosition"),vital=True))
-                    motionIsDone = False
-                    runTime = 0.
-                    runTimeError = 15.
-                    while not motionIsDone and runTime < runTimeError:
-                        time.sleep(self.sleep_time[dev_type]['long'])
-                        returnValue = str(self.__read__(self.__cmd__(coms[dev_type],"MOVE?",vital=True)))
-                        if len(returnValue) != 0:
-                            motionIsDone = bool(int(returnValue))
-                        runTime += self.sleep_time[dev_type]['long']
-                    self.__detectMalfunction__(motionIsDone,dev_type)
+        #Run initialization tasks concurrently
+        self.__runTasks__(tasks, lambda dev_type: self.__initTask__(coms,dev_type), "Initialization")
 
         #notify user to position probe manually           
         if self.stations == 0 and not self.args.isEnviroOnly:
             self.log("w","No station device is used. User is expected to ensure bias connection manually.")
 
+    def __initTask__(self,coms,dev_type):
+        ##############################################
+        #Initialization sequence of a single device
+        ##############################################
+
+        dev_type_info = ""
+
+        #Setup measurement device and HVSource
+        if dev_type in ['meas','source']:
+
+            #Reset device and Reset power-on default settings
+            self.__write__(self.__cmd__(coms[dev_type],"RESET",vital=True))
+            self.__write__(self.__cmd__(coms[dev_type],"POSETUP"))
+
+            #Setting up system date and time
+            self.__write__(self.__cmd__(coms[dev_type],"STIME",arg=self.hr+", "+self.min+", "+self.sec))
+            self.__write__(self.__cmd__(coms[dev_type],"SDATE",arg=self.year+", "+self.month+", "+self.day))
+
+            #Setup output panel to FRONT/REAR for device if available #FIXME
+            self.__write__(self.__cmd__(coms[dev_type],"SPANEL",arg="REAR"))
+            self.__write__(self.__cmd__(coms[dev_type],"INTERLOCK",arg="OFF")) 
+
+        #General
+        #Disable time consuming redundant functions
+        self.__write__(self.__cmd__(coms[dev_type],"MATH",arg="OFF"))
+
+        #Zero Check Interlock (safeMode=False)
+        self.__checkInterlock__(dev_type)
+        #Setup xyz station(s)
+        if "station" in dev_type:
+            if "x" in dev_type: dev_type_info = "x-station"
+            if "y" in dev_type: dev_type_info = "y-station"
+            if "z" in dev_type: dev_type_info = "z-station"
+
+            #set velocity    
+            self.__write__(self.__cmd__(coms[dev_type],"SVELOCITY",arg=self.__par__(coms[dev_type],"safeVelo")))
+            if self.args.verbosity > 0:
+                setVelo = self.__read__(self.__cmd__(coms[dev_type],"SETVELO?"))
+                self.log("i",dev_type_info.capitalize()+" control velocity set to "+str(setVelo))
+
+            #turn ON motor    
+            self.__write__(self.__cmd__(coms[dev_type],"MOTOR",arg="ON",vital=True))
+            time.sleep(self.sleep_time[dev_type]['medium'])
+            isMotorOn = bool(int(self.__read__(self.__cmd__(coms[dev_type],"MOTOR?",vital=True))))
+            if not isMotorOn:
+                self.log("e",str(dev_type_info).capitalize()+" motor is turned OFF while expected working!")
+                self.__terminate__("EXIT")
+            else:
+                if self.args.verbosity > 0:
+                    self.log("i",str(dev_type_info).capitalize()+" motor is ON.")    
+            
+            #goto home position
+            self.__write__(self.__cmd__(coms[dev_type],"GOHOME",vital=True))
+            motionIsDone = self.__waitMotion__(dev_type,timeout=15.,com=coms[dev_type])
+            self.__detectMalfunction__(motionIsDone,dev_type)
+
+            #goto top position with z-station only
+            if "z" in dev_type:
+                self.__write__(self.__cmd__(coms[dev_type],"SGOTO",arg=self.__par__(coms[dev_type],"topPosition"),vital=True))
+                motionIsDone = self.__waitMotion__(dev_type,timeout=15.,com=coms[dev_type])
+                self.__detectMalfunction__(motionIsDone,dev_type)
+
+    def __runTasks__(self,tasks,routine,title="Tasks"):
+        ###################################################
+        #Run routine(dev_type) for all tasks concurrently.
+        #tasks = {dev_type : [dev_types to be done before]}
+        #Exit requested inside a task is postponed until
+        #all running tasks end, then it is executed here
+        #in the main thread keeping the safety ordering
+        #(source before meas before stations).
+        ###################################################
+
+        def run(dev_type):
+            self.taskState.deferExit = True
+            start = time.time()
+            try:
+                routine(dev_type)
+            finally:
+                self.taskState.deferExit = False
+                timing[dev_type] = (start-initTime,time.time()-start)
+
+        timing = {}
+        initTime = time.time()
+        done = []
+        running = {}
+        failure = None
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1,len(tasks)))
+        try:
+            while len(done) < len(tasks):
+                if failure is None:
+                    for dev_type in tasks:
+                        if dev_type in done or dev_type in running.values():
+                            continue
+                        if all([_dev_type in done for _dev_type in tasks[dev_type]]):
+                            running[executor.submit(run,dev_type)] = dev_type
+                if len(running) == 0:
+                    break
+                finished,pending = concurrent.futures.wait(list(running.keys()),return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    dev_type = running.pop(future)
+                    done.append(dev_type)
+                    if future.exception() is not None and failure is None:
+                        failure = future.exception()
+        except KeyboardInterrupt:
+            #let running tasks end before device is terminated
+            with warden.DelayedKeyboardInterrupt(force=False, logfile=self.args.logname):
+                executor.shutdown(wait=True)
+            raise
+        executor.shutdown(wait=True)
+
+        #Timing report
+        if self.args.verbosity > 0:
+            self.log("i",title+" timing per device:")
+            for dev_type in tasks:
+                if dev_type in timing:
+                    self.log("n",dev_type.ljust(10)+" start +"+"{:.2f}".format(timing[dev_type][0])+"s, took "+"{:.2f}".format(timing[dev_type][1])+"s")
+            self.log("n","total wall time "+"{:.2f}".format(time.time()-initTime)+"s, sum of device times "+"{:.2f}".format(sum([timing[key][1] for key in timing]))+"s")
+
+        if failure is not None:
+            if isinstance(failure,DeferredExit):
+                self.__deferredExit__(failure)
+            raise failure
+
     def __prepMeasurementExternal__(self):
         ################################################################
         #Prepare measurement when external measurement device is used.
@@ -616,15 +1303,7 @@ class Device:
         if 'zstation' in self.coms:
             if not self.__write__(self.__cmd__(self.coms['zstation'],"SGOTOREL",arg=self.__par__(self.coms['zstation'],"touchPosition"),vital=False)):
                 self.__write__(self.__cmd__(self.coms['zstation'],"SGOTO",arg=self.__par__(self.coms['zstation'],"touchPosition"),vital=True))
-            motionIsDone = False
-            runTime = 0.
-            runTimeError = 15.
-            while not motionIsDone and runTime < runTimeError:
-                time.sleep(self.sleep_time['zstation']['long'])
-                returnValue = str(self.__read__(self.__cmd__(self.coms['zstation'],"MOVE?",vital=True)))
-                if len(returnValue) != 0:
-                    motionIsDone = bool(int(returnValue))
-                runTime += self.sleep_time['zstation']['long']
+            motionIsDone = self.__waitMotion__('zstation',timeout=15.)
             self.__detectMalfunction__(motionIsDone,"zstation")
         else:
             self.log("w","If not done manually, probe is not touching sensor.")
@@ -661,6 +1340,15 @@ class Device:
             if status in ["e","f"]:
                 self.__terminate__("EXIT")
 
+        #re-enable safe connection by controling z-station only (motion overlaps with setup of limits, bias stays OFF)
+        motion = None
+        if 'zstation' in self.coms:
+            if not self.__write__(self.__cmd__(self.coms['zstation'],"SGOTOREL",arg=self.__par__(self.coms['zstation'],"touchPosition"),vital=False)):
+                self.__write__(self.__cmd__(self.coms['zstation'],"SGOTO",arg=self.__par__(self.coms['zstation'],"touchPosition"),vital=True))
+            motion = self.__waitMotion__('zstation',timeout=15.,background=True)
+        else:
+            self.log("w","If not done manually, probe is not touching sensor.")
+
         #Setting source voltage limits in addition to crosschecked voltage bias
         if self.args.extVSource:
             self.__write__(self.__cmd__(self.coms['source'],"LIMSTAT",arg="ON")) #Enable changing limits if needed
@@ -721,22 +1409,9 @@ class Device:
                     self.log("i","Measurement device Source Output Current limit was specified (manufacturer) to "+str(limCDef)+".")
                     self.log("i","Measurement device Source Output Current limit was set (user) to "+str(limCSet)+".")
         
-        #re-enable safe connection by controling z-station only
-        if 'zstation' in self.coms:
-            if not self.__write__(self.__cmd__(self.coms['zstation'],"SGOTOREL",arg=self.__par__(self.coms['zstation'],"touchPosition"),vital=False)):
-                self.__write__(self.__cmd__(self.coms['zstation'],"SGOTO",arg=self.__par__(self.coms['zstation'],"touchPosition"),vital=True))
-            motionIsDone = False
-            runTime = 0.
-            runTimeError = 15.
-            while not motionIsDone and runTime < runTimeError:
-                time.sleep(self.sleep_time['zstation']['long'])
-                returnValue = str(self.__read__(self.__cmd__(self.coms['zstation'],"MOVE?",vital=True)))
-                if len(returnValue) != 0:
-                    motionIsDone = bool(int(returnValue))
-                runTime += self.sleep_time['zstation']['long']
-            self.__detectMalfunction__(motionIsDone,"zstation")
-        else:     
-            self.log("w","If not done manually, probe is not touching sensor.")
+        #Wait until probe is touching sensor
+        if motion is not None:
+            self.__detectMalfunction__(self.__motionResult__(motion),"zstation")
 
     def __abort__(self,dev_type="ALL"):
         ####################################################################
@@ -793,15 +1468,7 @@ class Device:
 
                 #Return z-station to bottom position before finalizing measurement
                 self.__write__(self.__cmd__(self.coms['zstation'],"SGOTO",arg=self.__par__(self.coms['zstation'],"bottomPosition"),vital=True))
-                motionIsDone = False
-                runTime = 0.
-                runTimeError = 21.
-                while not motionIsDone and runTime < runTimeError:
-                    time.sleep(self.sleep_time['zstation']['long'])
-                    returnValue = str(self.__read__(self.__cmd__(self.coms['zstation'],"MOVE?",vital=True)))
-                    if len(returnValue) != 0:
-                        motionIsDone = bool(int(returnValue))
-                    runTime += self.sleep_time['zstation']['long']
+                motionIsDone = self.__waitMotion__('zstation',timeout=21.)
                 self.__detectMalfunction__(motionIsDone,"zstation")
 
                 #STOP ALL MOTION 
@@ -819,6 +1486,8 @@ class Device:
                     isMotorOn = bool(int(self.__read__(self.__cmd__(self.coms[dev_type],"MOTOR?",vital=True))))
                     runTime += float(self.sleep_time[dev_type]['medium'])
         else:
+            if getattr(self.taskState,'deferExit',False):
+                raise DeferredExit("abort")
             self.__abort__("ALL")
             sys.exit(0)
 
@@ -843,6 +1512,8 @@ class Device:
         if dev_type == "ALL": 
             for _dev_type in self.coms.keys():
                 self.__terminate__(_dev_type)
+            if self.chargingModel.isDirty:
+                self.chargingModel.save()
         elif dev_type != "EXIT":
             dev_type_info = ""
             if dev_type == "meas":
@@ -872,15 +1543,7 @@ class Device:
             elif "station" in dev_type and dev_type in self.sleep_time.keys():    
                 #stop motor movement if needed
                 self.__write__(self.__cmd__(self.coms[dev_type],"STOP",vital=True))
-                motionIsDone = False
-                runTime = 0.
-                runTimeError = 15.
-                while not motionIsDone and runTime < runTimeError:
-                    time.sleep(self.sleep_time[dev_type]['long'])
-                    returnValue = str(self.__read__(self.__cmd__(self.coms[dev_type],"MOVE?",vital=True)))
-                    if len(returnValue) != 0:
-                        motionIsDone = bool(int(returnValue))
-                    runTime += self.sleep_time[dev_type]['long']
+                motionIsDone = self.__waitMotion__(dev_type,timeout=15.)
                 if not motionIsDone:
                     self.log("h","EMERGENCY ABORT LAUNCHED for "+str(dev_type_info))
                     self.__abort__(dev_type)
@@ -895,6 +1558,9 @@ class Device:
                             self.log("i","All movement stopped for "+str(dev_type_info)+".")
          
             #SECOND SEQUENCE        
+            if dev_type == "meas":
+                #data format may be left binary by buffer readout
+                self.__write__(self.__cmd__(self.coms[dev_type],"FORMATASC"))
             self.__write__(self.__cmd__(self.coms[dev_type],"ZCHECK",arg="ON"))
             self.__write__(self.__cmd__(self.coms[dev_type],"ZCOR",arg="OFF"))
             if "station" in dev_type and dev_type in self.sleep_time.keys():
@@ -912,6 +1578,8 @@ class Device:
             self.__setLocal__(dev_type)
 
         elif dev_type == "EXIT":
+            if getattr(self.taskState,'deferExit',False):
+                raise DeferredExit("terminate")
             self.__terminate__("ALL")
             sys.exit(0)
 
@@ -921,8 +1589,9 @@ class Device:
         #from all socket devices only.
         ########################################################
         try:
+            responses = self.__getResponses__({ dev_type : SOCKETS[dev_type] for dev_type in self.args.addSocket })
             for dev_type in self.args.addSocket:
-                DEV_PROBE_NAME,self.coms[dev_type] = self.__getResponse__(SOCKETS[dev_type])  
+                DEV_PROBE_NAME,self.coms[dev_type] = responses[dev_type]
         except KeyboardInterrupt:
             self.log("w","Keyboard interruption during socket selection detected.")
             sys.exit(0)
@@ -945,11 +1614,13 @@ class Device:
         ###########################################################   
         try:
             OTHER_DEV_NAMES = {}
+            responses = self.__getResponses__({ dev_type : COMS[dev_type] for dev_type in self.args.addPort })
             for dev_type in self.args.addPort:
-                OTHER_DEV_NAMES[dev_type],self.coms[dev_type] = self.__getResponse__(COMS[dev_type])
+                OTHER_DEV_NAMES[dev_type],self.coms[dev_type] = responses[dev_type]
 
             loadStatus = {}
             for dev_type in self.args.addPort:
+                self.realIds[dev_type] = OTHER_DEV_NAMES[dev_type]
                 if "FAILED" in OTHER_DEV_NAMES[dev_type]:
                     loadStatus[dev_type] = (self.coms[dev_type]['port'],0)
                 else:
@@ -987,18 +1658,36 @@ class Device:
         #SOCKETS = socket connections 
         ########################################################
         try:
+            #handshake with all devices at once, each device sits on its own port
+            _COMS = {}
             if not self.args.isStandByZOnly:
-                DEV_MEAS_NAME,self.coms['meas'] = self.__getResponse__(COMS['meas'],iAttempt) 
+                _COMS['meas'] = COMS['meas']
             if self.args.extVSource:
-                DEV_SOURCE_NAME,self.coms['source'] = self.__getResponse__(COMS['source'],iAttempt)
+                _COMS['source'] = COMS['source']
+            for dev_type in self.args.addPort:
+                _COMS[dev_type] = COMS[dev_type]
+            for dev_type in self.args.addSocket:
+                _COMS[dev_type] = SOCKETS[dev_type]
+            responses = self.__getResponses__(_COMS,iAttempt)
+
+            if not self.args.isStandByZOnly:
+                DEV_MEAS_NAME,self.coms['meas'] = responses['meas']
+            if self.args.extVSource:
+                DEV_SOURCE_NAME,self.coms['source'] = responses['source']
             OTHER_DEV_NAMES = {}
             for dev_type in self.args.addPort:
-                OTHER_DEV_NAMES[dev_type],self.coms[dev_type] = self.__getResponse__(COMS[dev_type],iAttempt)
+                OTHER_DEV_NAMES[dev_type],self.coms[dev_type] = responses[dev_type]
             OTHER_SOCKET_NAMES = {}
             for dev_type in self.args.addSocket:    
-                OTHER_SOCKET_NAMES[dev_type],self.coms[dev_type] = self.__getResponse__(SOCKETS[dev_type],iAttempt)
+                OTHER_SOCKET_NAMES[dev_type],self.coms[dev_type] = responses[dev_type]
       
             loadStatus = {}
+            if not self.args.isStandByZOnly:
+                self.realIds['meas'] = DEV_MEAS_NAME
+            if self.args.extVSource:
+                self.realIds['source'] = DEV_SOURCE_NAME
+            for dev_type in self.args.addPort:
+                self.realIds[dev_type] = OTHER_DEV_NAMES[dev_type]
             if not self.args.isStandByZOnly:
                 if "FAILED" in DEV_MEAS_NAME:
                     loadStatus['meas'] = (self.coms['meas']['port'],0)
@@ -1113,15 +1802,7 @@ class Device:
         if 'zstation' in self.coms:
             if not self.__write__(self.__cmd__(self.coms['zstation'],"SGOTOREL",arg=self.__par__(self.coms['zstation'],"detouchPosition"),vital=False)):
                 self.__write__(self.__cmd__(self.coms['zstation'],"SGOTO",arg=self.__par__(self.coms['zstation'],"detouchPosition"),vital=True))
-            motionIsDone = False
-            runTime = 0.
-            runTimeError = 15.
-            while not motionIsDone and runTime < runTimeError:
-                time.sleep(self.sleep_time['zstation']['long'])
-                returnValue = str(self.__read__(self.__cmd__(self.coms['zstation'],"MOVE?",vital=True)))
-                if len(returnValue) != 0:
-                   motionIsDone = bool(int(returnValue))
-                runTime += self.sleep_time['zstation']['long']
+            motionIsDone = self.__waitMotion__('zstation',timeout=15.)
             self.__detectMalfunction__(motionIsDone,"zstation")
         else:
             self.log("w","If not removed manually, probe is now touching sensor.")
@@ -1190,20 +1871,21 @@ class Device:
         #Setup trigger if possible
         triggerType = self.__par__(self.coms['meas'],"triggerType") 
         if self.__read__(self.__cmd__(self.coms['meas'],"TRIGGER?")):
-            self.__write__(self.__cmd__(self.coms['meas'],"STRIGGER",arg=triggerType,vital=True))
-            if "Empty" in triggerType: #Trigger is fully programable
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERTIME",arg=str("%f"%(sampleTime)),vital=True))    
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCLEAR",arg="1"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERMDIG",arg="2"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCOUNT",arg="3, "+str(nSamples)+", 2"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERLIMITBRANCH",arg="4, ABOV, 0, "+str(self.userCurrent)+", 6"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERALWAYSBRANCH",arg="5, 7"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERSOURCE",arg="6, 0"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERDELAY",arg="7, 0.05"))
-                self.__write__(self.__cmd__(self.coms['meas'],"FILLBUFF",arg=self.__par__(self.coms['meas'],"bufferMode"),vital=True))
-            else: #minimum settings
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERDELAY",arg="0"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERTIME",arg=str("%f"%(sampleTime)),vital=True))
+            with self.__batch__('meas'):
+                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGER",arg=triggerType,vital=True))
+                if "Empty" in triggerType: #Trigger is fully programable
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERTIME",arg=str("%f"%(sampleTime)),vital=True))    
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCLEAR",arg="1"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERMDIG",arg="2"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCOUNT",arg="3, "+str(nSamples)+", 2"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERLIMITBRANCH",arg="4, ABOV, 0, "+str(self.userCurrent)+", 6"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERALWAYSBRANCH",arg="5, 7"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERSOURCE",arg="6, 0"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERDELAY",arg="7, 0.05"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"FILLBUFF",arg=self.__par__(self.coms['meas'],"bufferMode"),vital=True))
+                else: #minimum settings
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERDELAY",arg="0"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERTIME",arg=str("%f"%(sampleTime)),vital=True))
         else:
             self.log("e","Trigger is not supported by this measurement device (or commands are not specified).")
        
@@ -1239,7 +1921,7 @@ class Device:
                             time.sleep((nSamples+1)*sampleTime)                                                                                    #Wait until measurement is done
                             self.__write__(self.__cmd__(self.coms['meas'],"FILLBUFF",arg=self.__par__(self.coms['meas'],"bufferMode"),vital=True)) #Tell trigger to stop passing if buffer is full
                             _vitalTriggerOFF = True
-                        readout = self.__read__(self.__cmd__(self.coms['meas'],"READOUT?", arg="1, "+str(nSamples)+", \"defbuffer1\", READ", vital=True)) #Read data from full buffer
+                        readout = self.__readBuffer__(self.__cmd__(self.coms['meas'],"READOUT?", arg="1, "+str(nSamples)+", \"defbuffer1\", READ", vital=True)) #Read data from full buffer
                         self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERINIT",arg="OFF",vital=_vitalTriggerOFF))                         #Stop trigger
                         self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERABORT"))                                                         #Send trigger to idle state
 
@@ -1248,29 +1930,11 @@ class Device:
                             self.log("w","Readout is empty!")
                             continue
 
-                        current_readings = []
-                        readout_list = readout.split(self.__par__(self.coms['meas'],"readoutDelim",vital=True))
-                        for iread,reading in enumerate(readout_list):
-                            if self.__par__(self.coms['meas'],"readoutIdentifier") in reading and len(self.__par__(self.coms['meas'],"readoutIdentifier"))!=0 :
-                                curr = float(reading.replace(self.__par__(self.coms['meas'],"readoutIdentifier"),''))
-                                current_readings.append(curr)
-                                if self.args.verbosity > 0:
-                                    self.log("i","Current reading: "+str(curr))
-                            elif self.__par__(self.coms['meas'],"readoutIdentifier") in reading and len(self.__par__(self.coms['meas'],"readoutIdentifier"))==0: 
-                                current_readings.append(float(reading))
-                                if self.args.verbosity > 0:
-                                    self.log("i","Current reading: "+str(reading))
-
-                        current = 0.0
-                        if len(current_readings) == nSamples:
-                            current = sum(current_readings)/float(nSamples)
-                        else:
-                            if len(current_readings) == 0:
-                                self.log("e","Parsing readout from measurement device "+str(self.coms['meas']['id'])+" failed. Change readout parameters in device-specific class.")
-                                continue
-                            else:
-                                print(str(current_readings))
-                                current = sum(current_readings)/float(len(current_readings))
+                        values,nInvalid,stats = self.__processReadout__(readout)
+                        if stats['n_kept'] == 0:
+                            self.log("e","Parsing readout from measurement device "+str(self.coms['meas']['id'])+" failed. Change readout parameters in device-specific class.")
+                            continue
+                        current = stats['mean']
                         
                         #Check for current residuals
                         if abs(current) > residualCurrent:
@@ -1302,7 +1966,7 @@ class Device:
                     time.sleep((nSamples+1)*sampleTime)                                                                                    #Wait until measurement is done
                     self.__write__(self.__cmd__(self.coms['meas'],"FILLBUFF",arg=self.__par__(self.coms['meas'],"bufferMode"),vital=True)) #Tell trigger to stop passing if buffer is full
                     _vitalTriggerOFF = True
-                readout = self.__read__(self.__cmd__(self.coms['meas'],"READOUT?", arg="1, "+str(nSamples)+", \"defbuffer1\", READ", vital=True))  #Read data from full buffer
+                readout = self.__readBuffer__(self.__cmd__(self.coms['meas'],"READOUT?", arg="1, "+str(nSamples)+", \"defbuffer1\", READ", vital=True))  #Read data from full buffer
                 self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERINIT",arg="OFF",vital=_vitalTriggerOFF))                         #Stop trigger
                 self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERABORT"))                                                         #Send trigger to idle state
 
@@ -1311,28 +1975,11 @@ class Device:
                     self.log("w","Readout is empty!")
                     continue
 
-                current_readings = []
-                readout_list = readout.split(self.__par__(self.coms['meas'],"readoutDelim"))
-                for iread,reading in enumerate(readout_list):
-                    if self.__par__(self.coms['meas'],"readoutIdentifier") in reading and len(self.__par__(self.coms['meas'],"readoutIdentifier")) != 0:
-                        curr = float(reading.replace(self.__par__(self.coms['meas'],"readoutIdentifier",vital=True),''))
-                        current_readings.append(curr)
-                        if self.args.verbosity > 0:
-                            self.log("i","Current reading: "+str(curr))
-                    elif self.__par__(self.coms['meas'],"readoutIdentifier") in reading and len(self.__par__(self.coms['meas'],"readoutIdentifier"))==0:
-                        current_readings.append(float(reading))
-                        if self.args.verbosity > 0:
-                            self.log("i","Current reading: "+str(reading))
-
-                current = 0.0
-                if len(current_readings) == nSamples:
-                    current = sum(current_readings)/float(nSamples)
-                else:
-                    if len(current_readings) == 0:
-                        self.log("e","Parsing readout from measurement device "+str(self.coms['meas']['id'])+" failed. Change readout parameters in device-specific class.")
-                        continue
-                    else:
-                        current = sum(current_readings)/float(len(current_readings))
+                values,nInvalid,stats = self.__processReadout__(readout)
+                if stats['n_kept'] == 0:
+                    self.log("e","Parsing readout from measurement device "+str(self.coms['meas']['id'])+" failed. Change readout parameters in device-specific class.")
+                    continue
+                current = stats['mean']
 
                 #Check for current residuals
                 if abs(current) > residualCurrent:
@@ -1358,15 +2005,7 @@ class Device:
         if 'zstation' in self.coms:
             if not self.__write__(self.__cmd__(self.coms['zstation'],"SGOTOREL",arg=self.__par__(self.coms['zstation'],"detouchPosition"),vital=False)):
                 self.__write__(self.__cmd__(self.coms['zstation'],"SGOTO",arg=self.__par__(self.coms['zstation'],"detouchPosition"),vital=True))
-            motionIsDone = False
-            runTime = 0.
-            runTimeError = 15.
-            while not motionIsDone and runTime < runTimeError:
-                time.sleep(self.sleep_time['zstation']['long'])
-                returnValue = str(self.__read__(self.__cmd__(self.coms['zstation'],"MOVE?",vital=True)))
-                if len(returnValue) != 0:
-                    motionIsDone = bool(int(returnValue))
-                runTime += self.sleep_time['zstation']['long']
+            motionIsDone = self.__waitMotion__('zstation',timeout=15.)
             self.__detectMalfunction__(motionIsDone,"zstation")
         else:
             self.log("w","If not removed manually, probe is now touching sensor.")
@@ -1407,15 +2046,7 @@ class Device:
                         #Return z-station to bottom position before finalizing measurement
                         if 'zstation' in self.coms:
                             self.__write__(self.__cmd__(self.coms['zstation'],"SGOTO",arg=self.__par__(self.coms['zstation'],"bottomPosition"),vital=True))
-                            motionIsDone = False
-                            runTime = 0.
-                            runTimeError = 21.
-                            while not motionIsDone and runTime < runTimeError:
-                                time.sleep(self.sleep_time['zstation']['long'])
-                                returnValue = str(self.__read__(self.__cmd__(self.coms['zstation'],"MOVE?",vital=True)))
-                                if len(returnValue) != 0:
-                                    motionIsDone = bool(int(returnValue))
-                                runTime += self.sleep_time['zstation']['long']
+                            motionIsDone = self.__waitMotion__('zstation',timeout=21.)
                             self.__detectMalfunction__(motionIsDone,"zstation")
                         else:
                             self.log("h","Probe is still touching sensor!")   
@@ -1425,14 +2056,11 @@ class Device:
                         return False
 
                     #dry run needed
-                    self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-                    self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-                    self.__read__(self.__cmd__(self.coms['probe'],"LUMI?",vital=True))
+                    self.__readEnviro__("box")
 
                     #real run
-                    initTemp0 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-                    initHumi = self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-                    initLumi = self.__read__(self.__cmd__(self.coms['probe'],"LUMI?",vital=True))
+                    _enviro = self.__readEnviro__("box")
+                    initTemp0,initHumi,initLumi = _enviro['temp1'],_enviro['humi'],_enviro['lumi']
                     reqTemp = self.__par__(self.coms['probe'],"reqTemp")
                     reqHumi = self.__par__(self.coms['probe'],"reqHumi")
                     reqLumi = self.__par__(self.coms['probe'],"reqLumi")
@@ -1496,20 +2124,9 @@ class Device:
         enviro['minute'] = str(now.minute)
         enviro['second'] = str(now.second) 
         if dev_type in self.args.addSocket or dev_type in self.args.addPort:
-            if mtype == "all":
-                preTemp0 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-                preTemp1 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP1?"))
-                preTemp2 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP2?"))
-                preHumi = self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-                preLumi = self.__read__(self.__cmd__(self.coms['probe'],"LUMI?",vital=True))
-            elif mtype == "temp":
-                preTemp0 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-                preTemp1 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP1?"))
-                preTemp2 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP2?"))
-            elif mtype == "humi":
-                preHumi = self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-            elif mtype == "lumi":
-                preLumi = self.__read__(self.__cmd__(self.coms['probe'],"LUMI?",vital=True))
+            if mtype in ["all","temp","humi","lumi"]:
+                _enviro = self.__readEnviro__(mtype)
+                preTemp0,preTemp1,preTemp2,preHumi,preLumi = _enviro['temp1'],_enviro['temp2'],_enviro['temp3'],_enviro['humi'],_enviro['lumi']
 
         enviro['temp1'] = preTemp0
         enviro['temp2'] = preTemp1
@@ -1556,11 +2173,7 @@ class Device:
                 self.__terminate__("EXIT")
 
         #clear buffer
-        self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-        self.__read__(self.__cmd__(self.coms['probe'],"TEMP1?"))
-        self.__read__(self.__cmd__(self.coms['probe'],"TEMP2?"))
-        self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-        self.__read__(self.__cmd__(self.coms['probe'],"LUMI?",vital=True))
+        self.__readEnviro__("all")
 
         #Read out enviro data
         enviro = []
@@ -1576,11 +2189,7 @@ class Device:
                         _enviro['minute'] = str(now.minute)
                         _enviro['second'] = str(now.second)
                         if mtype == "all":
-                            _enviro['temp1'] = self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-                            _enviro['temp2'] = self.__read__(self.__cmd__(self.coms['probe'],"TEMP1?"))
-                            _enviro['temp3'] = self.__read__(self.__cmd__(self.coms['probe'],"TEMP2?"))
-                            _enviro['humi'] = self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-                            _enviro['lumi'] = self.__read__(self.__cmd__(self.coms['probe'],"LUMI?",vital=True)) 
+                            _enviro.update(self.__readEnviro__("all")) 
 
                             self.log("i","Temperature CH0:   "+str(_enviro['temp1']))
                             self.log("i","Temperature CH1:   "+str(_enviro['temp2']))
@@ -1588,32 +2197,21 @@ class Device:
                             self.log("i","Relative humidity: "+str(_enviro['humi'])+"%")
                             self.log("i","Lux:               "+str(_enviro['lumi']))
                         elif mtype == "temp":
-                            _enviro['temp1'] = self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-                            _enviro['temp2'] = self.__read__(self.__cmd__(self.coms['probe'],"TEMP1?"))
-                            _enviro['temp3'] = self.__read__(self.__cmd__(self.coms['probe'],"TEMP2?"))
-                            _enviro['humi'] = "N/A"
-                            _enviro['lumi'] = "N/A"                         
+                            _enviro.update(self.__readEnviro__("temp"))                         
 
                             self.log("i","Temperature CH0:   "+str(_enviro['temp1']))
                             self.log("i","Temperature CH1:   "+str(_enviro['temp2']))
                             self.log("i","Temperature CH2:   "+str(_enviro['temp3']))
                         elif mtype == "humi":
-                            _enviro['temp1'] = "N/A"
-                            _enviro['temp2'] = "N/A"
-                            _enviro['temp3'] = "N/A"
-                            _enviro['humi'] = self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-                            _enviro['lumi'] = "N/A"
+                            _enviro.update(self.__readEnviro__("humi"))
 
                             self.log("i","Relative humidity: "+str(_enviro['humi'])+"%")
                         elif mtype == "lumi":
-                            _enviro['temp1'] = "N/A"
-                            _enviro['temp2'] = "N/A"
-                            _enviro['temp3'] = "N/A"
-                            _enviro['humi'] = "N/A"
-                            _enviro['lumi'] = self.__read__(self.__cmd__(self.coms['probe'],"LUMI?",vital=True))
+                            _enviro.update(self.__readEnviro__("lumi"))
                               
                             self.log("i","Lux:               "+str(_enviro['lumi']))
                         enviro.append(_enviro)
+                        self.__streamPoint__(_enviro)
                         time.sleep(timeStep)
                 else:
                     while True:
@@ -1625,11 +2223,7 @@ class Device:
                         _enviro['minute'] = str(now.minute)
                         _enviro['second'] = str(now.second)
                         if mtype == "all":
-                            _enviro['temp1'] = self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-                            _enviro['temp2'] = self.__read__(self.__cmd__(self.coms['probe'],"TEMP1?"))
-                            _enviro['temp3'] = self.__read__(self.__cmd__(self.coms['probe'],"TEMP2?"))
-                            _enviro['humi'] = self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-                            _enviro['lumi'] = self.__read__(self.__cmd__(self.coms['probe'],"LUMI?",vital=True))
+                            _enviro.update(self.__readEnviro__("all"))
 
                             self.log("i","Temperature CH0:   "+str(_enviro['temp1']))
                             self.log("i","Temperature CH1:   "+str(_enviro['temp2']))
@@ -1637,33 +2231,23 @@ class Device:
                             self.log("i","Relative humidity: "+str(_enviro['humi'])+"%")
                             self.log("i","Lux:               "+str(_enviro['lumi'])) 
                         elif mtype == "temp":
-                            _enviro['temp1'] = self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-                            _enviro['temp2'] = self.__read__(self.__cmd__(self.coms['probe'],"TEMP1?"))
-                            _enviro['temp3'] = self.__read__(self.__cmd__(self.coms['probe'],"TEMP2?"))
-                            _enviro['humi'] = "N/A"
-                            _enviro['lumi'] = "N/A"
+                            _enviro.update(self.__readEnviro__("temp"))
 
                             self.log("i","Temperature CH0:   "+str(_enviro['temp1']))
                             self.log("i","Temperature CH1:   "+str(_enviro['temp2']))
                             self.log("i","Temperature CH2:   "+str(_enviro['temp3']))
                         elif mtype == "humi":
-                            _enviro['temp1'] = "N/A"
-                            _enviro['temp2'] = "N/A"
-                            _enviro['temp3'] = "N/A"
-                            _enviro['humi'] = self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-                            _enviro['lumi'] = "N/A"
+                            _enviro.update(self.__readEnviro__("humi"))
 
                             self.log("i","Relative humidity: "+str(_enviro['humi'])+"%")
                         elif mtype == "lumi":
-                            _enviro['temp1'] = "N/A"
-                            _enviro['temp2'] = "N/A"
-                            _enviro['temp3'] = "N/A"
-                            _enviro['humi'] = "N/A"
-                            _enviro['lumi'] = self.__read__(self.__cmd__(self.coms['probe'],"LUMI?",vital=True))
+                            _enviro.update(self.__readEnviro__("lumi"))
 
                             self.log("i","Lux:               "+str(_enviro['lumi']))
                         time.sleep(timeStep)
                         enviro.append(_enviro)
+                        self.__streamPoint__(_enviro)
+                        self.__trimPoints__(enviro)
         except KeyboardInterrupt:
             self.log("w","Continuous environmental measurement interrupted.")
             pass
@@ -1709,6 +2293,9 @@ class Device:
         #Set remote control
         self.__setRemote__()
 
+        #Sample enviro in background
+        self.__startEnviroSampler__()
+
         #Crosscheck interlock
         self.__checkInterlock__(safeMode=True)
 
@@ -1813,20 +2400,21 @@ class Device:
         #Setup trigger if possible
         triggerType = self.__par__(self.coms['meas'],"triggerType")
         if self.__read__(self.__cmd__(self.coms['meas'],"TRIGGER?")):
-            self.__write__(self.__cmd__(self.coms['meas'],"STRIGGER",arg=triggerType,vital=True))
-            if "Empty" in triggerType: #Trigger is fully programable
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERTIME",arg=str("%f"%(sampleTime)),vital=True))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCLEAR",arg="1"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERMDIG",arg="2"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCOUNT",arg="3, "+str(nSamples)+", 2"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERLIMITBRANCH",arg="4, IN, "+str(self.maxCurrent)+", 1e-2, 6"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERALWAYSBRANCH",arg="5, 7"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERSOURCE",arg="6, 0"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERDELAY",arg="7, 1.0"))
-                self.__write__(self.__cmd__(self.coms['meas'],"FILLBUFF",arg=self.__par__(self.coms['meas'],"bufferMode"),vital=True))
-            else: #minimum settings
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERDELAY",arg="0"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERTIME",arg=str("%f"%(sampleTime)),vital=True))
+            with self.__batch__('meas'):
+                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGER",arg=triggerType,vital=True))
+                if "Empty" in triggerType: #Trigger is fully programable
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERTIME",arg=str("%f"%(sampleTime)),vital=True))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCLEAR",arg="1"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERMDIG",arg="2"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCOUNT",arg="3, "+str(nSamples)+", 2"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERLIMITBRANCH",arg="4, IN, "+str(self.maxCurrent)+", 1e-2, 6"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERALWAYSBRANCH",arg="5, 7"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERSOURCE",arg="6, 0"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERDELAY",arg="7, 1.0"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"FILLBUFF",arg=self.__par__(self.coms['meas'],"bufferMode"),vital=True))
+                else: #minimum settings
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERDELAY",arg="0"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERTIME",arg=str("%f"%(sampleTime)),vital=True))
         else:
             self.log("e","Trigger is not supported by this measurement device (or commands are not specified).")
 
@@ -1836,28 +2424,14 @@ class Device:
 
         #Accomodating for charging time
         self.log("i","Charging time...")
-        time.sleep(self.__chargingTime__(0.,float(biasPoint)))
+        self.__waitCharging__(source_dev,0.,float(biasPoint))
         self.log("i","Released.") 
 
-        #Read out enviro data
-        enviro = {}
-        preTemp0,preTemp1,preTemp2,preHumi,preLumi = "N/A","N/A","N/A","N/A","N/A"
-        if 'probe' in self.args.addSocket or 'probe' in self.args.addPort:
-            preTemp0 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-            preTemp1 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP1?"))
-            preTemp2 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP2?"))
-            preHumi = self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-            preLumi = self.__read__(self.__cmd__(self.coms['probe'],"LUMI?",vital=True))
-        enviro['temp1'] = preTemp0
-        enviro['temp2'] = preTemp1
-        enviro['temp3'] = preTemp2
-        enviro['humi'] = preHumi
-        enviro['lumi'] = preLumi
-        self.log("i","Temperature CH0 before measurement: "+str(preTemp0))
-        self.log("i","Temperature CH1 before measurement: "+str(preTemp1))
-        self.log("i","Temperature CH2 before measurement: "+str(preTemp2))
-        self.log("i","Humidity before measurement: "+str(preHumi))
-        self.log("i","Lumi before measurement: "+str(preLumi))
+        #Read out enviro data (taken from background snapshots during acquisition if sampler runs)
+        acqStart = time.time()
+        if self.enviroSampler is None:
+            enviro = self.__enviroPoint__("all")
+            self.__logEnviro__(enviro,"before")
 
         #Read out measurement data
         readout = ""
@@ -1868,23 +2442,18 @@ class Device:
             time.sleep((nSamples+1)*sampleTime)                                                                                    #Wait until measurement is done
             self.__write__(self.__cmd__(self.coms['meas'],"FILLBUFF",arg=self.__par__(self.coms['meas'],"bufferMode"),vital=True)) #Tell trigger to stop passing if buffer is full
             _vitalTriggerOFF = True
-        readout = self.__read__(self.__cmd__(self.coms['meas'],"READOUT?", arg="1, "+str(nSamples)+", \"defbuffer1\", READ", vital=True))  #Read data from full buffer
+        readout = self.__readBuffer__(self.__cmd__(self.coms['meas'],"READOUT?", arg="1, "+str(nSamples)+", \"defbuffer1\", READ", vital=True))  #Read data from full buffer
         self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERINIT",arg="OFF",vital=_vitalTriggerOFF))                         #Stop trigger
         self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERABORT"))                                                         #Send trigger to idle state
+        if self.enviroSampler is not None:
+            enviro = self.__enviroPoint__("all",acqStart,time.time())
+            self.__logEnviro__(enviro,"during")
 
         #Return z-station to bottom position before finalizing measurement if it is last IV measurement
         if 'zstation' in self.coms and isLast:
             self.log("i","Cleaning after last measurement")
             self.__write__(self.__cmd__(self.coms['zstation'],"SGOTO",arg=self.__par__(self.coms['zstation'],"bottomPosition"),vital=True))
-            motionIsDone = False
-            runTime = 0.
-            runTimeError = 21.
-            while not motionIsDone and runTime < runTimeError:
-                time.sleep(self.sleep_time['zstation']['long'])
-                returnValue = str(self.__read__(self.__cmd__(self.coms['zstation'],"MOVE?",vital=True)))
-                if len(returnValue) != 0:
-                    motionIsDone = bool(int(returnValue))
-                runTime += self.sleep_time['zstation']['long']
+            motionIsDone = self.__waitMotion__('zstation',timeout=21.)
             self.__detectMalfunction__(motionIsDone,"zstation")
         else:
             if not isLast:
@@ -1900,33 +2469,20 @@ class Device:
             if self.args.verbosity > 1:
                 self.log("i",str(readout))
 
-        current_readings = []
-        readout_list = readout.split(self.__par__(self.coms['meas'],"readoutDelim"))
-        for iread,reading in enumerate(readout_list):
-            if self.__par__(self.coms['meas'],"readoutIdentifier") in reading and len(self.__par__(self.coms['meas'],"readoutIdentifier")) != 0:
-                curr = float(reading.replace(self.__par__(self.coms['meas'],"readoutIdentifier"),''))
-                current_readings.append(curr)
-                if self.args.verbosity > 0:
-                    self.log("i","Current reading: "+str(curr))
-            elif self.__par__(self.coms['meas'],"readoutIdentifier") in reading and len(self.__par__(self.coms['meas'],"readoutIdentifier"))==0:
-                current_readings.append(float(reading))
-                if self.args.verbosity > 0:
-                    self.log("i","Current reading: "+str(reading))
-
+        values,nInvalid,stats = self.__processReadout__(readout)
         current = 0.0
-        if len(current_readings) == nSamples:
-            current = sum(current_readings)/float(nSamples)
+        if stats['n_kept'] == 0:
+            self.log("e","Parsing readout from measurement device "+str(self.coms['meas']['id'])+" failed. Change readout parameters in device-specific class.")
+            self.__terminate__("EXIT")
         else:
-            if len(current_readings) == 0:
-                self.log("e","Parsing readout from measurement device "+str(self.coms['meas']['id'])+" failed. Change readout parameters in device-specific class.")
-                self.__terminate__("EXIT")
-            else:    
-                current = sum(current_readings)/float(len(current_readings))
+            current = stats['mean']
+        self.lastStats = Readout.summary(stats)
 
         #Run post routine if there is one specified
 
         #Finalize measurement
         if isLast: 
+            self.__stopEnviroSampler__()
             try: 
                 self.__terminate__()
             except OSError:
@@ -1972,6 +2528,9 @@ class Device:
         #Set remote control
         self.__setRemote__()
 
+        #Sample enviro in background
+        self.__startEnviroSampler__()
+
         #Crosscheck interlock
         self.__checkInterlock__(safeMode=True)
 
@@ -2032,32 +2591,38 @@ class Device:
 
         #Setup trigger if possible
         triggerType = self.__par__(self.coms['meas'],"triggerType")
+        settle = self.__settleSettings__(nSamples)
         if self.__read__(self.__cmd__(self.coms['meas'],"TRIGGER?")):
-            self.__write__(self.__cmd__(self.coms['meas'],"STRIGGER",arg=triggerType,vital=True))
-            if "Empty" in triggerType: #Trigger is fully programable
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERTIME",arg=str("%f"%(sampleTime)),vital=True))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCLEAR",arg="1"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERMDIG",arg="2"))
-                #self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCOUNT",arg="3, "+str(nSamples)+", 2"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCOUNT",arg="3, "+str(int(self.__par__(self.coms['meas'],"maxNSamples"))*2)+", 2"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERLIMITBRANCH",arg="4, IN, "+str(self.maxCurrent)+", 1e-2, 6"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERALWAYSBRANCH",arg="5, 7"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERSOURCE",arg="6, 0"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERDELAY",arg="7, 0.05"))
-                self.__write__(self.__cmd__(self.coms['meas'],"FILLBUFF",arg=self.__par__(self.coms['meas'],"bufferMode"),vital=True))
-            else: #minimum settings
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERDELAY",arg="0"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERTIME",arg=str("%f"%(sampleTime)),vital=True))
+            with self.__batch__('meas'):
+                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGER",arg=triggerType,vital=True))
+                if "Empty" in triggerType: #Trigger is fully programable
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERTIME",arg=str("%f"%(sampleTime)),vital=True))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCLEAR",arg="1"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERMDIG",arg="2"))
+                    #self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCOUNT",arg="3, "+str(nSamples)+", 2"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCOUNT",arg="3, "+str(settle['nTrigger'])+", 2"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERLIMITBRANCH",arg="4, IN, "+str(self.maxCurrent)+", 1e-2, 6"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERALWAYSBRANCH",arg="5, 7"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERSOURCE",arg="6, 0"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERDELAY",arg="7, 0.05"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"FILLBUFF",arg=self.__par__(self.coms['meas'],"bufferMode"),vital=True))
+                else: #minimum settings
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERDELAY",arg="0"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERTIME",arg=str("%f"%(sampleTime)),vital=True))
         else:
             self.log("e","Trigger is not supported by this measurement device (or commands are not specified).")
 
+        #Shadow state is rebuilt for every sweep
+        self.shadow = {}
+        self.skippedRoundTrips = 0
+
         #Turn on bias!!!
         self.log("i","Turning ON high-voltage source for "+source_dev_info+".")
         self.__write__(self.__cmd__(self.coms[source_dev],"SOURCE",arg="ON",vital=True))    
 
         #Loop over bias values
         currentOverflow = False
-        results = { 'data' : [], 'enviro' : [] }
+        results = { 'data' : [], 'enviro' : [], 'stats' : [] }
         for ibias,biasPoint in enumerate(biasRange):
             #Set Bias #FIXME in principle after setting current range and limits
             self.__write__(self.__cmd__(self.coms[source_dev],"SVOLT",arg=str(biasPoint),vital=True))
@@ -2070,18 +2635,18 @@ class Device:
                 #Accomodating for charging time
                 self.log("i","Charging time...")
                 if ibias == 0:
-                    time.sleep(self.__chargingTime__(0.,float(biasPoint)))
+                    self.__waitCharging__(source_dev,0.,float(biasPoint))
                 else:
-                    time.sleep(self.__chargingTime__(float(biasRange[ibias-1]),float(biasPoint)))
+                    self.__waitCharging__(source_dev,float(biasRange[ibias-1]),float(biasPoint))
                 self.log("i","Released.")
 
             #Adjusting current range for measurement device in case of non-autoRange settings
-            isAuto = bool(int(self.__read__(self.__cmd__(self.coms['meas'],"SCAUTORANGE?"))))
+            isAuto = bool(int(self.__read__(self.__cmd__(self.coms['meas'],"SCAUTORANGE?"),cached=True)))
             if not isAuto:
                 self.log("i","IV measurement: Current AUTO range disabled.")
-                self.__write__(self.__cmd__(self.coms['meas'],"SSCRANGE", arg=str(self.__getCurrentRange__(float(biasPoint)))))
+                self.__write__(self.__cmd__(self.coms['meas'],"SSCRANGE", arg=str(self.__getCurrentRange__(float(biasPoint)))),cached=True)
                 if self.args.verbosity > 0:
-                    setCurrRange = self.__read__(self.__cmd__(self.coms['meas'],"SCRANGE?"))
+                    setCurrRange = self.__read__(self.__cmd__(self.coms['meas'],"SCRANGE?"),cached=True)
                     if setCurrRange:
                         self.log("i","IV measurement: Current range set by user to: "+str(setCurrRange)+".")
             else:
@@ -2090,66 +2655,36 @@ class Device:
             #Setting source current limits when autoRange is OFF
             #FIXME: in principle to be done before really setting current range by knowing future current range value  
             if self.args.extVSource and not isAuto:
-                self.__write__(self.__cmd__(self.coms['source'],"LIMSTAT",arg="ON")) #Enable changing limits if needed
+                self.__write__(self.__cmd__(self.coms['source'],"LIMSTAT",arg="ON"),cached=True) #Enable changing limits if needed
                 if self.__par__(self.coms['source'],"climitCheckable",vital=True):
-                    current_range = float(self.__read__(self.__cmd__(self.coms['meas'],"SCRANGE?")))
+                    current_range = float(self.__read__(self.__cmd__(self.coms['meas'],"SCRANGE?"),cached=True))
                     safe_current_limit = self.__getCurrentLimit__(current_range, float(self.maxCurrent))
-                    self.__write__(self.__cmd__(self.coms['source'],"SCURRLIM",arg=safe_current_limit,vital=True)) #Set maximum current limit
+                    self.__write__(self.__cmd__(self.coms['source'],"SCURRLIM",arg=safe_current_limit,vital=True),cached=True) #Set maximum current limit
                 if self.args.verbosity > 0:
-                    limCSet = self.__read__(self.__cmd__(self.coms['source'],"CURRLIM?"))
+                    limCSet = self.__read__(self.__cmd__(self.coms['source'],"CURRLIM?"),cached=True)
                     limCDef = self.__par__(self.coms['source'],"defCurrent")
                     if limCSet:
                         self.log("i","Measurement device Source Output Current limit was specified (manufacturer) to "+str(limCDef)+".")
                         self.log("i","Measurement device Source Output Current limit was set (user) to "+str(limCSet)+".")
             elif not isAuto:
-                self.__write__(self.__cmd__(self.coms['meas'],"LIMSTAT",arg="ON")) #Enable changing limits if needed
+                self.__write__(self.__cmd__(self.coms['meas'],"LIMSTAT",arg="ON"),cached=True) #Enable changing limits if needed
                 if self.__par__(self.coms['meas'],"climitCheckable",vital=True):
-                    current_range = float(self.__read__(self.__cmd__(self.coms['meas'],"SCRANGE?")))
+                    current_range = float(self.__read__(self.__cmd__(self.coms['meas'],"SCRANGE?"),cached=True))
                     safe_current_limit = self.__getCurrentLimit__(current_range, float(self.maxCurrent))
-                    self.__write__(self.__cmd__(self.coms['meas'],"SCURRLIM",arg=safe_current_limit,vital=True)) #Set maximum current limit
+                    self.__write__(self.__cmd__(self.coms['meas'],"SCURRLIM",arg=safe_current_limit,vital=True),cached=True) #Set maximum current limit
                 if self.args.verbosity > 0:
-                    limCSet = self.__read__(self.__cmd__(self.coms['meas'],"CURRLIM?"))
+                    limCSet = self.__read__(self.__cmd__(self.coms['meas'],"CURRLIM?"),cached=True)
                     limCDef = self.__par__(self.coms['meas'],"defCurrent")
                     if limCSet:
                         self.log("i","Measurement device Source Output Current limit was specified (manufacturer) to "+str(limCDef)+".")
                         self.log("i","Measurement device Source Output Current limit was set (user) to "+str(limCSet)+".")    
 
-            #Read out enviro data
-            enviro = {}
-            preTemp0,preTemp1,preTemp2,preHumi,preLumi = "N/A","N/A","N/A","N/A","N/A"
-            if 'probe' in self.args.addSocket or 'probe' in self.args.addPort:
-                #dry run needed
-                if not self.args.probeFast:
-                    self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-                    self.__read__(self.__cmd__(self.coms['probe'],"TEMP1?"))
-                    self.__read__(self.__cmd__(self.coms['probe'],"TEMP2?"))
-                    self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-                    self.__read__(self.__cmd__(self.coms['probe'],"LUMI?",vital=True))
-
-                #real run 
-                if self.args.probeFast:
-                    preTemp0 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-                    preTemp1 = 'N/A'
-                    preTemp2 = 'N/A'
-                    preHumi = self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-                    preLumi = 'N/A'
-                else:
-                    preTemp0 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-                    preTemp1 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP1?"))
-                    preTemp2 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP2?"))
-                    preHumi = self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-                    preLumi = self.__read__(self.__cmd__(self.coms['probe'],"LUMI?",vital=True))
-            enviro['temp1'] = preTemp0
-            enviro['temp2'] = preTemp1
-            enviro['temp3'] = preTemp2
-            enviro['humi']  = preHumi
-            enviro['lumi']  = preLumi
-            if self.args.verbosity > 1:
-                self.log("i","Temperature CH0 before measurement: "+str(preTemp0))
-                self.log("i","Temperature CH1 before measurement: "+str(preTemp1))
-                self.log("i","Temperature CH2 before measurement: "+str(preTemp2))
-                self.log("i","Humidity before measurement: "+str(preHumi))
-                self.log("i","Lumi before measurement: "+str(preLumi))    
+            #Read out enviro data (taken from background snapshots during acquisition if sampler runs)
+            acqStart = time.time()
+            if self.enviroSampler is None:
+                enviro = self.__enviroPoint__("fast" if self.args.probeFast else "all",dryRun=not self.args.probeFast)
+                if self.args.verbosity > 1:
+                    self.__logEnviro__(enviro,"before")
 
             #Read out measurement data and store in buffer
             readout = ""
@@ -2160,42 +2695,44 @@ class Device:
                 #Accomodating for charging time
                 self.log("i","Charging time...")
                 if ibias == 0:
-                    time.sleep(self.__chargingTime__(0.,float(biasPoint)))
+                    self.__waitCharging__(source_dev,0.,float(biasPoint))
                 else:
-                    time.sleep(self.__chargingTime__(float(biasRange[ibias-1]),float(biasPoint)))
+                    self.__waitCharging__(source_dev,float(biasRange[ibias-1]),float(biasPoint))
                 self.log("i","Released.")   
-            self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERINIT",arg="ON",vital=True))                                      #Initialize trigger on measurement device if needed
             _vitalTriggerOFF = False
             if "Empty" not in triggerType:
+                self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERINIT",arg="ON",vital=True))                                  #Initialize trigger on measurement device if needed
                 time.sleep((nSamples+1)*sampleTime)                                                                                    #Wait until measurement is done
                 self.__write__(self.__cmd__(self.coms['meas'],"FILLBUFF",arg=self.__par__(self.coms['meas'],"bufferMode"),vital=True)) #Tell trigger to stop passing if buffer is full
                 _vitalTriggerOFF = True
+                lastIdx = int(self.__par__(self.coms['meas'],"maxNSamples"))+nSamples-1
+                readoutRange = str(self.__par__(self.coms['meas'],"maxNSamples"))+", "+str(lastIdx)
+                self.__waitBuffer__('meas',lastIdx)
+                readout = self.__readBuffer__(self.__cmd__(self.coms['meas'],"READOUT?", arg=readoutRange+", \"defbuffer1\", READ", vital=True)) 
+                self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERINIT",arg="OFF",vital=False))                                #Stop trigger (not needed)
+                self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERABORT"))                                                     #Send trigger to idle state
             else:
-                bufferTime = (int(self.__par__(self.coms['meas'],"maxNSamples"))*4+5)*(sampleTime/60.)
-                self.log("i","Filling buffer... ( waiting time ~"+str(bufferTime)+"s)")
-                time.sleep(bufferTime)
-            triggIsIdleString = self.__par__(self.coms['meas'],"triggerIdle")
-            lastIdx = int(self.__par__(self.coms['meas'],"maxNSamples"))+nSamples-1
-            minIdx = min(int(self.__par__(self.coms['meas'],"maxNSamples"))+nSamples-1, lastIdx)
-            readoutRange = str(self.__par__(self.coms['meas'],"maxNSamples"))+", "+str(minIdx)
-            minInBuffer = int(self.__par__(self.coms['meas'],"maxNSamples"))*2
- 
-            #Read out buffer
-            currInBuffer = 0 
-            while True:
-                try:
-                    time.sleep(3) 
-                    currInBuffer = int(self.__read__(self.__cmd__(self.coms['meas'],"INBUFFER?"))) 
-                    self.log("i","Readouts in buffer: "+str(currInBuffer)) 
-                    if currInBuffer >= minInBuffer: break
-                except ValueError:
-                    self.log("i","Readouts in buffer: "+str(currInBuffer))
-                    pass   
-            readout = self.__read__(self.__cmd__(self.coms['meas'],"READOUT?", arg=readoutRange+", \"defbuffer1\", READ", vital=True)) 
-            if str(readout) == currInBuffer:
-                readout = self.__read__(self.__cmd__(self.coms['meas'],"READOUT?", arg=readoutRange+", \"defbuffer1\", READ", vital=True))  
-            self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERINIT",arg="OFF",vital=False))                                    #Stop trigger (not needed)
-            self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERABORT"))                                                         #Send trigger to idle state
+                #Settle: discard readings until stable (window mode)
+                if settle['mode'] == "WINDOW":
+                    nDiscarded = 0
+                    isStable = False
+                    while not isStable and nDiscarded < settle['maxCount']:
+                        window = self.__parseReadout__(self.__acquireBuffer__(settle['window'],1,settle['window'],sampleTime))
+                        nDiscarded += settle['window']
+                        isStable = self.__isStable__(window,settle['tolerance'])
+                    if not isStable:
+                        self.log("w","Current not stable within "+str(nDiscarded)+" readouts. Acquiring anyway.")
+                    elif self.args.verbosity > 0:
+                        self.log("i","Settling done after "+str(nDiscarded)+" discarded readouts.")
+
+                #Acquire: exactly nSamples after fixed number of discarded readings
+                self.log("i","Filling buffer... ("+str(settle['nDiscard'])+" discarded + "+str(nSamples)+" readouts)")
+                readout = self.__acquireBuffer__(settle['nTrigger'],settle['nDiscard']+1,settle['nDiscard']+nSamples,sampleTime)
+
+            if self.enviroSampler is not None:
+                enviro = self.__enviroPoint__("fast" if self.args.probeFast else "all",acqStart,time.time())
+                if self.args.verbosity > 1:
+                    self.__logEnviro__(enviro,"during")
 
             #Process and store results
             if len(readout) == 0:
@@ -2205,40 +2742,20 @@ class Device:
                 if self.args.verbosity > 1:
                     self.log("i",str(readout))
 
-            current_readings = []
-            readout_list = readout.split(self.__par__(self.coms['meas'],"readoutDelim"))
-            for iread,reading in enumerate(readout_list):
-                if self.__par__(self.coms['meas'],"readoutIdentifier") in reading and len(self.__par__(self.coms['meas'],"readoutIdentifier")) != 0:
-                    try:
-                        curr = float(reading.replace(self.__par__(self.coms['meas'],"readoutIdentifier"),''))
-                    except ValueError:
-                        self.log("w","Incorrect value returned on readout.")
-                        self.__terminate__("EXIT")
-                    current_readings.append(curr)
-                    if self.args.verbosity > 0:
-                        self.log("i","Current reading: "+str(curr))
-                elif self.__par__(self.coms['meas'],"readoutIdentifier") in reading and len(self.__par__(self.coms['meas'],"readoutIdentifier"))==0:
-                    try:
-                        current_readings.append(float(reading))
-                    except ValueError:
-                        self.log("w","Incorrect value returned on readout.")
-                        self.__terminate__("EXIT")
-                    if self.args.verbosity > 0:
-                        self.log("i","Current reading: "+str(reading))        
-
+            values,nInvalid,stats = self.__processReadout__(readout,sigma=0.15)
+            if nInvalid > 0:
+                self.log("w","Incorrect value returned on readout.")
+                self.__terminate__("EXIT")
             current = 0.0
-            current_readings = self.__checkReadout__(current_readings)
-            if len(current_readings) == nSamples:
-                current = sum(current_readings)/float(nSamples)
+            if stats['n_kept'] == 0:
+                self.log("w","BiasPoint: "+str(biasPoint)+": Parsing readout from measurement device "+str(self.coms['meas']['id'])+" failed. Change readout parameters in device-specific class.")
+                current = "N/A"
             else:
-                if len(current_readings) == 0:
-                    self.log("w","BiasPoint: "+str(biasPoint)+": Parsing readout from measurement device "+str(self.coms['meas']['id'])+" failed. Change readout parameters in device-specific class.")
-                    current = "N/A"
-                    #self.__terminate__("EXIT")
-                else:
-                    current = sum(current_readings)/float(len(current_readings))
+                current = stats['mean']
+            results['stats'].append(Readout.summary(stats))
             results['data'].append((current,biasPoint))    
             results['enviro'].append(enviro)
+            self.__streamPoint__(enviro,(current,biasPoint),results['stats'][-1])
 
             #Emergency break loop in case of amps exceeding maximum user set level 
             if abs(current) > abs(float(self.userCurrent))*1e-6: 
@@ -2256,15 +2773,7 @@ class Device:
         if ('zstation' in self.coms and isLast) or ('zstation' in self.coms and currentOverflow):
             self.log("i","Cleaning after last measurement") 
             self.__write__(self.__cmd__(self.coms['zstation'],"SGOTO",arg=self.__par__(self.coms['zstation'],"bottomPosition"),vital=True))
-            motionIsDone = False
-            runTime = 0.
-            runTimeError = 21.
-            while not motionIsDone and runTime < runTimeError:
-                time.sleep(self.sleep_time['zstation']['long'])
-                returnValue = str(self.__read__(self.__cmd__(self.coms['zstation'],"MOVE?",vital=True)))
-                if len(returnValue) != 0:
-                    motionIsDone = bool(int(returnValue))
-                runTime += self.sleep_time['zstation']['long']
+            motionIsDone = self.__waitMotion__('zstation',timeout=21.)
             self.__detectMalfunction__(motionIsDone,"zstation")
         else:
             if not isLast:
@@ -2274,12 +2783,16 @@ class Device:
 
         #Finalize measurement
         if isLast or currentOverflow:
+            self.__stopEnviroSampler__()
             try:
                 self.__terminate__()
             except OSError:
                 self.log("h","Current limit exceeded! HV source does not response! Results stored in emergency mode.")
                 self.log("h","Manual abort required.")
 
+        if self.args.verbosity > 0:
+            self.log("i","Redundant round trips skipped during sweep: "+str(self.skippedRoundTrips))
+
         #Return to mkMeasure
         if currentOverflow:
             self.log("w","Attempted to recover results.")
@@ -2321,7 +2834,7 @@ class Device:
         biasRange = self.__checkBiasRange__(self.coms[source_dev],biasRange)
 
         #Loop over bias points
-        results = { 'data' : [], 'enviro' : [] }  
+        results = { 'data' : [], 'enviro' : [], 'stats' : [] }  
         isLastLocal=True
         isFirstLocal=False   
         for ibias,biasPoint in enumerate(biasRange):
@@ -2337,12 +2850,9 @@ class Device:
                 isFirstLocal = False    
             current, bias, enviro = self.singleIV(biasPoint, sampleTime, nSamples, isLast=isLastLocal, isFirst=isFirstLocal)
             results['data'].append((current,bias))
-            results['enviro'].append({ 'temp1' : enviro[0],
-                                       'temp2' : enviro[1],
-                                       'temp3' : enviro[2],
-                                       'humi'  : enviro[3],
-                                       'lumi'  : enviro[4]
-                                     })
+            results['stats'].append(self.lastStats)
+            results['enviro'].append(enviro)
+            self.__streamPoint__(enviro,(current,bias),self.lastStats)
 
         return results    
 
@@ -2368,11 +2878,7 @@ class Device:
 
         #Clear enviro buffer if needed
         if 'probe' in self.coms.keys():
-            self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-            self.__read__(self.__cmd__(self.coms['probe'],"TEMP1?"))
-            self.__read__(self.__cmd__(self.coms['probe'],"TEMP2?"))
-            self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-            self.__read__(self.__cmd__(self.coms['probe'],"LUMI?",vital=True)) 
+            self.__readEnviro__("all")
 
         #Loop for waitingTime or until cancelled or emergency
         initialTime = dt.datetime.now()
@@ -2389,11 +2895,7 @@ class Device:
                 _enviro['hour'] = str(now.hour)
                 _enviro['minute'] = str(now.minute)
                 _enviro['second'] = str(now.second)
-                _enviro['temp1'] = self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-                _enviro['temp2'] = self.__read__(self.__cmd__(self.coms['probe'],"TEMP1?"))
-                _enviro['temp3'] = self.__read__(self.__cmd__(self.coms['probe'],"TEMP2?"))
-                _enviro['humi'] = self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-                _enviro['lumi'] = self.__read__(self.__cmd__(self.coms['probe'],"LUMI?",vital=True))
+                _enviro.update(self.__readEnviro__("all"))
 
                 self.log("i","Temperature CH0:   "+str(_enviro['temp1']))
                 self.log("i","Temperature CH1:   "+str(_enviro['temp2']))
@@ -2402,6 +2904,9 @@ class Device:
                 self.log("i","Lux:               "+str(_enviro['lumi']))
 
                 enviro.append(_enviro)
+                self.__streamPoint__(_enviro)
+                if waitingTime == -1:
+                    self.__trimPoints__(enviro)
 
             #Loop increment
             iround += 1
@@ -2425,15 +2930,7 @@ class Device:
         if ('zstation' in self.coms and isLast) or ('zstation' in self.coms and currentOverflow):
             self.log("i","Cleaning after last measurement")
             self.__write__(self.__cmd__(self.coms['zstation'],"SGOTO",arg=self.__par__(self.coms['zstation'],"bottomPosition"),vital=True))
-            motionIsDone = False
-            runTime = 0.
-            runTimeError = 21.
-            while not motionIsDone and runTime < runTimeError:
-                time.sleep(self.sleep_time['zstation']['long'])
-                returnValue = str(self.__read__(self.__cmd__(self.coms['zstation'],"MOVE?",vital=True)))
-                if len(returnValue) != 0:
-                    motionIsDone = bool(int(returnValue))
-                runTime += self.sleep_time['zstation']['long']
+            motionIsDone = self.__waitMotion__('zstation',timeout=21.)
             self.__detectMalfunction__(motionIsDone,"zstation")
         else:
             if not isLast:
@@ -2469,6 +2966,9 @@ class Device:
         #Set remote control
         self.__setRemote__()
 
+        #Sample enviro in background
+        self.__startEnviroSampler__()
+
         #Crosscheck interlock
         self.__checkInterlock__(safeMode=True)
 
@@ -2490,7 +2990,7 @@ class Device:
 
         #Adjusting voltage range
         _range = "1"
-        maxBiasPoint = max(abs(float(min(biasRange))),abs(float(max(biasRange))))
+        maxBiasPoint = abs(float(biasPoint))
         print("KELLO: "+str(maxBiasPoint))
         if maxBiasPoint > 100.:
             if int(self.__par__(self.coms[source_dev],"defBias")) <= 1000:
@@ -2532,21 +3032,22 @@ class Device:
         #Setup trigger if possible
         triggerType = self.__par__(self.coms['meas'],"triggerType")
         if self.__read__(self.__cmd__(self.coms['meas'],"TRIGGER?")):
-            self.__write__(self.__cmd__(self.coms['meas'],"STRIGGER",arg=triggerType,vital=True))
-            if "Empty" in triggerType: #Trigger is fully programable
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERTIME",arg=str("%f"%(sampleTime)),vital=True))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCLEAR",arg="1"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERMDIG",arg="2"))
-                #self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCOUNT",arg="3, "+str(nSamples)+", 2"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCOUNT",arg="3, "+str(int(self.__par__(self.coms['meas'],"maxNSamples"))*2)+", 2"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERLIMITBRANCH",arg="4, IN, "+str(self.maxCurrent)+", 1e-2, 6"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERALWAYSBRANCH",arg="5, 7"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERSOURCE",arg="6, 0"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERDELAY",arg="7, 0.05"))
-                self.__write__(self.__cmd__(self.coms['meas'],"FILLBUFF",arg=self.__par__(self.coms['meas'],"bufferMode"),vital=True))
-            else: #minimum settings
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERDELAY",arg="0"))
-                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERTIME",arg=str("%f"%(sampleTime)),vital=True))
+            with self.__batch__('meas'):
+                self.__write__(self.__cmd__(self.coms['meas'],"STRIGGER",arg=triggerType,vital=True))
+                if "Empty" in triggerType: #Trigger is fully programable
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERTIME",arg=str("%f"%(sampleTime)),vital=True))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCLEAR",arg="1"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERMDIG",arg="2"))
+                    #self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCOUNT",arg="3, "+str(nSamples)+", 2"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERCOUNT",arg="3, "+str(int(self.__par__(self.coms['meas'],"maxNSamples"))*2)+", 2"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERLIMITBRANCH",arg="4, IN, "+str(self.maxCurrent)+", 1e-2, 6"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERALWAYSBRANCH",arg="5, 7"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERSOURCE",arg="6, 0"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERDELAY",arg="7, 0.05"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"FILLBUFF",arg=self.__par__(self.coms['meas'],"bufferMode"),vital=True))
+                else: #minimum settings
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERDELAY",arg="0"))
+                    self.__write__(self.__cmd__(self.coms['meas'],"STRIGGERTIME",arg=str("%f"%(sampleTime)),vital=True))
         else:
             self.log("e","Trigger is not supported by this measurement device (or commands are not specified).")
 
@@ -2565,7 +3066,7 @@ class Device:
         if len(self.__cmd__(self.coms[source_dev],"TRIGGERINIT",arg="ON",vital=False)['cmd']) == 0:
             #Accomodating for charging time
             self.log("i","Charging time...")
-            time.sleep(self.__chargingTime__(0.,float(biasPoint)))
+            self.__waitCharging__(source_dev,0.,float(biasPoint))
             self.log("i","Released.")
 
         #Adjusting current range for measurement device in case of non-autoRange settings
@@ -2610,44 +3111,14 @@ class Device:
         initialTime = dt.datetime.now()
         deltaTime = 0
         currentOverflow = False
-        results = { 'data' : [], 'enviro' : [] }
+        results = { 'data' : [], 'enviro' : [], 'stats' : [] }
         while waitingTime >= deltaTime or waitingTime == -1:
-            #Read out enviro data
-            enviro = {}
-            preTemp0,preTemp1,preTemp2,preHumi,preLumi = "N/A","N/A","N/A","N/A","N/A"
-            if 'probe' in self.args.addSocket or 'probe' in self.args.addPort:
-                if not self.args.probeFast:
-                    self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-                    self.__read__(self.__cmd__(self.coms['probe'],"TEMP1?"))
-                    self.__read__(self.__cmd__(self.coms['probe'],"TEMP2?"))
-                    self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-                    self.__read__(self.__cmd__(self.coms['probe'],"LUMI?",vital=True))
-
-                #real run 
-                if self.args.probeFast:
-                    preTemp0 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-                    preTemp1 = 'N/A'
-                    preTemp2 = 'N/A'
-                    preHumi = self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-                    preLumi = 'N/A'
-                else:
-                    preTemp0 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP0?",vital=True))
-                    preTemp1 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP1?"))
-                    preTemp2 = self.__read__(self.__cmd__(self.coms['probe'],"TEMP2?"))
-                    preHumi = self.__read__(self.__cmd__(self.coms['probe'],"HUMI?",vital=True))
-                    preLumi = self.__read__(self.__cmd__(self.coms['probe'],"LUMI?",vital=True))
-
-            enviro['temp1'] = preTemp0
-            enviro['temp2'] = preTemp1
-            enviro['temp3'] = preTemp2
-            enviro['humi']  = preHumi
-            enviro['lumi']  = preLumi
-            if self.args.verbosity > 1:
-                self.log("i","Temperature CH0 before measurement: "+str(preTemp0))
-                self.log("i","Temperature CH1 before measurement: "+str(preTemp1))
-                self.log("i","Temperature CH2 before measurement: "+str(preTemp2))
-                self.log("i","Humidity before measurement: "+str(preHumi))
-                self.log("i","Lumi before measurement: "+str(preLumi))     
+            #Read out enviro data (taken from background snapshots during acquisition if sampler runs)
+            acqStart = time.time()
+            if self.enviroSampler is None:
+                enviro = self.__enviroPoint__("fast" if self.args.probeFast else "all",dryRun=not self.args.probeFast)
+                if self.args.verbosity > 1:
+                    self.__logEnviro__(enviro,"before")
 
 
             #Read out measurement data
@@ -2658,7 +3129,7 @@ class Device:
             if len(self.__cmd__(self.coms[source_dev],"TRIGGERINIT",arg="ON",vital=True)['cmd']) != 0 and ibias == 0:
                 #Accomodating for charging time
                 self.log("i","Charging time...")
-                time.sleep(self.__chargingTime__(0.,float(biasPoint)))
+                self.__waitCharging__(source_dev,0.,float(biasPoint))
                 self.log("i","Released.")
             self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERINIT",arg="ON",vital=True))                                      #Initialize trigger on measurement device if needed
             _vitalTriggerOFF = False
@@ -2668,32 +3139,27 @@ class Device:
                 _vitalTriggerOFF = True
             else:
                 bufferTime = (int(self.__par__(self.coms['meas'],"maxNSamples"))*4+5)*(sampleTime/60.)
-                self.log("i","Filling buffer... ( waiting time ~"+str(bufferTime)+"s)")
-                time.sleep(bufferTime)
+                self.log("i","Filling buffer... ( waiting time up to ~"+str(bufferTime)+"s)")
             triggIsIdleString = self.__par__(self.coms['meas'],"triggerIdle")
             lastIdx = int(self.__par__(self.coms['meas'],"maxNSamples"))+nSamples-1
             minIdx = min(int(self.__par__(self.coms['meas'],"maxNSamples"))+nSamples-1, lastIdx)
             readoutRange = str(self.__par__(self.coms['meas'],"maxNSamples"))+", "+str(minIdx)
-            minInBuffer = int(self.__par__(self.coms['meas'],"maxNSamples"))*2
+            minInBuffer = lastIdx
 
-            #Read out buffer
-            currInBuffer = 0 
-            while True:
-                try:
-                    time.sleep(3) 
-                    currInBuffer = int(self.__read__(self.__cmd__(self.coms['meas'],"INBUFFER?"))) 
-                    self.log("i","Readouts in buffer: "+str(currInBuffer)) 
-                    if currInBuffer >= minInBuffer: break
-                except ValueError:
-                    self.log("i","Readouts in buffer: "+str(currInBuffer))
-                    pass   
-            readout = self.__read__(self.__cmd__(self.coms['meas'],"READOUT?", arg=readoutRange+", \"defbuffer1\", READ", vital=True)) 
+            #Wait until buffer holds readings to be read out
+            currInBuffer = self.__waitBuffer__('meas',minInBuffer,expected=minInBuffer*(sampleTime/60.))
+            readout = self.__readBuffer__(self.__cmd__(self.coms['meas'],"READOUT?", arg=readoutRange+", \"defbuffer1\", READ", vital=True)) 
             if str(readout) == currInBuffer:
-                readout = self.__read__(self.__cmd__(self.coms['meas'],"READOUT?", arg=readoutRange+", \"defbuffer1\", READ", vital=True))  
+                readout = self.__readBuffer__(self.__cmd__(self.coms['meas'],"READOUT?", arg=readoutRange+", \"defbuffer1\", READ", vital=True))  
             self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERINIT",arg="OFF",vital=False))                                    #Stop trigger (not needed)
             self.__write__(self.__cmd__(self.coms['meas'],"TRIGGERABORT"))                                                         #Send trigger to idle state     
 
 
+            if self.enviroSampler is not None:
+                enviro = self.__enviroPoint__("fast" if self.args.probeFast else "all",acqStart,time.time())
+                if self.args.verbosity > 1:
+                    self.__logEnviro__(enviro,"during")
+
             #Process and store results
             if len(readout) == 0:
                 self.log("w","Readout is empty!")
@@ -2702,40 +3168,22 @@ class Device:
                 if self.args.verbosity > 1:
                     self.log("i",str(readout))
 
-            current_readings = []
-            readout_list = readout.split(self.__par__(self.coms['meas'],"readoutDelim"))
-            for iread,reading in enumerate(readout_list):
-                if self.__par__(self.coms['meas'],"readoutIdentifier") in reading and len(self.__par__(self.coms['meas'],"readoutIdentifier")) != 0:
-                    try:
-                        curr = float(reading.replace(self.__par__(self.coms['meas'],"readoutIdentifier"),''))
-                    except ValueError:
-                        self.log("w","Incorrect value returned on readout.")
-                        self.__terminate__("EXIT")
-                    current_readings.append(curr)
-                    if self.args.verbosity > 0:
-                        self.log("i","Current reading: "+str(curr))
-                elif self.__par__(self.coms['meas'],"readoutIdentifier") in reading and len(self.__par__(self.coms['meas'],"readoutIdentifier"))==0:
-                    try:
-                        current_readings.append(float(reading))
-                    except ValueError:
-                        self.log("w","Incorrect value returned on readout.")
-                        self.__terminate__("EXIT")
-                    if self.args.verbosity > 0:
-                        self.log("i","Current reading: "+str(reading))                
-
+            values,nInvalid,stats = self.__processReadout__(readout,sigma=0.15)
+            if nInvalid > 0:
+                self.log("w","Incorrect value returned on readout.")
+                self.__terminate__("EXIT")
             current = 0.0
-            current_readings = self.__checkReadout__(current_readings)
-            if len(current_readings) == nSamples:
-                current = sum(current_readings)/float(nSamples)
+            if stats['n_kept'] == 0:
+                self.log("w","BiasPoint: "+str(biasPoint)+": Parsing readout from measurement device "+str(self.coms['meas']['id'])+" failed. Change readout parameters in device-specific class.")
+                current = "N/A"
             else:
-                if len(current_readings) == 0:
-                    self.log("w","BiasPoint: "+str(biasPoint)+": Parsing readout from measurement device "+str(self.coms['meas']['id'])+" failed. Change readout parameters in device-specific class.")
-                    current = "N/A"
-                    #self.__terminate__("EXIT")
-                else:
-                    current = sum(current_readings)/float(len(current_readings))
+                current = stats['mean']
+            results['stats'].append(Readout.summary(stats))
             results['data'].append((current,biasPoint))
             results['enviro'].append(enviro)
+            self.__streamPoint__(enviro,(current,biasPoint),results['stats'][-1])
+            if waitingTime == -1:
+                self.__trimPoints__(results['stats'],results['data'],results['enviro'])
 
             #Emergency break loop in case of amps exceeding maximum user set level
             if abs(current) > abs(float(self.userCurrent))*1e-6:
@@ -2768,15 +3216,7 @@ class Device:
         if ('zstation' in self.coms and isLast) or ('zstation' in self.coms and currentOverflow):
             self.log("i","Cleaning after last measurement")
             self.__write__(self.__cmd__(self.coms['zstation'],"SGOTO",arg=self.__par__(self.coms['zstation'],"bottomPosition"),vital=True))
-            motionIsDone = False
-            runTime = 0.
-            runTimeError = 21.
-            while not motionIsDone and runTime < runTimeError:
-                time.sleep(self.sleep_time['zstation']['long'])
-                returnValue = str(self.__read__(self.__cmd__(self.coms['zstation'],"MOVE?",vital=True)))
-                if len(returnValue) != 0:
-                    motionIsDone = bool(int(returnValue))
-                runTime += self.sleep_time['zstation']['long']
+            motionIsDone = self.__waitMotion__('zstation',timeout=21.)
             self.__detectMalfunction__(motionIsDone,"zstation")
         else:
             if not isLast:
@@ -2786,6 +3226,7 @@ class Device:
 
         #Finalize measurement
         if isLast or currentOverflow:
+            self.__stopEnviroSampler__()
             try:
                 self.__terminate__()
             except OSError:
@@ -2803,14 +3244,52 @@ class Device:
         # Terminate I2C servers
         ################################
 
+        self.__stopEnviroSampler__()
+        if self.chargingModel.isDirty:
+            self.chargingModel.save()
         for dev_type in self.coms.keys():
             if "probe" in dev_type:
                 self.log("i","Probe server termination skipped.")
                 #self.__write__(self.__cmd__(self.coms[dev_type],"STOP",vital=True))
                 #HACK FIX ME
                 #os.system("runningMacros=`pgrep SensBoxEnvSer`; macrosArray=($(echo $runningMacros | tr ' ' \"\n\")); for macro in \"${macrosArray[@]}\"; do     kill $macro; done")
+        self.__dumpTrace__()
         self.log("i","All done.")        
 
+    def __streamPoint__(self,enviro,data=None,stats=None):
+        #################################################
+        #Pass measured point to result stream (written
+        #to output files immediately) if any
+        #################################################
+        if self.resultStream is not None:
+            self.resultStream(enviro,data,stats)
+
+    def __trimPoints__(self,*points):
+        #################################################
+        #Points of unbounded measurements are already
+        #streamed, only recent ones are kept in memory
+        #################################################
+        if self.resultStream is not None:
+            for _points in points:
+                del _points[:-self.keepPoints]
+
+    def __dumpTrace__(self):
+        ################################
+        # Command trace summary and
+        # optional Chrome-trace file
+        ################################
+
+        if self.trace is None:
+            return
+        for line in self.trace.summary():
+            self.log("i",line)
+        if len(self.args.trace) != 0:
+            try:
+                nEvents = self.trace.chromeTrace(self.args.trace)
+                self.log("i","Command trace ("+str(nEvents)+" events) written to "+self.args.trace+".")
+            except (IOError,OSError) as exc:
+                self.log("w","Command trace could not be written: "+str(exc))
+
     #----------------------------------------
     #Quick global functions for parallel use:
     #----------------------------------------
@@ -2836,15 +3315,7 @@ class Device:
 
             #Return z-station to bottom position before finalizing measurement  
             self.__write__(self.__cmd__(self.coms['zstation'],"SGOTO",arg=self.__par__(self.coms['zstation'],"bottomPosition"),vital=True))
-            motionIsDone = False
-            runTime = 0.
-            runTimeError = 21.
-            while not motionIsDone and runTime < runTimeError:
-                time.sleep(self.sleep_time['zstation']['long'])
-                returnValue = str(self.__read__(self.__cmd__(self.coms['zstation'],"MOVE?",vital=True)))
-                if len(returnValue) != 0:
-                    motionIsDone = bool(int(returnValue))
-                runTime += self.sleep_time['zstation']['long']
+            motionIsDone = self.__waitMotion__('zstation',timeout=21.)
             self.__detectMalfunction__(motionIsDone,"zstation")
         else:
             self.log("h","Probe is still touching sensor!")
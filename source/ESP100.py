@@ -3,6 +3,7 @@
 import os, sys
 import time
 import datetime as dt
+from Transport import Transport
 
 ########################################################
 #----------------------COMMANDS------------------------#
@@ -64,7 +65,11 @@ cmds['do'] = { 'RESET'   : { 'cmd' : "*RST", 'vital' : True },
 pars = { 'tShort'  : { 'par' :  0.10, 'vital' : True, 'alt' : "" },                  #@Basic sleep time in seconds needed for proper running of device routines
          'tMedium' : { 'par' :  0.25, 'vital' : True, 'alt' : "" },                  #@Medium sleep time  
          'tLong'   : { 'par' :  3.00, 'vital' : True, 'alt' : "" },                  #@Long sleep time
+         'tTimeout'   : { 'par' : 1.0, 'vital' : False, 'alt' : "readTimeout" },       #@Default time in seconds to wait for reply terminator
+         'fixedSleep' : { 'par' : False, 'vital' : False, 'alt' : "" },                #@Use fixed sleeps around write/read instead of terminator-driven reads (fallback)
          'safeVelo': { 'par' :  0.2, 'vital' : False,'alt' : "safeVelocity"},        #@Safe motor velocity
+         'motionPollMin' : { 'par' : 0.10, 'vital' : False, 'alt' : "" },            #@First polling interval of motion status in seconds (grows while moving)
+         'motionPollMax' : { 'par' : 1.00, 'vital' : False, 'alt' : "" },            #@Maximum polling interval of motion status in seconds
          'topPosition'      : { 'par' : 2.0, 'vital' : True, 'alt' : "top"},           #@Table top position coordinates
          'bottomPosition'   : { 'par' : -2.0, 'vital' : True, 'alt' : "bottom"},       #@Table bottom position coordinates
          'touchPosition'    : { 'par' : 0.5, 'vital' : True, 'alt' : "touch"},         #@Table connection established coordinates
@@ -88,6 +93,7 @@ class ESP100():
         self.sleep_time = 0.10
         self.medium_sleep_time = 0.8
         self.long_sleep_time = 3.0 
+        self.transport = Transport(self.test(),self.delim,'\r',pars['tTimeout']['par'],self.sleep_time,self.medium_sleep_time,pars['fixedSleep']['par'],cmds)
         now = dt.datetime.now()
         self.year = str(now.year)
         self.month = str(now.month)
@@ -155,28 +161,17 @@ class ESP100():
         ############################################
         #Define device-specific 'write' routine here
         ############################################
-        time.sleep(self.sleep_time)
-        write_status = com.write((cmd+self.delim).encode())
+        write_status = self.transport.write(com,cmd)
         return write_status
 
     def read(self,com,cmd):
         ###########################################
         #Define device-specific 'read' routine here
         ###########################################
-        
-        time.sleep(self.sleep_time)
-        com.write((cmd+self.delim).encode("ascii"))
-        time.sleep(self.medium_sleep_time)
-        read_value = ""
-        while com.inWaiting() > 0:
-            try:
-                part = com.read(1).decode().strip('\r')
-                read_value += part
-            except UnicodeDecodeError:
-                WARNING = '\033[93;1m'
-                ENDC    = '\033[0m'
-                print(WARNING+" ESP100:           [WARNING]   Decoding error detected. Residual bits found in buffer."+ENDC)
-        return read_value.rstrip()
+
+        #Multiple queries separated by ';' are answered line by line
+        read_value = self.transport.query(com,cmd,lines=cmd.count("?"))
+        return read_value
 
     def pre(self,com):
         ####################################################
@@ -3,6 +3,7 @@
 import os, sys
 import time
 import datetime as dt
+from Transport import Transport
 
 ########################################################
 #----------------------COMMANDS------------------------#
@@ -34,6 +35,7 @@ cmds['get'] = { 'ID' :        { 'cmd' : "*IDN?", 'vital' : True },
                 'TEMP2'     : { 'cmd' : ":MEAS:TEMP?:CH 2", 'vital' : False}, #@Return Temperature Measurement Channel 2
                 'HUMI'      : { 'cmd' : ":MEAS:HUMI?", 'vital' : True },       #@Return Humidity Measurement
                 'LUMI'      : { 'cmd' : ":MEAS:LUMI?", 'vital' : True},        #@Return Luminescence Measurement
+                'ALL'       : { 'cmd' : ":MEAS:ALL?", 'vital' : False},        #@Return TEMP0,TEMP1,TEMP2,HUMI,LUMI at once separated by readoutDelim (used only if batchQuery par is set)
                 'ZCHECK'    : { 'cmd' : "", 'vital' : False},                 #@Get Zero Check status
                 'ZCOR'      : { 'cmd' : "", 'vital' : False},           #@Get Zero Correct status
                 'TRIGGER'   : { 'cmd' : "", 'vital' : True},                 #@Get measure event control source
@@ -58,7 +60,12 @@ cmds['do'] = { 'CMDINIT' : { 'cmd' : "", 'vital' : False},              #@Some d
 pars = { 'tShort'  : { 'par' :  0.05, 'vital' : True, 'alt' : "" },                        #@Basic sleep time in seconds needed for proper running of device routines
          'tMedium' : { 'par' :  0.2, 'vital' : True, 'alt' : "" },                        #@Medium sleep time
          'tLong'   : { 'par' :  0.5, 'vital' : True, 'alt' : "" },                        #@Long sleep time
+         'tTimeout'   : { 'par' : 1.0, 'vital' : False, 'alt' : "readTimeout" },           #@Default time in seconds to wait for reply terminator
+         'fixedSleep' : { 'par' : False, 'vital' : False, 'alt' : "" },                    #@Use fixed sleeps around write/read instead of terminator-driven reads (fallback)
          'readoutDelim'  : { 'par' : ',' , 'vital' : True, 'alt' : ""},                   #@Readout for each sample is devided by this character
+         'batchQuery'    : { 'par' : False, 'vital' : False, 'alt' : ""},                 #@Firmware supports batched ALL query (unconfirmed, keep off until verified)
+         'sampleInterval' : { 'par' : 1.0, 'vital' : False, 'alt' : ""},                 #@Background enviro sampling period in seconds during IV measurements (0 = read before each IV point)
+         'sampleBuffer'   : { 'par' : 600, 'vital' : False, 'alt' : ""},                 #@Number of timestamped enviro snapshots kept by background sampler
          'interlockCheckable' : { 'par' : False, 'vital' : True, 'alt' : ""},             #@Checkability of interlock status
          'remoteCheckable'    : { 'par' : False, 'vital' : True, 'alt' : ""},             #@Checkability of remote control
          'vlimitCheckable'    : { 'par' : False, 'vital' : True, 'alt' : ""},             #@Checkability of voltage limits
@@ -83,6 +90,9 @@ class EnvServ():
         self.medium_sleep_time = pars['tMedium']['par']
         self.long_sleep_time = pars['tLong']['par']
 
+        # terminator-driven transport
+        self.transport = Transport(self.test(),self.delim,'\r',pars['tTimeout']['par'],self.sleep_time,self.medium_sleep_time,pars['fixedSleep']['par'],cmds)
+
         # time
         now = dt.datetime.now()
         self.year = str(now.year)
@@ -144,9 +154,8 @@ class EnvServ():
         # -------------------------------------------
         # Define device-specific 'write' routine here
         # -------------------------------------------
-        time.sleep(self.sleep_time)
         if com.is_open: #extra layer of protection due to self resetting embed
-            write_status = com.write((cmd+self.delim).encode())
+            write_status = self.transport.write(com,cmd)
         else:
             return False 
         return write_status
@@ -155,20 +164,31 @@ class EnvServ():
         # ------------------------------------------
         # Define device-specific 'read' routine here
         # ------------------------------------------
-        time.sleep(self.sleep_time)
-        if com.is_open: #extra layer of protection due to self resetting embed
-            com.write((cmd+self.delim).encode())
-        else:
-            return "CONNECTION LOST"
-        time.sleep(self.medium_sleep_time)
-        read_value = ""
         if com.is_open: #extra layer of protection due to self resetting embed
-            while com.inWaiting() > 0 and com.is_open:
-                part = com.read(1).decode().strip('\r')
-                read_value += part
+            try:
+                read_value = self.transport.query(com,cmd)
+            except OSError:
+                return "CONNECTION LOST"
         else:
             return "CONNECTION LOST"
-        return read_value.rstrip()
+        return read_value
+
+    def readBatch(self, com, cmds):
+        # ------------------------------------------------
+        # Send all queries as one pipelined burst and read
+        # replies line by line in the same order
+        # ------------------------------------------------
+        if self.transport.fixedSleep:
+            return [self.read(com,cmd) for cmd in cmds]
+        if not com.is_open: #extra layer of protection due to self resetting embed
+            return ["CONNECTION LOST" for cmd in cmds]
+        try:
+            self.transport.reader(com).reset()
+            com.write("".join([cmd+self.delim for cmd in cmds]).encode())
+            read_values = [self.transport.readline(com,self.transport.timeoutFor(cmd)).replace('\r','').strip() for cmd in cmds]
+        except OSError:
+            return ["CONNECTION LOST" for cmd in cmds]
+        return read_values
 
     def pre(self,com):
         ####################################################
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+import os, sys
+import time
+import threading
+import collections
+
+class EnviroSampler():
+    def __init__(self,read,interval=1.0,size=600,fatal=()):
+        ###########################################################
+        #Background sampling of enviro conditions. Given 'read'
+        #routine returning dict of channels is called every
+        #'interval' seconds and timestamped snapshots are kept
+        #in ring buffer of 'size' entries. IV points take the
+        #snapshots of their acquisition window instead of
+        #blocking on probe queries.
+        #Exceptions of 'fatal' types (and exits) stop sampling
+        #and are kept in 'failure' to be handled by main thread.
+        ###########################################################
+        self.read = read
+        self.interval = interval
+        self.fatal = fatal
+        self.failure = None
+        self.snapshots = collections.deque(maxlen=size)
+        self.lock = threading.Lock()
+        self.stopEvent = threading.Event()
+        self.thread = None
+        self.nFailed = 0
+
+    def start(self):
+        ##############################################
+        #Start sampling thread (once)
+        ##############################################
+        if self.isAlive():
+            return False
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target=self.run,name="EnviroSampler",daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self,timeout=None):
+        ##############################################
+        #Stop sampling thread and wait for it
+        ##############################################
+        self.stopEvent.set()
+        if self.thread is not None:
+            self.thread.join(self.interval*2. if timeout is None else timeout)
+        self.thread = None
+
+    def isAlive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def run(self):
+        ###################################################
+        #Sampling loop. First reading after start is only
+        #a dry run (stale values of probe are flushed).
+        ###################################################
+        isDryRun = True
+        while not self.stopEvent.is_set():
+            start = time.time()
+            try:
+                values = self.read()
+            except self.fatal+(SystemExit,) as failure:
+                self.failure = failure
+                break
+            except Exception:
+                values = None
+                self.nFailed += 1
+            if values is not None and not isDryRun:
+                with self.lock:
+                    self.snapshots.append(((start+time.time())/2.,values))
+            isDryRun = False
+            self.stopEvent.wait(max(self.interval-(time.time()-start),0.))
+
+    def nearest(self,timestamp=None):
+        ###################################################
+        #Return snapshot nearest to timestamp (latest if
+        #not given) as (timestamp,values) or None
+        ###################################################
+        with self.lock:
+            if len(self.snapshots) == 0:
+                return None
+            if timestamp is None:
+                return self.snapshots[-1]
+            return min(self.snapshots,key=lambda snapshot: abs(snapshot[0]-timestamp))
+
+    def window(self,start=None,end=None):
+        ###################################################
+        #Return channel values averaged over snapshots in
+        #window [start,end]. Nearest snapshot to window
+        #center is taken if window holds none. Channels
+        #which are not numeric are taken from the last
+        #snapshot in window. Averages are returned as
+        #strings like the probe readings.
+        ###################################################
+        if start is None or end is None:
+            snapshot = self.nearest(start if end is None else end)
+            return None if snapshot is None else dict(snapshot[1])
+        with self.lock:
+            inWindow = [values for timestamp,values in self.snapshots if start <= timestamp <= end]
+        if len(inWindow) == 0:
+            snapshot = self.nearest((start+end)/2.)
+            return None if snapshot is None else dict(snapshot[1])
+        averaged = dict(inWindow[-1])
+        for key in averaged:
+            numbers = []
+            for values in inWindow:
+                if isinstance(values[key],bool):
+                    #missing channel
+                    continue
+                try:
+                    numbers.append(float(values[key]))
+                except (TypeError,ValueError):
+                    pass
+            if len(numbers) != 0:
+                averaged[key] = "{:.6g}".format(sum(numbers)/len(numbers))
+        return averaged
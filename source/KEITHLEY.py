@@ -3,6 +3,8 @@
 import os, sys
 import time
 import datetime as dt
+from Transport import Transport
+import BufferWait
 
 ########################################################
 #----------------------COMMANDS------------------------#
@@ -56,7 +58,10 @@ cmds['get'] = { 'ID' :        { 'cmd' : "*IDN?", 'vital' : True },
                 'SCAUTORANGE'  : { 'cmd' : "SENS:CURR:RANG:AUTO?", 'vital' : False},                    #@Check SENS Current AUTO range status (manufacturer)
                 'SCRANGE'      : { 'cmd' : "SENS:CURR:RANG?", 'vital' : False},                         #@Get SENS Current range (user)
                 'TRIGGER'   : { 'cmd' : "TRIG:SOUR?", 'vital' : True},                                  #@Get measure event control source
-                'READOUT'   : { 'cmd' : "TRAC:DATA?", 'vital' : True},                                  #@Readout data from buffer
+                'READOUT'   : { 'cmd' : "TRAC:DATA?", 'vital' : True, 'timeout' : 10.0},                #@Readout data from buffer
+                'INBUFFER'  : { 'cmd' : "TRAC:POIN:ACT?", 'vital' : False},                              #@Return number of readings in buffer
+                'ERROR'     : { 'cmd' : "SYST:ERR?", 'vital' : False},                                   #@Return oldest error in queue (0 = no error)
+                'EVENTS'    : { 'cmd' : "*ESR?", 'vital' : False},                                       #@Return and clear standard event status register (error bits 2-5)
 }
 
 #"Do commands" invoke device function which does not require additional parameter
@@ -64,6 +69,7 @@ cmds['do'] = { 'RESET'   : { 'cmd' : "*RST", 'vital' : True },
 	       'CMDINIT' : { 'cmd' : "\n", 'vital' : False},              #@Some devices require initial cmd to enable communication using commands	
                'POSETUP' : { 'cmd' : "SYST:POS RST", 'vital' : False},              #@Set Power On default settings (settings after power up) to settings defined by *RST
                'CLRBUFF' : { 'cmd' : "TRAC:CLE", 'vital' : True},                   #@Clear buffer
+               'CLRSTATUS' : { 'cmd' : "*CLS", 'vital' : False},                  #@Clear error queue and event status registers
                'TRIGGERABORT' : { 'cmd' : "ABORT", 'vital' : False},                #@Abort operations and send trigger to idle
                'REMOTE'  : { 'cmd' : "SYST:REMote", 'vital' : True},                #@Set device to remote control and disable front panel
                'LOCAL'   : { 'cmd' : "SYST:LOCal", 'vital' : True},                 #@Set device to local control and enable front panel 
@@ -82,6 +88,8 @@ pars = { 'minBias' : { 'par' : -100, 'vital' : True, 'alt' : "minV" },
          'tShort'  : { 'par' :  0.5, 'vital' : True, 'alt' : "" },                  #@Basic sleep time in seconds needed for proper running of device routines
          'tMedium' : { 'par' :  1.5, 'vital' : True, 'alt' : "" },                  #@Medium sleep time  
          'tLong'   : { 'par' :  3.0, 'vital' : True, 'alt' : "" },                  #@Long sleep time
+         'tTimeout'   : { 'par' : 2.0, 'vital' : False, 'alt' : "readTimeout" },    #@Default time in seconds to wait for reply terminator
+         'fixedSleep' : { 'par' : False, 'vital' : False, 'alt' : "" },             #@Use fixed sleeps around write/read instead of terminator-driven reads (fallback)
          'minSampleTime' : { 'par' : 0.50, 'vital' : False, 'alt' : "minSTime"},    #@Minimum sample time for a single IV measurement
          'maxNSamples'   : { 'par' : 8,    'vital' : False, 'alt' : "" },           #@Maximum number of samples per single IV measurement
          'minNSamples'   : { 'par' : 1,    'vital' : False, 'alt' : "" },           #@Minimum number of samples per single IV measurement
@@ -110,6 +118,8 @@ class KEITHLEY():
         self.sleep_time = 0.5
         self.medium_sleep_time = 1.5
         self.long_sleep_time = 3.0 
+        self.transport = Transport(self.test(),self.delim,'\n',pars['tTimeout']['par'],self.sleep_time,self.medium_sleep_time,pars['fixedSleep']['par'],cmds)
+        self.bufferWait = BufferWait.PollWait(cmds['get']['INBUFFER']['cmd'])
         now = dt.datetime.now()
         self.year = str(now.year)
         self.month = str(now.month)
@@ -171,22 +181,30 @@ class KEITHLEY():
         ############################################
         #Define device-specific 'write' routine here
         ############################################
-        time.sleep(self.sleep_time)
-        write_status = com.write((cmd+self.delim).encode())
+        write_status = self.transport.write(com,cmd)
         return write_status
 
     def read(self,com,cmd):
         ###########################################
         #Define device-specific 'read' routine here
         ###########################################
-        time.sleep(self.sleep_time)
-        com.write((cmd+self.delim).encode())
-        time.sleep(self.medium_sleep_time)
-        read_value = ""
-        while com.inWaiting() > 0:
-            part = com.read(1).decode().strip('\r')
-            read_value += part
-        return read_value.rstrip()
+        read_value = self.transport.query(com,cmd)
+        return read_value
+
+    def writeBatch(self,com,raw_cmds):
+        ####################################################
+        #Write several commands as single program message
+        ####################################################
+        write_status = self.transport.write(com,self.transport.joinCommands(raw_cmds))
+        return write_status
+
+    def waitBuffer(self,com,nReadings,expected=0.,timeout=60.):
+        ####################################################
+        #Wait until buffer holds nReadings. Continuous
+        #initiation never completes, so buffer is polled.
+        ####################################################
+        query = lambda cmd,t: self.transport.query(com,cmd,timeout=t)
+        return self.bufferWait.wait(query,nReadings,expected,timeout)
 
     def pre(self,com):
         ####################################################
@@ -2,7 +2,12 @@
 
 import os, sys
 import time
+import struct
 import datetime as dt
+import numpy as np
+from Transport import Transport
+import BufferWait
+import Readout
 
 ########################################################
 #----------------------COMMANDS------------------------#
@@ -80,14 +85,19 @@ cmds['get'] = { 'ID' :        { 'cmd' : "*IDN?", 'vital' : True },
                 'VOLTLIM'   : { 'cmd' : "SOUR:CURR:VLIM?", 'vital' : False},                                   #@Get absolute source voltage limit set by user 
                 'CURRLIM'   : { 'cmd' : "SOUR:VOLT:ILIM?", 'vital' : False},                                   #@Get source current limit set by user  
                 'VOLT'      : { 'cmd' : "SOUR:VOLT?", 'vital' : True},                                        #@Get user-set voltage
+                'VOLTREAD'  : { 'cmd' : "SOUR:VOLT?", 'vital' : False},                                      #@Get source voltage (readback without new measurement)
+                'CURRREAD'  : { 'cmd' : "MEAS:CURR? \"defbuffer2\"", 'vital' : False},                    #@Get single current measurement (stored outside defbuffer1)
                 'SENSEF'    : { 'cmd' : "SENS:FUNC?", 'vital' : False},                                       #@Check measurement function
                 'SOURF'     : { 'cmd' : "SOUR:FUNC?", 'vital' : False},                                       #@Check source function
                 'SCAUTORANGE'  : { 'cmd' : "SENS:CURR:RANG:AUTO?", 'vital' : False},                          #@Check Measurement Current AUTO range status (manufacturer)
                 'SCRANGE'      : { 'cmd' : "SENS:CURR:RANG?", 'vital' : False},                               #@Get Measurement Current range (user)
                 'TRIGGER'   : { 'cmd' : "TRIG:STAT?", 'vital' : True},                                        #@Get trigger state (returns string)
-                'READOUT'   : { 'cmd' : "TRAC:DATA? ", 'vital' : True},                                       #@Readout data from buffer
+                'READOUT'   : { 'cmd' : "TRAC:DATA? ", 'vital' : True, 'timeout' : 10.0},                     #@Readout data from buffer
                 'INBUFFER'  : { 'cmd' : "TRAC:ACT?", 'vital' : True},                                        #@Return number of readings in buffer
                 'BUFFEREND' : { 'cmd' : "TRAC:ACT:END?", 'vital' : False},                                    #@Get last index of buffer
+                'OPC'       : { 'cmd' : "*OPC?", 'vital' : False},                                           #@Return 1 when all pending operations are complete
+                'ERROR'     : { 'cmd' : "SYST:ERR?", 'vital' : False},                                       #@Return oldest error in queue (0 = no error)
+                'EVENTS'    : { 'cmd' : "*ESR?", 'vital' : False},                                           #@Return and clear standard event status register (error bits 2-5)
 }
 
 #"Do commands" invoke device function which does not require additional parameter
@@ -96,6 +106,8 @@ cmds['do'] = { 'RESET'   : { 'cmd' : "*RST", 'vital' : True },
                'POSETUP' : { 'cmd' : "SYST:POS RST", 'vital' : False},              #@Set Power On default settings (settings after power up) to settings defined by *RST
                'ZCOR'    : { 'cmd' : "SENS:AZER:ONCE", 'vital' : False},            #@Execute ZeroCorrect once
                'CLRBUFF' : { 'cmd' : "TRAC:CLE;*WAI", 'vital' : True},              #@Clear buffer and wait for this action
+               'CLRSTATUS' : { 'cmd' : "*CLS", 'vital' : False},                  #@Clear error queue and event status registers
+               'FORMATASC' : { 'cmd' : "FORM:DATA ASC", 'vital' : False},         #@Restore ASCII data format (binary is kept during sweep for buffer readout)
                'TRIGGERINIT'  : { 'cmd' : "INIT;*WAI", 'vital' : True},             #@Initialize trigger operations and wait until all is done
                'TRIGGERABORT' : { 'cmd' : "ABORT", 'vital' : False},                #@Abort operations and send trigger to idle
                'REMOTE'  : { 'cmd' : "login", 'vital' : False},                     #@Set device to remote control and disable front panel 
@@ -115,9 +127,19 @@ pars = { 'minBias' : { 'par' : -1000, 'vital' : True, 'alt' : "minV" },
          'tShort'  : { 'par' :  0.5, 'vital' : True, 'alt' : "" },                  #@Basic sleep time in seconds needed for proper running of device routines
          'tMedium' : { 'par' :  1.5, 'vital' : True, 'alt' : "" },                  #@Medium sleep time  
          'tLong'   : { 'par' :  3.0, 'vital' : True, 'alt' : "" },                  #@Long sleep time
+         'tTimeout'   : { 'par' : 2.0, 'vital' : False, 'alt' : "readTimeout" },    #@Default time in seconds to wait for query reply
+         'settleVoltRate' : { 'par' : 0.5, 'vital' : False, 'alt' : "" },         #@Bias is settled when readback voltage changes slower [V/s]
+         'settleCurrRate' : { 'par' : 1e-9, 'vital' : False, 'alt' : "" },        #@Bias is settled when readback current changes slower [A/s]
+         'settlePoll'     : { 'par' : 0.25, 'vital' : False, 'alt' : "" },        #@Polling interval of readback while charging [s]
+         'fixedSleep' : { 'par' : False, 'vital' : False, 'alt' : "" },             #@Use fixed sleep before each write/read (fallback)
          'minSampleTime' : { 'par' : 0.50, 'vital' : False, 'alt' : "minSTime"},    #@Minimum sample time for a single IV measurement
          'maxNSamples'   : { 'par' : 50,    'vital' : False, 'alt' : "" },         #@Maximum number of samples per single IV measurement
          'minNSamples'   : { 'par' : 10,    'vital' : False, 'alt' : "" },          #@Minimum number of samples per single IV measurement
+         'settleMode'    : { 'par' : 'FULL', 'vital' : False, 'alt' : "" },        #@Continuous IV settling: FULL = discard maxNSamples-1 (default), COUNT = discard settleCount readings, WINDOW = discard windows until stable
+         'settleCount'   : { 'par' : 5,     'vital' : False, 'alt' : "" },          #@Number of readings discarded before acquisition (COUNT mode)
+         'settleWindow'  : { 'par' : 5,     'vital' : False, 'alt' : "" },          #@Number of readings in stability window (WINDOW mode)
+         'settleTolerance' : { 'par' : 0.05, 'vital' : False, 'alt' : "" },         #@Maximum relative standard deviation of readings in stable window (WINDOW mode)
+         'settleMaxCount'  : { 'par' : 50,   'vital' : False, 'alt' : "" },         #@Maximum number of readings discarded while settling (WINDOW mode)
          'fCurr'         : { 'par' : '\'CURR\'', 'vital' : True, 'alt' : "" },      #@SENSE argument defining CurrentMeasurement function 
          'fVolt'         : { 'par' : '\'VOLT\'', 'vital' : True, 'alt' : "" },      #@SENSE argument defining VoltageMeasurement function
          'triggerType'   : { 'par' : '\"Empty\"', 'vital' : True, 'alt' : ""},      #@Trigger source, build trigger from scratch
@@ -125,6 +147,7 @@ pars = { 'minBias' : { 'par' : -1000, 'vital' : True, 'alt' : "minV" },
          'bufferMode'    : { 'par' : 'ONCE', 'vital' : False, 'alt' : ""},          #@Buffer mode, ONCE = fill buffer and stops
          'readoutDelim'  : { 'par' : ',' , 'vital' : True, 'alt' : ""},             #@Readout for each sample is devided by this character
          'readoutIdentifier' : { 'par' : "", 'vital' : True, 'alt' : ""},           #@Each readout reading consists of this string
+         'binaryReadout'     : { 'par' : True, 'vital' : False, 'alt' : ""},        #@Transfer buffer readout as binary float64 (falls back to ASCII if refused)
          'decimalVolt'       : { 'par' : True, 'vital' : True, 'alt' : ""},         #@Check if decimal accuracy for setting volts is allowed
          'interlockCheckable' : { 'par' : True, 'vital' : True, 'alt' : ""},        #@Checkability of interlock status
          'inhibitorCheckable' : { 'par' : True,'vital' : True, 'alt' : ""},         #@Checkability of inhibitor status
@@ -145,6 +168,10 @@ class NEWKEITHLEY():
         self.sleep_time = pars['tShort']['par']
         self.medium_sleep_time = pars['tMedium']['par']
         self.long_sleep_time = pars['tLong']['par']
+        self.transport = Transport(self.test(),self.delim,self.delim,pars['tTimeout']['par'],self.sleep_time,self.medium_sleep_time,pars['fixedSleep']['par'],cmds)
+        self.bufferWait = BufferWait.OPCWait(cmds['get']['INBUFFER']['cmd'],cmds['get']['OPC']['cmd'])
+        self.binaryReadout = pars['binaryReadout']['par']
+        self.formats = {} #data format last set per connection (unknown if missing)
         now = dt.datetime.now()
         self.year = str(now.year)
         self.month = str(now.month)
@@ -256,7 +283,10 @@ class NEWKEITHLEY():
         ############################################
         #Define device-specific 'write' routine here
         ############################################
-        time.sleep(self.sleep_time)
+        self.transport.pace()
+        if "*RST" in raw_cmd or "FORM" in raw_cmd.upper():
+            #data format changed outside setFormat
+            self.formats.pop(com,None)
         raw_cmds = raw_cmd.split(";")
         queries = []
         args = []
@@ -333,11 +363,25 @@ class NEWKEITHLEY():
         write_status = _response.strip(";")
         return write_status
 
+    def setFormat(self,com,fmt):
+        ####################################################
+        #Set data format of readings unless already set.
+        #Format affects MEAS?/READ?/FETC?/TRAC:DATA? replies.
+        ####################################################
+        if self.formats.get(com) == fmt:
+            return
+        self.formats.pop(com,None)
+        com.write("FORM:DATA REAL;:FORM:BORD SWAP" if fmt == "REAL" else "FORM:DATA "+fmt)
+        self.formats[com] = fmt
+
     def read(self,com,raw_cmd):
         ###########################################
         #Define device-specific 'read' routine here
         ###########################################
-        time.sleep(self.sleep_time)
+        self.transport.pace()
+        if self.formats.get(com,"ASC") != "ASC" and any([_cmd.strip().lstrip(":").upper().startswith(("MEAS","READ","FETC","TRAC:DATA")) for _cmd in raw_cmd.split(";")]):
+            #readings are parsed as ASCII here
+            self.setFormat(com,"ASC")
         raw_cmds = raw_cmd.split(";")
         queries = []
         args = []
@@ -370,6 +414,8 @@ class NEWKEITHLEY():
 
         _response = ""
         for iq,query in enumerate(queries):
+            #VISA query blocks until terminator, only timeout is command-specific
+            previous = self.transport.setTimeout(com,self.transport.timeoutFor(query))
             try:
                 if (query.endswith("?") and len(args[iq]) == 0) or "log" in query:
                     #query without extra specifier
@@ -379,10 +425,78 @@ class NEWKEITHLEY():
                     _response += com.query(query+" "+", ".join([str(arg) for arg in args[iq]])).rstrip()+";"
             except Exception as e:
                 _response += str(e)+";"    
+            finally:
+                self.transport.setTimeout(com,previous)
                 
         read_value = _response.strip(";")   
         return read_value.rstrip()
 
+    def writeBatch(self,com,raw_cmds):
+        ####################################################
+        #Write several commands as single program message.
+        #Login/logout are exchanged one by one as before.
+        ####################################################
+        if any(["log" in raw_cmd for raw_cmd in raw_cmds]):
+            return ";".join([self.write(com,raw_cmd) for raw_cmd in raw_cmds])
+        self.transport.pace()
+        try:
+            com.write(self.transport.joinCommands(raw_cmds))
+            write_status = "RECEIVED"
+        except Exception as e:
+            write_status = str(e)
+        return write_status
+
+    def waitBuffer(self,com,nReadings,expected=0.,timeout=60.):
+        ####################################################
+        #Wait until buffer holds nReadings. Trigger model
+        #is initiated with *WAI and completes on its own,
+        #so single *OPC? returns as soon as it is done.
+        ####################################################
+        def query(cmd,timeout):
+            previous = self.transport.setTimeout(com,timeout if timeout is not None else self.transport.timeoutFor(cmd))
+            try:
+                return com.query(cmd).rstrip()
+            except Exception as e:
+                #late reply must not be taken as answer to next query
+                if hasattr(com,'clear'):
+                    com.clear()
+                return str(e)
+            finally:
+                self.transport.setTimeout(com,previous)
+        return self.bufferWait.wait(query,nReadings,expected,timeout)
+
+    def readBuffer(self,com,raw_cmd):
+        ####################################################
+        #Read buffer data as float64 array. Binary block is
+        #wrapped by NumPy without copy. Binary format is set
+        #once and kept until reading query needs ASCII (or
+        #until FORMATASC in terminate). ASCII readout is
+        #parsed if instrument refuses binary format (ASCII
+        #is then kept for the rest of the session) or if
+        #binary transfer fails (this readout only).
+        ####################################################
+        if self.binaryReadout:
+            query = raw_cmd.split(" ")[0]
+            self.transport.pace()
+            previous = self.transport.setTimeout(com,self.transport.timeoutFor(query))
+            try:
+                self.setFormat(com,"REAL")
+                return com.query_binary_values(raw_cmd.strip(),datatype='d',is_big_endian=False,container=np.array)
+            except (ValueError,TypeError,struct.error):
+                #no valid binary block: format refused
+                self.binaryReadout = False
+                if hasattr(com,'clear'):
+                    com.clear()
+            except Exception:
+                #transfer failed, readout is repeated in ASCII
+                if hasattr(com,'clear'):
+                    com.clear()
+                self.setFormat(com,"ASC")
+            finally:
+                self.transport.setTimeout(com,previous)
+        read_value = self.read(com,raw_cmd)
+        return Readout.parse(read_value,pars['readoutDelim']['par'],pars['readoutIdentifier']['par'])[0]
+
     def pre(self,com):
         ####################################################
         #Define device-specific pre-measurement routine here
@@ -3,6 +3,8 @@
 import os, sys
 import time
 import datetime as dt
+from Transport import Transport
+import Readout
 
 ########################################################
 #----------------------COMMANDS------------------------#
@@ -53,6 +55,8 @@ cmds['get'] = { 'ID' :        { 'cmd' : "#", 'vital' : True },
                 'VOLTLIM'   : { 'cmd' : "M1", 'vital' : False},                         #@Get absolute voltage limit set by user 
                 'CURRLIM'   : { 'cmd' : "N1", 'vital' : False},                         #@Get output current limit set by user 
                 'VOLT'      : { 'cmd' : "D1", 'vital' : True},                          #@Get set voltage
+                'VOLTREAD'  : { 'cmd' : "U1", 'vital' : False},                         #@Get measured output voltage
+                'CURRREAD'  : { 'cmd' : "I1", 'vital' : False},                         #@Get measured output current
                 'SCAUTORANGE'  : { 'cmd' : "", 'vital' : False},                        #@Check SENS Current AUTO range status (manufacturer)
                 'SCRANGE'      : { 'cmd' : "", 'vital' : False},                        #@Get SENS Current range (user)
                 'TRIGGER'   : { 'cmd' : "", 'vital' : True},                            #@Get measure event control source
@@ -82,6 +86,12 @@ pars = { 'minBias' : { 'par' : -1000, 'vital' : True, 'alt' : "minV" },
          'tShort'  : { 'par' :  0.08, 'vital' : True, 'alt' : "" },                  #@Basic sleep time in seconds needed for proper running of device routines
          'tMedium' : { 'par' :  1.5, 'vital' : True, 'alt' : "" },                   #@Medium sleep time  
          'tLong'   : { 'par' :  3.0, 'vital' : True, 'alt' : "" },                   #@Long sleep time
+         'tTimeout'   : { 'par' : 1.5, 'vital' : False, 'alt' : "readTimeout" },     #@Default time in seconds to wait for reply terminator
+         'settleVoltRate' : { 'par' : 0.5, 'vital' : False, 'alt' : "" },         #@Bias is settled when readback voltage changes slower [V/s]
+         'settleCurrRate' : { 'par' : 1e-9, 'vital' : False, 'alt' : "" },        #@Bias is settled when readback current changes slower [A/s]
+         'settlePoll'     : { 'par' : 0.25, 'vital' : False, 'alt' : "" },        #@Polling interval of readback while charging [s]
+         'fixedSleep' : { 'par' : False, 'vital' : False, 'alt' : "" },              #@Use fixed sleeps around write/read instead of terminator-driven reads (fallback)
+         'lineWrite'  : { 'par' : True, 'vital' : False, 'alt' : "" },               #@Try to send whole command line at once (detected once per port), otherwise char by char
          'minSampleTime' : { 'par' : 0.50, 'vital' : False, 'alt' : "minSTime"},     #@Minimum sample time for a single IV measurement
          'maxNSamples'   : { 'par' : 8,    'vital' : False, 'alt' : "" },            #@Maximum number of samples per single IV measurement
          'fCurr'         : { 'par' : 'CURR', 'vital' : True, 'alt' : "" },           #@SENSE argument defining CurrentMeasurement function 
@@ -100,6 +110,9 @@ pars = { 'minBias' : { 'par' : -1000, 'vital' : True, 'alt' : "minV" },
 
 
 
+#Whole-line write support per port (detected once at first contact)
+lineModes = {}
+
 class NHQ201():
     def __init__(self):
         ################################################
@@ -109,6 +122,7 @@ class NHQ201():
         self.sleep_time = 0.10 #FIXME: read from par
         self.medium_sleep_time = 1.0
         self.long_sleep_time = 3.0 
+        self.transport = Transport(self.test(),self.delim,'\n',pars['tTimeout']['par'],self.sleep_time,self.medium_sleep_time,pars['fixedSleep']['par'],cmds)
         now = dt.datetime.now()
         self.year = str(now.year)
         self.month = str(now.month)
@@ -169,38 +183,117 @@ class NHQ201():
 
         return _par    
 
+    def lineMode(self,com):
+        ###############################################
+        #Check once per port if firmware accepts whole
+        #command line at once. Result is cached.
+        ###############################################
+        port = str(getattr(com,'port',id(com)))
+        if port not in lineModes:
+            lineModes[port] = False
+            if pars['lineWrite']['par']:
+                lineModes[port] = self.detectLineMode(com)
+        return lineModes[port]
+
+    def detectLineMode(self,com):
+        ###############################################
+        #Send harmless multi-character readback queries
+        #(set voltage, ramp speed) as whole lines and
+        #match full echo. Single-character ID query
+        #would not show dropped characters.
+        ###############################################
+        reader = self.transport.reader(com,'ascii')
+        reader.reset()
+        isSupported = True
+        for line in [cmds['get']['VOLT']['cmd'],"V1"]:
+            com.write((line+self.delim).encode())
+            echo  = self.transport.readline(com,self.transport.timeout,'ascii').strip(self.delim).replace('\r','')
+            reply = self.transport.readline(com,self.transport.timeout,'ascii').strip(self.delim).replace('\r','')
+            if echo != line or len(reply) == 0 or Readout.toFloat(reply) is None:
+                isSupported = False
+                break
+        if not isSupported:
+            #let device discard garbled line before per-char mode
+            Transport.sleep(self.medium_sleep_time)
+            reader.reset()
+        return isSupported
+
+    def transfer(self,com,cmd,lines=1):
+        ###############################################
+        #Send command (whole line if supported, else
+        #char by char) and collect echo plus reply lines.
+        ###############################################
+        if self.transport.fixedSleep:
+            for char in cmd:
+                com.write((char).encode())
+                Transport.sleep(self.sleep_time)
+            if self.delim not in cmd:    
+                com.write((self.delim).encode())
+            Transport.sleep(self.medium_sleep_time)
+            return self.transport.drain(com,'ascii')
+
+        line = cmd.replace(self.delim,"")
+        timeout = self.transport.timeoutFor(cmd)
+        isLineMode = self.lineMode(com)
+        reader = self.transport.reader(com,'ascii')
+        reader.reset()
+        echo = ""
+        if isLineMode:
+            com.write((line+self.delim).encode())
+        else:
+            #each char is echoed back, wait for echo instead of fixed pause
+            for char in line:
+                com.write((char).encode())
+                echo += self.transport.decode(reader.readbytes(1,self.sleep_time),'ascii')
+            com.write((self.delim).encode())
+        echo += self.transport.readline(com,timeout,'ascii')
+        if echo.strip(self.delim) != line and isLineMode:
+            #echo does not match, firmware dropped chars: switch to per-char mode
+            lineModes[str(getattr(com,'port',id(com)))] = False
+            Transport.sleep(self.medium_sleep_time)
+            reader.reset()
+            if "=" in line:
+                #safety net (detection should prevent this): garbled setpoint
+                #may have been executed, it is not resent blindly
+                return self.verifySetpoint(com,line,echo)
+            return self.transfer(com,cmd,lines)
+        reply = echo
+        for iline in range(lines-1):
+            reply += self.transport.readline(com,timeout,'ascii')
+        return reply
+
+    def verifySetpoint(self,com,line,echo):
+        ###############################################
+        #Read setpoint back after garbled transfer
+        #(e.g. D1=<value> is checked by D1 query) and
+        #resend it only if device does not hold it.
+        ###############################################
+        name,value = line.split("=",1)
+        readback = self.read(com,name)
+        expected,actual = Readout.toFloat(value),Readout.toFloat(readback)
+        if expected is not None and actual is not None and abs(actual-expected) <= 1e-3*max(abs(expected),1.):
+            return line+self.delim
+        ERROR = '\033[31;1m'
+        ENDC  = '\033[0m'
+        if actual is None:
+            print(ERROR+" "+(self.test()+":").ljust(18)+" [ERROR]     Garbled command \""+echo.strip()+"\" sent for \""+line+"\", setpoint readback failed. Command is not resent."+ENDC)
+            return echo
+        print(ERROR+" "+(self.test()+":").ljust(18)+" [ERROR]     Garbled command \""+echo.strip()+"\" sent for \""+line+"\", device holds "+str(actual)+". Resending."+ENDC)
+        return self.transfer(com,line,lines=1)
+
     def write(self,com,cmd):
         ############################################
         #Define device-specific 'write' routine here
         ############################################
-
-        for char in cmd:
-            com.write((char).encode())
-            time.sleep(self.sleep_time)
-        if self.delim not in cmd:    
-            com.write((self.delim).encode())
-        time.sleep(self.medium_sleep_time)
-        write_echo = ""
-        while com.inWaiting() > 0:
-            part = com.read(1).decode('ascii').strip(self.delim)
-            write_echo += part
+        write_echo = self.transfer(com,cmd,lines=1)
+        write_echo = write_echo.replace('\r','').replace('\n','')
         return write_echo
 
     def read(self,com,cmd):
         ###########################################
         #Define device-specific 'read' routine here
         ###########################################
-      
-        for char in cmd:
-            com.write((char).encode())
-            time.sleep(self.sleep_time)
-        if self.delim not in cmd:    
-            com.write((self.delim).encode())
-        time.sleep(self.medium_sleep_time)
-        read_value = ""
-        while com.inWaiting() > 0:
-            part = com.read(1).decode('ascii')
-            read_value += part
+        read_value = self.transfer(com,cmd,lines=2)
         return_value = ""
         
         if len(read_value) == 0:
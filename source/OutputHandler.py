@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 
 import os, sys
+import time
+import atexit
 import datetime
 import json
 import csv
@@ -8,17 +10,26 @@ import ColorLogger
 import OutputPlotter
 
 class OutputHandler:
-    ##################################
-    #Handling all measurement results
-    ##################################
+    ##################################################
+    #Handling all measurement results. Every point is
+    #appended to TXT/CSV/JSON Lines files as soon as
+    #it is measured, save() only finalizes the files.
+    ##################################################
     def __init__(self,args):
         self.args = args
-        self.txtBuffer  = []
-        self.jsonBuffer = {}
-        self.csvBuffer = [] 
+        self.files = {}
+        self.fileNames = {}
+        self.section = None
+        self.syncInterval = 10.
+        self.lastSync = time.time()
+        self.isFinalized = False
         self.clogger = ColorLogger.ColorLogger("OutputHandler:   ",self.args.logname)
         self.__createArchitecture__()
 
+        #results streamed so far are kept on emergency exit
+        #(log sinks may be stopped by then, so no logging)
+        atexit.register(self.finalize,True)
+
     def log(self,log_type="i",text=""):
         return self.clogger.log(log_type,text)
 
@@ -76,85 +87,48 @@ class OutputHandler:
         if not os.path.isdir(self.args.outputDir):
             os.mkdir(self.args.outputDir)    
 
-    def __formatTXT__(self,irep,results):
-        #######################################
-        #Raw data are returned in plain format
-        #######################################
-        master_header = []
-        empty  = "\n"
-        if not os.path.exists(self.args.outputDir+"/"+self.args.outputFile+"_"+self._date()+".txt"):
-            master_header.append(self._date()+empty)
-            master_header.append(self.args.outputFile+empty)
-        lines  = [line for line in master_header]
-        mtype  = self._toPattern("#"+str(irep)+" "+results['type'])
+    def __open__(self,ext):
+        ##############################################
+        #Open output file of given type for appending
+        #(created once, at first point)
+        ##############################################
+        if ext not in self.files:
+            file_name = self._uniqueName(self.args.outputDir+"/"+self.args.outputFile+"_"+self._date()+"."+ext)
+            self.files[ext] = open(file_name, "a", newline="" if ext == "csv" else None)
+            self.fileNames[ext] = file_name
+            if ext == "txt":
+                self.files[ext].write(self._date()+"\n")
+                self.files[ext].write(self.args.outputFile+"\n")
+        return self.files[ext]
+
+    def __sync__(self,force=False):
+        ###############################################
+        #Flush every point, fsync periodically so that
+        #results survive crash or emergency exit
+        ###############################################
+        for ext in self.files:
+            self.files[ext].flush()
+        if force or time.time()-self.lastSync > self.syncInterval:
+            for ext in self.files:
+                os.fsync(self.files[ext].fileno())
+            self.lastSync = time.time()
+
+    def __beginTXT__(self,irep,mtype):
         header = ""
         if "IV" in mtype:
             header = self._toLine("Bias [V]","Current [A]","TEMP1 [C]","TEMP2 [C]","TEMP3 [C]","HUMI [%]","LUMI")
         if "ENV" in mtype:
             header = self._toLine("TIME [h-m-s]","TEMP1 [C]","TEMP2 [C]","TEMP3 [C]","HUMI [%]","LUMI")
-        lines.append(empty)
-        lines.append(mtype)
-        lines.append(header)
-        if "IV" in mtype:  
-            for idata,data in enumerate(results['data']): 
-                lines.append(self._toLine(data[1],data[0],
-                                          results['enviro'][idata]['temp1'],
-                                          results['enviro'][idata]['temp2'],
-                                          results['enviro'][idata]['temp3'],
-                                          results['enviro'][idata]['humi'],
-                                          results['enviro'][idata]['lumi']
-                                         ))
-        if "ENV" in mtype:
-            for data in results['enviro']:
-                lines.append(self._toLine(str(data['hour'])+"-"+str(data['minute'])+"-"+str(data['second']),
-                                          data['temp1'],
-                                          data['temp2'],
-                                          data['temp3'],
-                                          data['humi'],
-                                          data['lumi']
-                            ))
-        return lines    
+        txt_file = self.__open__("txt")
+        txt_file.write("\n")
+        txt_file.write(self._toPattern("#"+str(irep)+" "+mtype))
+        txt_file.write(header)
 
-    def __formatJSON__(self,irep,results):
-        ###############################################
-        #Return data in json way (python dict)
-        #Raw data are returned
-        ###############################################
-        _data = {}
-        if "IV" in results['type']:
-            _data = { 'type' : results['type'],
-                      'irep' : irep, 
-                      'bias' : [data[1] for data in results['data']],
-                      'curr' : [data[0] for data in results['data']],
-                      'tmp1' : [env['temp1'] for env in results['enviro']],
-                      'tmp2' : [env['temp2'] for env in results['enviro']],
-                      'tmp3' : [env['temp3'] for env in results['enviro']],
-                      'humi' : [env['humi'] for env in results['enviro']],
-                      'lumi' : [env['lumi'] for env in results['enviro']]
-                    }
-        if "ENV" in results['type']:
-            _data = { 'type' : results['type'],
-                      'irep' : irep,
-                      'hour' : [env['hour'] for env in results['enviro']],
-                      'minute' : [env['minute'] for env in results['enviro']],
-                      'second' : [env['second'] for env in results['enviro']],
-                      'tmp1' : [env['temp1'] for env in results['enviro']],
-                      'tmp2' : [env['temp2'] for env in results['enviro']],
-                      'tmp3' : [env['temp3'] for env in results['enviro']],
-                      'humi' : [env['humi'] for env in results['enviro']],
-                      'lumi' : [env['lumi'] for env in results['enviro']]
-                    }  
-        
-        return _data
-
-    def __formatCSV__(self,irep,results):
+    def __beginCSV__(self,irep,mtype,data):
         ####################################################################
-        #Return lines as rows represented as lists with column elements
         #Current is made positive in case that negative voltage was applied
-        #and transformed from A to nA 
+        #(sign of the first point is taken for whole measurement)
         ####################################################################
-        _lines = []
-
         _generalInfo = []
         _generalInfo.append(["CR operator","Unknown"])
         _generalInfo.append(["RM operator","Unknown"])
@@ -163,81 +137,99 @@ class OutputHandler:
         _generalInfo.append(["Serial Number","Unknown"])
         _generalInfo.append(["Construction Step","Unknown"])
         _generalInfo.append(["Measurement Number",str(irep)])
-        _generalInfo.append(["Measurement Type",str(results['type'])])
+        _generalInfo.append(["Measurement Type",str(mtype)])
         _generalInfo.append(["Note","None"])   
         _generalInfo.append([" "])
+        if "IV" in mtype:
+            _generalInfo.append(["Bias [V]","Current [nA]","TEMP1 [C]","TEMP2 [C]","TEMP3 [C]","HUMI [%]","LUMI"])
+            try:
+                if float(data[0]) < 0.0:
+                    self.section['corrFactor'] = -1.0
+            except (TypeError,ValueError):
+                pass
+        if "ENV" in mtype or "standbyZ" in mtype:
+            _generalInfo.append(["TIME [h-m-s]","TEMP1 [C]","TEMP2 [C]","TEMP3 [C]","HUMI [%]","LUMI [lx]"])
+        self.section['csv'] = csv.writer(self.__open__("csv"), delimiter=',')
+        self.section['csv'].writerows(_generalInfo)
 
-        _data = []
-        if "IV" in results['type']:
-            _data.append(["Bias [V]","Current [nA]","TEMP1 [C]","TEMP2 [C]","TEMP3 [C]","HUMI [%]","LUMI"])
-            corrFactor = 1.0
-            if float(results['data'][0][0]) < 0.0: 
-                corrFactor = -1.0        
-            unitFactor = 1e9  
-            for idata, data in enumerate(results['data']):
-                _data.append([str(data[1]),
-                              str(data[0]*corrFactor*unitFactor),
-                              str(results['enviro'][idata]['temp1']),
-                              str(results['enviro'][idata]['temp2']),
-                              str(results['enviro'][idata]['temp3']),
-                              str(results['enviro'][idata]['humi']),
-                              str(results['enviro'][idata]['lumi'])
-                            ])
-        if "ENV" in results['type'] or "standbyZ" in results['type']:
-            _data.append(["TIME [h-m-s]","TEMP1 [C]","TEMP2 [C]","TEMP3 [C]","HUMI [%]","LUMI [lx]"])
-            for data in results['enviro']:
-                _data.append([str(data['hour'])+"-"+str(data['minute'])+"-"+str(data['second']),
-                              str(data['temp1']),
-                              str(data['temp2']),
-                              str(data['temp3']),
-                              str(data['humi']),
-                              str(data['lumi'])
-                            ])
-        _lines = _generalInfo+_data+[" "]
-
-        return _lines 
-
-    def __loadTXT__(self,lines):
-        for line in lines:
-            self.txtBuffer.append(line)
-
-    def __loadJSON__(self,data):        
-        if "type" in data.keys(): 
-            if data['type'] in self.jsonBuffer.keys():
-                self.jsonBuffer[data['type']].append(data)
-            else:
-                self.jsonBuffer[data['type']] = []
-                self.jsonBuffer[data['type']].append(data)
+    def __pointTXT__(self,mtype,enviro,data):
+        #######################################
+        #Raw data are written in plain format
+        #######################################
+        if "IV" in mtype:
+            self.files['txt'].write(self._toLine(data[1],data[0],enviro['temp1'],enviro['temp2'],enviro['temp3'],enviro['humi'],enviro['lumi']))
+        if "ENV" in mtype:
+            self.files['txt'].write(self._toLine(str(enviro['hour'])+"-"+str(enviro['minute'])+"-"+str(enviro['second']),
+                                                 enviro['temp1'],enviro['temp2'],enviro['temp3'],enviro['humi'],enviro['lumi']))
 
-    def __loadCSV__(self,lines):
-        for line in lines:
-            self.csvBuffer.append(line)
+    def __pointJSON__(self,irep,mtype,enviro,data,stats):
+        ###############################################
+        #Raw data are written as one JSON line per point
+        ###############################################
+        _data = {}
+        if "IV" in mtype:
+            _data = { 'type' : mtype, 'irep' : irep, 'bias' : data[1], 'curr' : data[0] }
+            if stats is not None:
+                #per-point readout statistics
+                _data['std']   = stats.get('std')
+                _data['nkept'] = stats.get('n_kept')
+        if "ENV" in mtype:
+            _data = { 'type' : mtype, 'irep' : irep, 'hour' : enviro['hour'], 'minute' : enviro['minute'], 'second' : enviro['second'] }
+        if len(_data) != 0:
+            for key,channel in [('tmp1','temp1'),('tmp2','temp2'),('tmp3','temp3'),('humi','humi'),('lumi','lumi')]:
+                _data[key] = enviro[channel]
+            self.__open__("jsonl").write(json.dumps(_data,default=str)+"\n")
 
-    def __saveTXT__(self):
-        txt_file_name = self._uniqueName(self.args.outputDir+"/"+self.args.outputFile+"_"+self._date()+".txt")
-        with open(txt_file_name, "a") as txt_file:
-            for line in self.txtBuffer:
-                txt_file.write("%s" % line)
-        self.log("i","Saving file: "+txt_file_name)
-        self.txtBuffer = []        
+    def __pointCSV__(self,mtype,enviro,data):
+        ###############################################
+        #Current is transformed from A to nA
+        ###############################################
+        row = []
+        if "IV" in mtype:
+            try:
+                current = str(data[0]*self.section['corrFactor']*1e9)
+            except TypeError:
+                current = str(data[0])
+            row = [str(data[1]),current]
+        if "ENV" in mtype or "standbyZ" in mtype:
+            row = [str(enviro['hour'])+"-"+str(enviro['minute'])+"-"+str(enviro['second'])]
+        if len(row) != 0:
+            self.section['csv'].writerow(row+[str(enviro[channel]) for channel in ['temp1','temp2','temp3','humi','lumi']])
 
-    def __saveJSON__(self):
+    def __saveJSON__(self,quiet=False):
+        ###############################################
+        #Build JSON index grouped by measurement type
+        #from streamed JSON lines (one entry per
+        #measurement, values per point in lists)
+        ###############################################
+        jsonBuffer = {}
+        if 'jsonl' in self.fileNames:
+            _data = None
+            with open(self.fileNames['jsonl']) as jsonl_file:
+                for line in jsonl_file:
+                    try:
+                        point = json.loads(line)
+                    except ValueError:
+                        #line cut by emergency exit
+                        continue
+                    if _data is None or _data['type'] != point['type'] or _data['irep'] != point['irep']:
+                        _data = { 'type' : point['type'], 'irep' : point['irep'] }
+                        jsonBuffer.setdefault(point['type'],[]).append(_data)
+                    for key in point:
+                        if key not in ['type','irep']:
+                            _data.setdefault(key,[]).append(point[key])
+            for mtype in jsonBuffer:
+                for _data in jsonBuffer[mtype]:
+                    if 'std' in _data and len(_data['std']) != len(_data['curr']):
+                        del _data['std']
+                        del _data['nkept']
         json_file_name = self._uniqueName(self.args.outputDir+"/"+self.args.outputFile+"_"+self._date()+".json")
         with open(json_file_name, 'w') as json_file:
-            json.dump(self.jsonBuffer, json_file)
-        self.log("i","Saving file: "+json_file_name)
-        self.jsonBuffer = {}
+            json.dump(jsonBuffer, json_file)
+        if not quiet:
+            self.log("i","Saving file: "+json_file_name)
         return json_file_name
 
-    def __saveCSV__(self):
-        csv_file_name = self._uniqueName(self.args.outputDir+"/"+self.args.outputFile+"_"+self._date()+".csv")
-        with open(csv_file_name, 'w') as csvfile:
-            csvwriter = csv.writer(csvfile, delimiter=',')
-            for row in self.csvBuffer:
-                csvwriter.writerow(row)
-        self.log("i","Saving file: "+csv_file_name)
-        self.csvBuffer = [] 
-
     def __savePlot__(self, jsonFile):
         plotter = OutputPlotter.OutputPlotter(self.args)
         plotter.load(jsonFile,show=True)
@@ -245,23 +237,80 @@ class OutputHandler:
 
     def store(self):
         if self.args.isDB:
-            self.log("i","File: "+str(self.args.outputDir+"/"+self.args.outputFile+"_"+self._date()+".txt")+" --> DB")
+            self.log("i","File: "+str(self.fileNames.get('txt',self.args.outputDir+"/"+self.args.outputFile+"_"+self._date()+".txt"))+" --> DB")
 
-    def load(self,irep,results):
+    def begin(self,irep,mtype):
+        ##############################################
+        #Start measurement section, its headers are
+        #written together with the first point
+        ##############################################
+        self.end()
+        self.section = { 'irep' : irep, 'type' : mtype, 'nPoints' : 0, 'corrFactor' : 1.0 }
+
+    def point(self,enviro,data=None,stats=None):
+        ##############################################
+        #Append single bias point or enviro sample of
+        #current section to all selected outputs
+        ##############################################
+        if self.section is None:
+            return
+        irep,mtype = self.section['irep'],self.section['type']
+        if self.section['nPoints'] == 0:
+            if self.args.outTXT:
+                self.__beginTXT__(irep,mtype)
+            if self.args.outCSV:
+                self.__beginCSV__(irep,mtype,data)
         if self.args.outTXT:
-            self.__loadTXT__(self.__formatTXT__(irep,results))
+            self.__pointTXT__(mtype,enviro,data)
         if self.args.outJSON:
-            self.__loadJSON__(self.__formatJSON__(irep,results))
+            self.__pointJSON__(irep,mtype,enviro,data,stats)
         if self.args.outCSV:
-            self.__loadCSV__(self.__formatCSV__(irep,results))
+            self.__pointCSV__(mtype,enviro,data)
+        self.section['nPoints'] += 1
+        self.__sync__()
 
-    def save(self):
-        if self.args.outTXT:
-            self.__saveTXT__()
+    def end(self):
+        ##############################################
+        #Close current section
+        ##############################################
+        if self.section is not None and self.section['nPoints'] != 0 and self.args.outCSV:
+            self.section['csv'].writerow([" "])
+        self.section = None
+        self.__sync__()
+
+    def load(self,irep,results):
+        ##############################################
+        #Write whole results of measurement at once
+        ##############################################
+        self.begin(irep,results['type'])
+        stats = results.get('stats',[])
+        for ipoint,enviro in enumerate(results['enviro']):
+            data = results['data'][ipoint] if ipoint < len(results['data']) else None
+            self.point(enviro,data,stats[ipoint] if len(stats) == len(results['data']) else None)
+        self.end()
+
+    def finalize(self,quiet=False):
+        ##############################################
+        #Close streamed files and build JSON index.
+        #Called by save() or quietly at exit
+        #(emergency).
+        ##############################################
+        if self.isFinalized:
+            return None
+        self.isFinalized = True
+        self.end()
+        self.__sync__(force=True)
+        for ext in self.files:
+            self.files[ext].close()
+        jsonFile = None
         if self.args.outJSON:
-            jsonFile = self.__saveJSON__()
-            if self.args.outPNG or self.args.outPDF:
-                self.__savePlot__(jsonFile)
-        if self.args.outCSV:
-            self.__saveCSV__()
+            jsonFile = self.__saveJSON__(quiet)
+        for ext in ["txt","csv"]:
+            if ext in self.fileNames and not quiet:
+                self.log("i","Saving file: "+self.fileNames[ext])
+        return jsonFile
 
+    def save(self):
+        jsonFile = self.finalize()
+        if jsonFile is not None and (self.args.outPNG or self.args.outPDF):
+            self.__savePlot__(jsonFile)
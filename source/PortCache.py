@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+import os, sys
+import glob
+import json
+import datetime as dt
+
+class PortCache():
+    def __init__(self):
+        ###########################################################
+        #Persistent map of stable port identity (USB serial number,
+        #by-id or by-path name) to device id and model confirmed by
+        #ID response. Used to try known port mapping first.
+        ###########################################################
+        exe = sys.executable
+        exeDir = exe[:exe.rfind("/")]
+        self.cacheDir = exeDir[:exeDir.rfind("/")]+"/cache"
+        self.cacheFile = self.cacheDir+"/portCache.json"
+        self.cache = {}
+        self.load()
+
+    def load(self):
+        ##############################################
+        #Load cache from disk, broken cache is ignored
+        ##############################################
+        try:
+            with open(self.cacheFile,"r") as f:
+                self.cache = json.load(f)
+        except (OSError,ValueError):
+            self.cache = {}
+        return self.cache
+
+    def save(self):
+        ##############################################
+        #Write cache atomically
+        ##############################################
+        try:
+            if not os.path.isdir(self.cacheDir):
+                os.mkdir(self.cacheDir)
+            with open(self.cacheFile+".tmp","w") as f:
+                json.dump(self.cache,f,indent=4)
+            os.replace(self.cacheFile+".tmp",self.cacheFile)
+            return True
+        except OSError:
+            return False
+
+    def identity(self,port):
+        ###################################################
+        #Return stable identity of given port or None. VISA
+        #resources carry vendor, product and serial number.
+        ###################################################
+        if "::" in port:
+            parts = port.split("::")
+            if len(parts) >= 4:
+                return "::".join(parts[1:4])
+            return None
+        realPort = os.path.realpath(port)
+        for byDir in ["/dev/serial/by-id/*","/dev/serial/by-path/*"]:
+            for link in sorted(glob.glob(byDir)):
+                if os.path.realpath(link) == realPort:
+                    return link
+        try:
+            from serial.tools import list_ports
+            for info in list_ports.comports():
+                if os.path.realpath(info.device) == realPort and info.serial_number:
+                    return "%04x:%04x:%s"%(info.vid or 0,info.pid or 0,info.serial_number)
+        except Exception:
+            pass
+        if "ttyS" in port:
+            #on-board ports are stable
+            return port
+        return None
+
+    def lookup(self,dev_type,dev_id,model,ports):
+        ###################################################
+        #Return port from given list matching cached entry
+        #for device type, id and model (or None)
+        ###################################################
+        if dev_type not in self.cache:
+            return None
+        entry = self.cache[dev_type]
+        if entry['id'] != dev_id or entry['model'] != model:
+            return None
+        for port in ports:
+            if self.identity(port) == entry['identity']:
+                return port
+        return None
+
+    def store(self,dev_type,dev_id,model,port,real_id=""):
+        ###################################################
+        #Remember port confirmed for device type
+        #(nothing is stored for ports without stable id)
+        ###################################################
+        _identity = self.identity(port)
+        if _identity is None:
+            return False
+        self.cache[dev_type] = { 'id'       : dev_id,
+                                 'model'    : model,
+                                 'identity' : _identity,
+                                 'port'     : port,
+                                 'realId'   : str(real_id),
+                                 'date'     : dt.datetime.now().isoformat(timespec='seconds') }
+        return True
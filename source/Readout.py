@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+import os, sys
+import numpy as np
+
+###########################################################
+#Shared parsing of buffer readouts and per-point statistics.
+#Raw readout string is turned into float64 array in one pass,
+#statistics and outlier mask are computed vectorized.
+###########################################################
+
+def parse(readout,delim=",",identifier=""):
+    ###################################################
+    #Return (values,nInvalid). If identifier is given,
+    #only readings containing it are taken (identifier
+    #is stripped), otherwise all readings are taken.
+    #Array already transferred in binary form is taken
+    #as it is.
+    ###################################################
+    if isinstance(readout,np.ndarray):
+        return readout.astype(np.float64,copy=False),0
+    tokens = str(readout).split(delim)
+    if len(identifier) != 0:
+        tokens = [token.replace(identifier,'') for token in tokens if identifier in token]
+    try:
+        return np.array(tokens,dtype=np.float64),0
+    except ValueError:
+        #slow path: skip invalid readings one by one
+        values = []
+        nInvalid = 0
+        for token in tokens:
+            try:
+                values.append(float(token))
+            except ValueError:
+                nInvalid += 1
+        return np.array(values,dtype=np.float64),nInvalid
+
+def toFloat(value):
+    ###################################################
+    #Convert single reply to float or None. Mantissa-
+    #exponent replies without 'E' (e.g. NHQ "-01234-01")
+    #are accepted too.
+    ###################################################
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    for isep in range(len(value)-1,0,-1):
+        if value[isep] in "+-":
+            try:
+                return float(value[:isep]+"E"+value[isep:])
+            except ValueError:
+                break
+    return None
+
+def statistics(values,sigma=None):
+    ###################################################
+    #Return mean, std, median and number of kept values.
+    #If sigma is given, readings further than sigma*|mean|
+    #from mean are masked as outliers (all readings are
+    #kept if none would survive).
+    ###################################################
+    values = np.asarray(values,dtype=np.float64)
+    stats = { 'mean' : None, 'std' : None, 'median' : None, 'n' : int(values.size), 'n_kept' : 0, 'mask' : np.ones(values.size,dtype=bool) }
+    if values.size == 0:
+        return stats
+    if sigma is not None:
+        mean = values.mean()
+        mask = np.abs(values-mean) <= np.abs(mean)*sigma
+        if mask.any():
+            stats['mask'] = mask
+    kept = values[stats['mask']]
+    stats['mean']   = float(kept.mean())
+    stats['std']    = float(kept.std(ddof=1)) if kept.size > 1 else 0.
+    stats['median'] = float(np.median(kept))
+    stats['n_kept'] = int(kept.size)
+    return stats
+
+def summary(stats):
+    ##############################################
+    #Per-point statistics to be stored in results
+    ##############################################
+    return { 'std' : stats['std'], 'median' : stats['median'], 'n_kept' : stats['n_kept'] }
@@ -4,20 +4,60 @@ import os, sys
 import serial
 import pyvisa
 import glob
+import time
+import queue
+import threading
 import ColorLogger
+import PortCache
+import Simulator
 
 #def log(log_type="i",text=""):
 #    clogger = ColorLogger.ColorLogger("SerialConnector: ")
 #    return clogger.log(log_type,text)
 
+#One pyvisa resource manager and resource list per process
+resourceManager = None
+resourceList = None
+
 class SerialConnector:
     def __init__(self,args):
         self.args = args
         self.clogger = ColorLogger.ColorLogger("SerialConnector: ",self.args.logname)
+        self.portCache = PortCache.PortCache()
+        self.simulate = getattr(self.args,'simulate',None)
+        if self.simulate is not None:
+            Simulator.configure(self.simulate)
 
     def log(self,log_type="i",text=""):
         return self.clogger.log(log_type,text)
 
+    def __resource_manager__(self):
+        ###############################################
+        #Return process-wide pyvisa resource manager
+        ###############################################
+        global resourceManager
+        if resourceManager is None:
+            resourceManager = pyvisa.ResourceManager('@py')
+        return resourceManager
+
+    def __list_resources__(self):
+        ###############################################
+        #Return cached list of VISA resources. USB and
+        #ASRL enumeration is slow, so it is done once
+        #unless cache is invalidated.
+        ###############################################
+        global resourceList
+        if resourceList is None:
+            resourceList = self.__resource_manager__().list_resources()
+        return resourceList
+
+    def __invalidate_resources__(self):
+        ##############################################
+        #Force new enumeration of VISA resources
+        ##############################################
+        global resourceList
+        resourceList = None
+
     def __supported_serial_ports__(self):
         ###############################################
         #Return list of platform supported serial ports
@@ -32,8 +72,7 @@ class SerialConnector:
             portsSerial = glob.glob('/dev/tty[A-Za-z]*')
             portsUSBTMC = glob.glob('/dev/usbtmc*')
             if len(portsUSBTMC) == 0:
-                rm  = pyvisa.ResourceManager('@py')
-                rss = rm.list_resources()
+                rss = self.__list_resources__()
                 for resource in rss:
                     if "USB" in resource and "tty" not in resource:
                         num = 0
@@ -51,22 +90,82 @@ class SerialConnector:
         else:
             raise EnvironmentError('Unsupported platform')
         
+        return self.__probe_ports__(ports)
+
+    def __probe_port__(self,port):
+        ##############################################
+        #Return True if serial port can be opened
+        ##############################################
+        try:
+            s = serial.Serial(port)
+            s.close()
+            return True
+        except (OSError, serial.SerialException):
+            return False
+
+    def __probe_ports__(self,ports,timeout=2.0,workers=16):
+        ###################################################
+        #Probe serial ports concurrently. Each port has its
+        #own deadline counted from start of its probe, ports
+        #which do not respond in time are skipped and their
+        #worker is replaced. Order of given ports is
+        #preserved in returned list.
+        ###################################################
+        serialPorts = [port for port in ports if "usbtmc" not in port]
+        results = {}
+        started = {}
+        pending = queue.Queue()
+        for port in serialPorts:
+            pending.put(port)
+        condition = threading.Condition()
+
+        def worker():
+            while True:
+                try:
+                    port = pending.get_nowait()
+                except queue.Empty:
+                    return
+                with condition:
+                    started[port] = time.time()
+                isOpen = self.__probe_port__(port)
+                with condition:
+                    results[port] = isOpen
+                    condition.notify()
+
+        def spawn():
+            #daemon threads, so that hanging port cannot block exit
+            threading.Thread(target=worker,daemon=True).start()
+
+        for iworker in range(max(1,min(workers,len(serialPorts)))):
+            spawn()
+        isWorking = {}
+        with condition:
+            while len(isWorking) < len(serialPorts):
+                now = time.time()
+                for port in serialPorts:
+                    if port in isWorking:
+                        continue
+                    if port in results:
+                        isWorking[port] = results[port]
+                    elif port in started and now-started[port] >= timeout:
+                        isWorking[port] = False
+                        if self.args.verbosity > 1:
+                            self.log("w","Port "+port+" did not respond within "+str(timeout)+"s. Skipped.")
+                        spawn()
+                deadlines = [started[port]+timeout for port in serialPorts if port in started and port not in isWorking]
+                if len(isWorking) < len(serialPorts):
+                    condition.wait(max(min(deadlines)-time.time(),0.) if len(deadlines) != 0 else timeout)
+
         working_ports = []
         for port in ports:
             if "usbtmc" in port:
-                    rm  = pyvisa.ResourceManager('@py')
-                    rss = rm.list_resources()
+                    rss = self.__list_resources__()
                     for res in rss:
                         if "USB" in res and "ASRL" not in res and res not in working_ports:
                             working_ports.append(res)
                             break
-            else:            
-                try:
-                    s = serial.Serial(port)
-                    s.close()
-                    working_ports.append(port)
-                except (OSError, serial.SerialException):
-                    pass
+            elif isWorking[port]:
+                working_ports.append(port)
         return working_ports
 
     def __detect_devices__(self):
@@ -146,6 +245,9 @@ class SerialConnector:
         #Return dict of ports selected/autoselected for connection with device(s)
         #########################################################################
 
+        if self.simulate is not None:
+            return self.__detect_simulated__()
+
         # listing serial ports
         COM_ports = self.__supported_serial_ports__()
         if len(COM_ports) == 0:
@@ -252,8 +354,27 @@ class SerialConnector:
                         self.log("i","Adding "+relDev+" to the correctly matched ports.")
                     usedPorts.append(goodAttempts[relDev])
 
+                #try port mapping confirmed during previous runs first
+                cachedPorts = {}
+                for relDev in relevantDevs:
+                    if relDev in goodAttempts.keys():
+                        continue
+                    cachedPort = self.portCache.lookup(relDev,devices[relDev]['id'],devices[relDev]['model'],
+                                                       [port for port in COM_ports 
+                                                        if port not in usedPorts and not (relDev in failedAttempts.keys() and port in failedAttempts[relDev])])
+                    if cachedPort is not None:
+                        if self.args.verbosity > 1:
+                            self.log("i","Using cached port "+cachedPort+" for "+relDev+".")
+                        cachedPorts[relDev] = cachedPort
+                        usedPorts.append(cachedPort)
+
                 #loop over relevant devices and ports
                 for relDev in relevantDevs:
+                    #use cached mapping
+                    if relDev in cachedPorts.keys():
+                        devices[relDev]['port'] = cachedPorts[relDev]
+                        selected_ports[relDev] = devices[relDev]
+                        continue
                     #use default settings if possible
                     if relDev in goodAttempts.keys():
                         relevantPorts[relDev] = [goodAttempts[relDev]] #precisely one
@@ -318,14 +439,30 @@ class SerialConnector:
                 self.log("i","Device of type %s: ID=%s, port=%s"%(key,selected_ports[key]['id'],selected_ports[key]['port']))
         return selected_ports
 
+    def __detect_simulated__(self):
+        ######################################################
+        #Return dict of simulated ports, one per relevant device
+        ######################################################
+        devices = self.__detect_devices__()
+        selected_ports = {}
+        self.log("w","Instrument simulator activated, no hardware is used.")
+        for key in devices.keys():
+            if ( (key == "source" and self.args.extVSource)
+            or (key in self.args.addPort)
+            or (key == "meas" and not self.args.isEnviroOnly and not self.args.isStandByZOnly)):
+                devices[key]['port'] = "SIM::"+key
+                selected_ports[key] = devices[key]
+                self.log("i","Device of type %s: ID=%s, port=%s"%(key,selected_ports[key]['id'],selected_ports[key]['port']))
+        return selected_ports
+
     def __set_RS232__(self,this_port):
         #######################
         #Setup RS232 connection
         #######################
-        if this_port['visa']:
-            rm = pyvisa.ResourceManager('@py')
-            rss = rm.list_resources()
-            this_com = rm.open_resource(this_port['port']) 
+        if self.simulate is not None:
+            this_com = Simulator.openPort(this_port)
+        elif this_port['visa']:
+            this_com = self.__resource_manager__().open_resource(this_port['port']) 
         else:    
             this_com = serial.Serial(
                       port=this_port['port'],
@@ -361,6 +498,9 @@ class SerialConnector:
         #####################################################################
 
         COMS = {}
+        if len(failedAttempts) != 0:
+            #retry of port matching, devices may have appeared/disappeared
+            self.__invalidate_resources__()
         ports = self.__detect_RS232__(failedAttempts, goodAttempts)
         #setup communication
         try:
@@ -405,6 +545,21 @@ class SerialConnector:
 
         return COMS   
     
+    def remember_RS232(self,COMS,realIds={}):
+        #####################################################################
+        #Global function called from mkMeasure to store port mapping confirmed
+        #by device response for the next run
+        #####################################################################
+        isStored = False
+        for dev_type in COMS.keys():
+            if 'port' not in COMS[dev_type]:
+                continue
+            if self.portCache.store(dev_type,COMS[dev_type]['id'],COMS[dev_type]['model'],COMS[dev_type]['port'],realIds.get(dev_type,"")):
+                isStored = True
+        if isStored:
+            self.portCache.save()
+        return isStored
+
     def test_RS232(self):
         ###########################################
         #Global function to test port availability.
@@ -38,6 +38,7 @@ cmds['get'] = { 'ID' :        { 'cmd' : "*IDN?", 'vital' : True },
                 'TEMP2'     : { 'cmd' : ":MEAS:TEMP?:CH 2", 'vital' : False}, #@Return Temperature Measurement Channel 2
                 'HUMI'      : { 'cmd' : ":MEAS:HUMI?", 'vital' : True },       #@Return Humidity Measurement
                 'LUMI'      : { 'cmd' : ":MEAS:LUMI?", 'vital' : True},        #@Return Luminescence Measurement
+                'ALL'       : { 'cmd' : ":MEAS:ALL?", 'vital' : False},        #@Return TEMP0,TEMP1,TEMP2,HUMI,LUMI at once separated by readoutDelim (used only if batchQuery par is set)
                 'ZCHECK'    : { 'cmd' : "", 'vital' : False},                 #@Get Zero Check status
                 'ZCOR'      : { 'cmd' : "", 'vital' : False},           #@Get Zero Correct status
                 'TRIGGER'   : { 'cmd' : "", 'vital' : True},                 #@Get measure event control source
@@ -62,7 +63,12 @@ cmds['do'] = { 'CMDINIT' : { 'cmd' : "", 'vital' : False},              #@Some d
 pars = { 'tShort'  : { 'par' :  0.5, 'vital' : True, 'alt' : "" },                        #@Basic sleep time in seconds needed for proper running of device routines
          'tMedium' : { 'par' :  1.5, 'vital' : True, 'alt' : "" },                        #@Medium sleep time  
          'tLong'   : { 'par' :  3.0, 'vital' : True, 'alt' : "" },                        #@Long sleep time
+         'tTimeout': { 'par' :  2.0, 'vital' : False, 'alt' : "readTimeout" },             #@Time in seconds to wait for server reply
+         'writeAck': { 'par' : False, 'vital' : False, 'alt' : "" },                      #@Server acknowledges written commands (wait up to tShort for ack)
          'readoutDelim'  : { 'par' : ',' , 'vital' : True, 'alt' : ""},                   #@Readout for each sample is devided by this character
+         'batchQuery'    : { 'par' : False, 'vital' : False, 'alt' : ""},                 #@Firmware supports batched ALL query (unconfirmed, keep off until verified)
+         'sampleInterval' : { 'par' : 1.0, 'vital' : False, 'alt' : ""},                 #@Background enviro sampling period in seconds during IV measurements (0 = read before each IV point)
+         'sampleBuffer'   : { 'par' : 600, 'vital' : False, 'alt' : ""},                 #@Number of timestamped enviro snapshots kept by background sampler
          'interlockCheckable' : { 'par' : False, 'vital' : True, 'alt' : ""},             #@Checkability of interlock status
          'remoteCheckable'    : { 'par' : False, 'vital' : True, 'alt' : ""},             #@Checkability of remote control
          'vlimitCheckable'    : { 'par' : False, 'vital' : True, 'alt' : ""},             #@Checkability of voltage limits
@@ -149,23 +155,33 @@ class EnvServ():
 
         return _par    
 
+    def connection(self,com):
+        ##############################################
+        #Return persistent connection handed over by
+        #SocketConnector
+        ##############################################
+        if com.get('connection') is None:
+            raise ConnectionRefusedError("No connection to "+str(com.get('host'))+":"+str(com.get('port'))+" handed over.")
+        return com['connection']
+
     def write(self,com,cmd):
         ############################################
         #Define device-specific 'write' routine here
         ############################################
 
-        HOST = com['host']  # The server's hostname or IP address
-        PORT = com['port']  # The port used by the server
-
         write_status = False
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            try:
-                s.connect((HOST, PORT))
-            except ConnectionRefusedError:
-                return "REFUSED"
-            s.sendall(cmd.encode())
-            time.sleep(self.sleep_time) 
+        try:
+            if pars['writeAck']['par']:
+                #wait for acknowledgement only shortly
+                self.connection(com).request(cmd,timeout=self.sleep_time)
+            else:
+                #late replies are flushed before next request
+                self.connection(com).send(cmd)
             write_status = True
+        except ConnectionRefusedError:
+            return "REFUSED"
+        except OSError:
+            return False
 
         return write_status    
             
@@ -173,22 +189,33 @@ class EnvServ():
         ###########################################
         #Define device-specific 'read' routine here
         ###########################################
-     
-        HOST = com['host']  # The server's hostname or IP address
-        PORT = com['port']  # The port used by the server
 
         return_value = ""
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            try:
-                s.connect((HOST, PORT))
-            except ConnectionRefusedError:
-                return "REFUSED"
-            s.sendall(cmd.encode())
-            time.sleep(self.sleep_time)
-            return_value = s.recv(1024)
-
-        return return_value.decode().rstrip()
+        try:
+            return_value = self.connection(com).request(cmd)
+        except ConnectionRefusedError:
+            return "REFUSED"
+        except OSError:
+            return "CONNECTION LOST"
+
+        return return_value.rstrip()
  
+    def readBatch(self,com,cmds):
+        ###############################################
+        #Queries are pipelined over the persistent
+        #connection, replies are split by terminator.
+        #Replies which cannot be framed (server closed
+        #connection, unterminated replies) are requested
+        #again one by one.
+        ###############################################
+        try:
+            replies = self.connection(com).pipeline(cmds)
+        except ConnectionRefusedError:
+            return ["REFUSED" for cmd in cmds]
+        except OSError:
+            replies = [None for cmd in cmds]
+        return [reply.rstrip() if reply is not None else self.read(com,cmd) for cmd,reply in zip(cmds,replies)]
+
     def pre(self,com):
         ####################################################
         #Define device-specific pre-measurement routine here
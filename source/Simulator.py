@@ -0,0 +1,890 @@
+#!/usr/bin/env python
+
+import os, sys
+import time
+import math
+import json
+import threading
+import numpy as np
+
+###########################################################
+#Software simulator of instruments supported by mkMeasure.
+#Device models answer commands of device-specific classes
+#(NEWKEITHLEY, KEITHLEY, NHQ201, ESP100, EnvServ) behind
+#objects behaving as serial ports, VISA resources and
+#socket connections, so that whole measurement sequences
+#run (and can be profiled) without hardware. All devices
+#share one simulated sensor: bias set by any source is
+#seen by every meter.
+###########################################################
+
+#Simulation settings, see configure()
+settings = { 'latency'        : { 'NEWKEITHLEY' : 0.002,     #round trip latency per command [s]
+                                  'KEITHLEY'    : 0.010,
+                                  'NHQ201'      : 0.010,
+                                  'ESP100'      : 0.005,
+                                  'EnvServ'     : 0.050 },
+             'visaByteTime'   : 1e-7,       #transfer time per byte over USB [s], serial ports use 10 bits per baud
+             'resistance'     : 2e10,       #sensor leakage resistance [Ohm]
+             'breakdown'      : 600.,       #sensor breakdown voltage [V]
+             'breakdownSlope' : 40.,        #exponential slope of breakdown current [V]
+             'breakdownCurrent' : 1e-8,     #breakdown current at breakdown voltage [A]
+             'capacitance'    : 1e-10,      #sensor capacitance [F]
+             'seriesResistance' : 2e9,      #resistance charging the sensor [Ohm] (tau = R*C)
+             'noise'          : 0.01,       #relative noise of current readings
+             'rampSpeed'      : 50.,        #voltage ramp speed of NHQ201 [V/s]
+             'readingOverhead': 0.002,      #time per reading on top of integration time [s]
+             'velocityScale'  : 1.0,        #multiplies velocity of ESP100 stage
+             'temperature'    : 21.5,       #enviro conditions reported by probe
+             'humidity'       : 5.0,
+             'lux'            : 0.0001,
+             'seed'           : None }
+
+#Simulated devices shared per process
+sensor = None
+instruments = {}
+lock = threading.Lock()
+
+def configure(path=None,**kwargs):
+    ##############################################
+    #Update settings from JSON file and keywords.
+    #Device models created later use new settings.
+    ##############################################
+    if path:
+        with open(path,"r") as f:
+            kwargs = dict(json.load(f),**kwargs)
+    for key in kwargs:
+        if isinstance(settings.get(key),dict) and isinstance(kwargs[key],dict):
+            settings[key].update(kwargs[key])
+        else:
+            settings[key] = kwargs[key]
+    return settings
+
+def reset():
+    ##############################################
+    #Forget all simulated devices and sensor state
+    ##############################################
+    global sensor
+    with lock:
+        sensor = None
+        instruments.clear()
+
+def instrument(dev_id):
+    ##############################################
+    #Return shared device model for given device id
+    ##############################################
+    global sensor
+    models = { 'NEWKEITHLEY' : Keithley2470, 'KEITHLEY' : Keithley6517, 'NHQ201' : NHQ201, 'ESP100' : ESP100, 'EnvServ' : EnvServ, 'ServerEnvServ' : EnvServ }
+    with lock:
+        if sensor is None:
+            sensor = Sensor()
+        if dev_id not in instruments:
+            if dev_id not in models:
+                raise OSError("No simulator available for device "+str(dev_id)+".")
+            instruments[dev_id] = models[dev_id](sensor,dev_id)
+        return instruments[dev_id]
+
+def openPort(port):
+    ##############################################
+    #Return simulated com object for port settings
+    #as used by SerialConnector
+    ##############################################
+    if port.get('visa',False):
+        return SimVisa(instrument(port['id']),port['port'])
+    return SimSerial(instrument(port['id']),port['port'],port.get('baudrate',9600))
+
+def connection(dev_id):
+    ##############################################
+    #Return simulated socket connection
+    ##############################################
+    return SimConnection(instrument(dev_id))
+
+def statistics():
+    ##############################################
+    #Return exchange counters per simulated device
+    ##############################################
+    with lock:
+        return { dev_id : dict(instruments[dev_id].stats) for dev_id in instruments }
+
+def formatNHQ(value):
+    ##############################################
+    #Mantissa-exponent format of NHQ (-01234-01)
+    ##############################################
+    if value == 0.:
+        return "+00000+00"
+    exponent = int(math.floor(math.log10(abs(value))))-4
+    mantissa = int(round(value/10.**exponent))
+    return "%+06d%+03d"%(mantissa,exponent)
+
+class Sensor():
+    def __init__(self):
+        ###########################################################
+        #Sensor under test: leakage current with exponential
+        #breakdown, bias settles with tau = R*C (after linear
+        #ramp of source if any), displacement current C*dV/dt
+        #and relative noise are added to readings.
+        ###########################################################
+        self.lock = threading.Lock()
+        self.rng = np.random.default_rng(settings['seed'])
+        self.tau = settings['seriesResistance']*settings['capacitance']
+        self.t0 = time.time()
+        self.v0 = 0.
+        self.target = 0.
+        self.ramp = None
+
+    def setBias(self,bias,ramp=None,t=None):
+        ##############################################
+        #New source voltage, settling starts from now
+        ##############################################
+        if t is None:
+            t = time.time()
+        with self.lock:
+            self.v0 = self.__voltage__(t)
+            self.t0 = t
+            self.target = float(bias)
+            self.ramp = ramp
+
+    def __voltage__(self,t):
+        dt = max(t-self.t0,0.)
+        tau = max(self.tau,1e-9)
+        v0 = self.v0
+        if self.ramp:
+            #first-order lag behind linear ramp of source
+            tRamp = abs(self.target-v0)/self.ramp
+            sign = 1. if self.target >= v0 else -1.
+            if dt < tRamp:
+                return v0+sign*self.ramp*(dt-tau*(1.-math.exp(-dt/tau)))
+            v0 = self.target-sign*self.ramp*tau*(1.-math.exp(-tRamp/tau))
+            dt -= tRamp
+        return self.target+(v0-self.target)*math.exp(-dt/tau)
+
+    def voltage(self,t=None):
+        ##############################################
+        #Sensor voltage at time t
+        ##############################################
+        with self.lock:
+            return self.__voltage__(time.time() if t is None else t)
+
+    def current(self,t=None,noise=True):
+        ##############################################
+        #Sensor current at time t
+        ##############################################
+        if t is None:
+            t = time.time()
+        with self.lock:
+            v = self.__voltage__(t)
+            dvdt = (self.__voltage__(t+1e-3)-self.__voltage__(max(t-1e-3,self.t0)))/(t+1e-3-max(t-1e-3,self.t0))
+            current = v/settings['resistance']
+            current += math.copysign(settings['breakdownCurrent']*math.exp(min((abs(v)-settings['breakdown'])/settings['breakdownSlope'],50.)),v) if v != 0. else 0.
+            current += settings['capacitance']*dvdt
+            if noise:
+                current *= 1.+settings['noise']*self.rng.standard_normal()
+        return current
+
+class Instrument():
+    def __init__(self,sensor,dev_id):
+        ###########################################################
+        #Base of device models. Lines received by com objects are
+        #split into commands, every command is executed at the
+        #time device gets to it (after pending *WAI) and replies
+        #are returned in order.
+        ###########################################################
+        self.sensor = sensor
+        self.id = dev_id
+        self.lock = threading.Lock()
+        self.term = "\n"
+        self.echo = False
+        self.separator = ";"
+        self.latency = settings['latency'].get(dev_id,0.005)
+        self.busyUntil = 0.
+        self.errors = []
+        self.events = 0
+        self.stats = { 'commands' : 0, 'queries' : 0, 'bytes' : 0 }
+
+    def handle(self,line,t=None):
+        ##############################################
+        #Execute received line, return list of replies
+        #(strings or arrays of readings)
+        ##############################################
+        if t is None:
+            t = time.time()
+        with self.lock:
+            replies = [line] if self.echo else []
+            for part in (line.split(self.separator) if self.separator else [line]):
+                part = part.strip()
+                if len(part) == 0:
+                    continue
+                self.stats['commands'] += 1
+                if part.upper() == "*ESR?":
+                    #standard event status register (read clears it)
+                    replies.append(str(self.events))
+                    self.events = 0
+                    continue
+                if part.upper() == "*CLS":
+                    self.events = 0
+                reply = self.command(part,max(t,self.busyUntil))
+                if reply is not None:
+                    self.stats['queries'] += 1
+                    replies.append(reply)
+            return replies
+
+    def command(self,cmd,t):
+        return None
+
+    def error(self,code,text):
+        self.errors.append(str(code)+",\""+text+"\"")
+        #command (-1xx), execution (-2xx) or device-dependent error bit
+        self.events |= 32 if -200 < code <= -100 else 16 if -300 < code <= -200 else 8
+
+class Keithley2470(Instrument):
+    def __init__(self,sensor,dev_id):
+        ###########################################################
+        #SCPI model of Keithley 2470 SourceMeter (NEWKEITHLEY):
+        #source/limits, trigger model filling defbuffer1 with one
+        #reading per integration period, *WAI/*OPC? semantics and
+        #ASCII or binary (FORM:DATA REAL) buffer transfer.
+        ###########################################################
+        super().__init__(sensor,dev_id)
+        self.reset()
+
+    def reset(self):
+        self.output = False
+        self.volt = 0.
+        self.ilim = 1.05e-4
+        self.vlim = 1100.
+        self.nplc = 1.
+        self.count = 1
+        self.delays = {}
+        self.autoRange = True
+        self.range = 1e-6
+        self.func = "\"CURR:DC\""
+        self.azero = "1"
+        self.format = "ASC"
+        self.buffer = []
+        self.tInit = None
+        self.nTrigger = 0
+        self.tDone = 0.
+
+    def period(self):
+        return self.nplc/60.+settings['readingOverhead']
+
+    def readings(self,t):
+        ##############################################
+        #Readings stored in buffer until time t
+        ##############################################
+        if self.tInit is not None:
+            nDone = min(self.nTrigger,int((t-self.tInit)/self.period()))
+            for ireading in range(self.nDone,nDone):
+                current = self.sensor.current(self.tInit+(ireading+1)*self.period())
+                self.buffer.append(max(min(current,self.ilim),-self.ilim))
+            self.nDone = max(self.nDone,nDone)
+        return self.buffer
+
+    def command(self,cmd,t):
+        header = cmd.split(" ")[0].upper().lstrip(":")
+        arg = cmd[len(cmd.split(" ")[0]):].strip()
+        args = [_arg.strip() for _arg in arg.split(",")] if len(arg) != 0 else []
+        state = "ON" in arg.upper() or arg.strip() == "1"
+        if header == "*IDN?":
+            return "KEITHLEY INSTRUMENTS,MODEL 2470,04512345,1.7.12b"
+        elif header == "*RST":
+            self.reset()
+            self.sensor.setBias(0.,t=t)
+        elif header == "*CLS":
+            self.errors = []
+        elif header == "*WAI":
+            self.busyUntil = max(self.busyUntil,self.tDone)
+        elif header == "*OPC?":
+            self.busyUntil = max(self.busyUntil,self.tDone)
+            return "1"
+        elif header in ["LOGIN","LOGOUT"]:
+            return ""
+        elif header == "SYST:ERR?":
+            return self.errors.pop(0) if len(self.errors) != 0 else "0,\"No error;0;0 0\""
+        elif header == "SYST:POS?":
+            return "RST"
+        elif header == "SOUR:VOLT":
+            self.volt = float(args[0])
+            if self.output:
+                self.sensor.setBias(self.volt,t=t)
+        elif header == "SOUR:VOLT?":
+            return "%.6E"%(self.volt)
+        elif header == "SOUR:CURR:VLIM":
+            self.vlim = float(args[0])
+        elif header == "SOUR:CURR:VLIM?":
+            return "%.6E"%(self.vlim)
+        elif header == "SOUR:VOLT:ILIM":
+            self.ilim = float(args[0])
+        elif header == "SOUR:VOLT:ILIM?":
+            return "%.6E"%(self.ilim)
+        elif header == "SOUR:FUNC?":
+            return "VOLT"
+        elif header == "SENS:FUNC":
+            self.func = arg
+        elif header == "SENS:FUNC?":
+            return self.func
+        elif header == "SENS:CURR:RANGE" or header == "SENS:CURR:RANG":
+            self.range = float(args[0])
+            self.autoRange = False
+        elif header == "SENS:CURR:RANG?":
+            return "%.6E"%(self.range)
+        elif header == "SENS:CURR:RANG:AUTO":
+            self.autoRange = state
+        elif header == "SENS:CURR:RANG:AUTO?":
+            return "1" if self.autoRange else "0"
+        elif header == "SENS:CURR:NPLC":
+            self.nplc = float(args[0])
+        elif header in ["VOLT:AZER:STAT","CURR:AZER:STAT","RES:AZER:STAT"]:
+            self.azero = "1" if state else "0"
+        elif header == "CURR:AZER:STAT?":
+            return self.azero
+        elif header == "OUTP":
+            self.output = state
+            self.sensor.setBias(self.volt if self.output else 0.,t=t)
+        elif header == "OUTP?":
+            return "1" if self.output else "0"
+        elif header == "OUTP:INT:TRIP?":
+            return "1"
+        elif header == "TRAC:CLE":
+            self.readings(t)
+            self.buffer = []
+            self.tInit = None
+        elif header == "TRAC:ACT?" or header == "TRAC:ACT:END?":
+            return str(len(self.readings(t)))
+        elif header == "TRAC:DATA?":
+            buffer = self.readings(t)
+            first,last = int(float(args[0])),int(float(args[1]))
+            if last > len(buffer) or first < 1:
+                self.error(-222,"Data out of range")
+            return np.array(buffer[max(first,1)-1:last],dtype=np.float64)
+        elif header == "TRIG:BLOC:BRAN:COUN":
+            self.count = int(float(args[1]))
+        elif header == "TRIG:BLOC:DEL:CONS":
+            self.delays[args[0]] = float(args[1])
+        elif header == "TRIG:STAT?":
+            return "RUNNING" if t < self.tDone else "IDLE"
+        elif header == "INIT":
+            self.readings(t)
+            self.tInit = t
+            self.nDone = 0
+            self.nTrigger = self.count
+            self.tDone = t+self.nTrigger*self.period()+sum(self.delays.values())
+        elif header == "ABORT":
+            self.readings(t)
+            self.tInit = None
+            self.tDone = min(self.tDone,t)
+        elif header == "MEAS:CURR?":
+            #single reading takes one integration period
+            self.busyUntil = t+self.period()
+            if "SOUR" in arg.upper():
+                return "%.6E"%(self.sensor.voltage(t) if self.output else 0.)
+            return "%.6E"%(max(min(self.sensor.current(t),self.ilim),-self.ilim))
+        elif header == "FORM:DATA" or header == "FORM":
+            self.format = arg.upper()
+        elif header.endswith("?"):
+            self.error(-113,"Undefined header")
+            return ""
+        elif header.split(":")[0] not in ["SYST","SOUR","SENS","TRIG","TRAC","CALC","ROUT","OUTP","FORM"]:
+            self.error(-113,"Undefined header")
+        return None
+
+class Keithley6517(Instrument):
+    def __init__(self,sensor,dev_id):
+        ###########################################################
+        #SCPI model of Keithley 6517A electrometer (KEITHLEY):
+        #continuous initiation stores one reading per trigger
+        #timer period until buffer is full.
+        ###########################################################
+        super().__init__(sensor,dev_id)
+        self.reset()
+
+    def reset(self):
+        self.output = False
+        self.volt = 0.
+        self.vlim = 1000.
+        self.zcheck = "1"
+        self.zcor = "0"
+        self.func = "'CURR:DC'"
+        self.range = 2e-8
+        self.autoRange = True
+        self.trigSource = "IMM"
+        self.trigTimer = 0.1
+        self.points = 100
+        self.buffer = []
+        self.tStart = None
+
+    def period(self):
+        return (self.trigTimer if self.trigSource.startswith("TIM") else 0.02)+settings['readingOverhead']
+
+    def readings(self,t):
+        if self.tStart is not None:
+            nDone = min(self.points,int((t-self.tStart)/self.period()))
+            for ireading in range(len(self.buffer),nDone):
+                current = self.sensor.current(self.tStart+(ireading+1)*self.period()) if self.zcheck == "0" else 0.
+                self.buffer.append(current)
+        return self.buffer
+
+    def command(self,cmd,t):
+        header = cmd.split(" ")[0].upper().lstrip(":")
+        arg = cmd[len(cmd.split(" ")[0]):].strip()
+        state = "ON" in arg.upper() or arg == "1"
+        if header == "*IDN?":
+            return "KEITHLEY INSTRUMENTS INC.,MODEL 6517A,1234567,A13/700X"
+        elif header == "*RST":
+            self.reset()
+            self.sensor.setBias(0.,t=t)
+        elif header == "SYST:ERR?":
+            return self.errors.pop(0) if len(self.errors) != 0 else "0,\"No error\""
+        elif header == "SYST:POS?":
+            return "RST"
+        elif header == "SYST:INT?":
+            return "1"
+        elif header == "SYST:ZCH":
+            self.zcheck = "1" if state else "0"
+        elif header == "SYST:ZCH?":
+            return self.zcheck
+        elif header == "SYST:ZCOR:STAT":
+            self.zcor = "1" if state else "0"
+        elif header == "SYST:ZCOR:STAT?":
+            return self.zcor
+        elif header == "SOUR:VOLT":
+            self.volt = float(arg)
+            if self.output:
+                self.sensor.setBias(self.volt,t=t)
+        elif header == "SOUR:VOLT?":
+            return "%+.6E"%(self.volt)
+        elif header == "SOUR:VOLT:LIM":
+            self.vlim = float(arg)
+        elif header == "SOUR:VOLT:LIM?":
+            return "%+.6E"%(self.vlim)
+        elif header == "SOUR:CURR:LIM?":
+            return "0"
+        elif header == "OUTP":
+            self.output = state
+            self.sensor.setBias(self.volt if self.output else 0.,t=t)
+        elif header == "OUTP?":
+            return "1" if self.output else "0"
+        elif header == "SENS:FUNC":
+            self.func = arg
+        elif header == "SENS:FUNC?":
+            return "\""+self.func.strip("'\"")+"\""
+        elif header == "SENS:CURR:RANG":
+            self.range = float(arg)
+            self.autoRange = False
+        elif header == "SENS:CURR:RANG?":
+            return "%+.6E"%(self.range)
+        elif header == "SENS:CURR:RANG:AUTO":
+            self.autoRange = state
+        elif header == "SENS:CURR:RANG:AUTO?":
+            return "1" if self.autoRange else "0"
+        elif header == "TRIG:SOUR":
+            self.trigSource = arg.upper()
+        elif header == "TRIG:SOUR?":
+            return self.trigSource
+        elif header == "TRIG:TIM":
+            self.trigTimer = float(arg)
+        elif header in ["TRAC:POIN","TRAC:POINTS"]:
+            self.points = int(float(arg))
+        elif header == "TRAC:CLE":
+            self.buffer = []
+            if self.tStart is not None:
+                self.tStart = t
+        elif header == "TRAC:POIN:ACT?":
+            return str(len(self.readings(t)))
+        elif header.startswith("TRAC:DATA?"):
+            return ",".join(["%+.6ENADC,%+09.3fsecs,%+06dRDNG#"%(value,(ireading+1)*self.period(),ireading) for ireading,value in enumerate(self.readings(t))])
+        elif header == "INIT:CONT":
+            self.readings(t)
+            if state and self.tStart is None:
+                self.buffer = []
+                self.tStart = t
+            elif not state:
+                self.tStart = None
+        elif header == "ABORT":
+            self.readings(t)
+        elif header.endswith("?"):
+            self.error(-113,"Undefined header")
+            return ""
+        return None
+
+class NHQ201(Instrument):
+    def __init__(self,sensor,dev_id):
+        ###########################################################
+        #Model of iseg NHQ201 high voltage source: every line is
+        #echoed, voltage is ramped with ramp speed after G1 and
+        #readbacks use mantissa-exponent format.
+        ###########################################################
+        super().__init__(sensor,dev_id)
+        self.term = "\r\n"
+        self.echo = True
+        self.separator = None
+        self.target = 0.
+        self.currentLimit = 100
+        self.rampSpeed = settings['rampSpeed']
+
+    def command(self,cmd,t):
+        cmd = cmd.upper()
+        if cmd == "#":
+            return "481055-1.34;1000V;100uA"
+        elif cmd.startswith("D1="):
+            self.target = float(cmd[3:])
+        elif cmd == "D1":
+            return formatNHQ(self.target)
+        elif cmd.startswith("V1="):
+            self.rampSpeed = float(cmd[3:])
+        elif cmd == "V1":
+            return "%03d"%(self.rampSpeed)
+        elif cmd == "G1":
+            #echo only, status is polled by S1
+            self.sensor.setBias(self.target,ramp=self.rampSpeed,t=t)
+        elif cmd.startswith("L1="):
+            self.currentLimit = float(cmd[3:])
+        elif cmd == "U1":
+            return formatNHQ(self.sensor.voltage(t))
+        elif cmd == "I1":
+            return formatNHQ(self.sensor.current(t))
+        elif cmd == "M1" or cmd == "N1":
+            return "100"
+        elif cmd == "T1":
+            #bit 3: output off (voltage below 1V), bit 5: inhibit
+            return str(8 if abs(self.sensor.voltage(t)) < 1. else 0)
+        elif cmd == "S1":
+            voltage = self.sensor.voltage(t)
+            if abs(voltage-self.target) < 0.5:
+                return "S1=ON"
+            return "S1="+("L2H" if abs(self.target) > abs(voltage) else "H2L")
+        else:
+            return "?WCN"
+        return None
+
+class ESP100(Instrument):
+    def __init__(self,sensor,dev_id):
+        ###########################################################
+        #Model of Newport ESP100 motion controller: absolute,
+        #relative and home moves run with set velocity (scaled
+        #by velocityScale), motion status and real velocity
+        #follow the move in time.
+        ###########################################################
+        super().__init__(sensor,dev_id)
+        self.term = "\r\n"
+        self.motorOn = False
+        self.velocity = 0.2
+        self.position = 0.
+        self.target = 0.
+        self.tStart = 0.
+        self.tEnd = 0.
+
+    def where(self,t):
+        if t >= self.tEnd or self.tEnd == self.tStart:
+            return self.target
+        return self.position+(self.target-self.position)*(t-self.tStart)/(self.tEnd-self.tStart)
+
+    def move(self,target,t):
+        self.position = self.where(t)
+        self.target = target
+        self.tStart = t
+        self.tEnd = t+abs(target-self.position)/(self.velocity*settings['velocityScale'])
+
+    def command(self,cmd,t):
+        cmd = cmd.upper()
+        if cmd.startswith("1"):
+            cmd = cmd[1:]
+        name,value = cmd[:2],cmd[2:]
+        if name == "ID":
+            return "M-UZM80CC.1, 12345, ESP100 simulator"
+        elif name == "TE":
+            return "0"
+        elif name == "VA" and value == "?":
+            return "%.4f"%(self.velocity)
+        elif name == "VA":
+            self.velocity = float(value)
+        elif name == "TV":
+            return "%.4f"%(self.velocity*settings['velocityScale'] if t < self.tEnd else 0.)
+        elif name == "TP":
+            return "%.4f"%(self.where(t))
+        elif cmd == "MO?":
+            return "1" if self.motorOn else "0"
+        elif cmd == "MO":
+            self.motorOn = True
+        elif cmd == "MF":
+            self.motorOn = False
+            self.move(self.where(t),t)
+        elif name == "MD":
+            return "1" if t >= self.tEnd else "0"
+        elif name == "PA" and self.motorOn:
+            self.move(float(value),t)
+        elif name == "PR" and self.motorOn:
+            self.move(self.target+float(value),t)
+        elif cmd == "OR1" and self.motorOn:
+            self.move(0.,t)
+        elif name == "ST" or name == "AB":
+            self.move(self.where(t),t)
+        elif cmd.endswith("?"):
+            return "0"
+        return None
+
+class EnvServ(Instrument):
+    def __init__(self,sensor,dev_id):
+        ###########################################################
+        #Model of enviro probe server: temperature channels,
+        #humidity and lux with small drift, batched :MEAS:ALL?
+        ###########################################################
+        super().__init__(sensor,dev_id)
+        self.term = "\r"
+        self.separator = None
+
+    def channels(self,t):
+        drift = 0.05*math.sin(t/60.)
+        return [settings['temperature']+drift,settings['temperature']+0.1+drift,settings['temperature']-0.1+drift,settings['humidity']+drift,settings['lux']]
+
+    def command(self,cmd,t):
+        cmd = cmd.upper()
+        values = self.channels(t)
+        if cmd == "*IDN?":
+            return "EnvServ V1.6 V1.4 simulator"
+        elif cmd.startswith(":MEAS:TEMP?:CH"):
+            return "%.2f"%(values[int(cmd.split(" ")[-1])])
+        elif cmd == ":MEAS:HUMI?":
+            return "%.2f"%(values[3])
+        elif cmd == ":MEAS:LUMI?":
+            return "%.5f"%(values[4])
+        elif cmd == ":MEAS:ALL?":
+            return ",".join(["%.2f"%(value) for value in values[:4]]+["%.5f"%(values[4])])
+        elif cmd.endswith("?"):
+            return "N/A"
+        return None
+
+class SimSerial():
+    def __init__(self,instrument,port="SIM",baudrate=9600,timeout=1):
+        ###########################################################
+        #Serial port stand-in (pyserial API used by Transport).
+        #Replies become readable after device latency plus
+        #transfer time at given baudrate.
+        ###########################################################
+        self.instrument = instrument
+        self.port = port
+        self.timeout = timeout
+        self.is_open = True
+        self.byteTime = 10./baudrate
+        self.inbox = ""
+        self.outbox = []
+        self.lock = threading.Lock()
+
+    def isOpen(self):
+        return self.is_open
+
+    def close(self):
+        self.is_open = False
+
+    def flush(self):
+        pass
+
+    def reset_output_buffer(self):
+        pass
+
+    def write(self,data):
+        ##############################################
+        #Receive bytes, execute every complete line
+        ##############################################
+        now = time.time()
+        with self.lock:
+            self.inbox += data.decode("utf-8",errors="ignore")
+            arrived = now+len(data)*self.byteTime
+            while True:
+                index = min([self.inbox.find(term) for term in "\r\n" if term in self.inbox] or [-1])
+                if index < 0:
+                    break
+                line = self.inbox[:index]
+                self.inbox = self.inbox[index+(2 if self.inbox[index:index+2] == "\r\n" else 1):]
+                if len(line) == 0 and not self.instrument.echo:
+                    continue
+                replies = self.instrument.handle(line,arrived)
+                ready = max(arrived,self.instrument.busyUntil)+self.instrument.latency
+                for reply in replies:
+                    if isinstance(reply,np.ndarray):
+                        reply = ",".join(["%.6E"%(value) for value in reply])
+                    raw = (reply+self.instrument.term).encode()
+                    self.instrument.stats['bytes'] += len(raw)
+                    ready += len(raw)*self.byteTime
+                    self.outbox.append([ready,raw])
+        return len(data)
+
+    @property
+    def in_waiting(self):
+        now = time.time()
+        with self.lock:
+            return sum([len(raw) for ready,raw in self.outbox if ready <= now])
+
+    def inWaiting(self):
+        return self.in_waiting
+
+    def reset_input_buffer(self):
+        now = time.time()
+        with self.lock:
+            self.outbox = [chunk for chunk in self.outbox if chunk[0] > now]
+
+    def read(self,size=1):
+        ##############################################
+        #Return up to size bytes within timeout
+        ##############################################
+        deadline = None if self.timeout is None else time.time()+self.timeout
+        data = bytearray()
+        while len(data) < size:
+            now = time.time()
+            with self.lock:
+                while len(self.outbox) != 0 and self.outbox[0][0] <= now and len(data) < size:
+                    raw = self.outbox[0][1]
+                    taken = min(len(raw),size-len(data))
+                    data += raw[:taken]
+                    self.outbox[0][1] = raw[taken:]
+                    if len(self.outbox[0][1]) == 0:
+                        self.outbox.pop(0)
+                nextReady = self.outbox[0][0] if len(self.outbox) != 0 else None
+            if len(data) >= size:
+                break
+            if deadline is not None and now >= deadline:
+                break
+            wait = 0.01 if nextReady is None else max(nextReady-now,0.)
+            if deadline is not None:
+                wait = min(wait,deadline-now)
+            time.sleep(max(wait,1e-4))
+        return bytes(data)
+
+class SimTimeout(Exception):
+    ##############################################
+    #Raised as VISA timeout (VI_ERROR_TMO)
+    ##############################################
+    pass
+
+class SimVisa():
+    def __init__(self,instrument,resource="SIM"):
+        ###########################################################
+        #VISA resource stand-in (pyvisa API used by NEWKEITHLEY).
+        #Timeout is given in milliseconds as in pyvisa.
+        ###########################################################
+        self.instrument = instrument
+        self.resource_name = resource
+        self.timeout = 2000
+        self.replies = []
+        self.lock = threading.Lock()
+
+    def isOpen(self):
+        return True
+
+    def close(self):
+        pass
+
+    def clear(self):
+        with self.lock:
+            self.replies = []
+
+    def write(self,message,termination=None,encoding=None):
+        ##############################################
+        #Send message, termination is appended as in
+        #pyvisa (empty one is skipped)
+        ##############################################
+        if termination:
+            message += termination
+        now = time.time()
+        replies = self.instrument.handle(message.strip(),now)
+        ready = max(now,self.instrument.busyUntil)+self.instrument.latency
+        with self.lock:
+            for reply in replies:
+                self.replies.append([ready,reply])
+        return len(message)+1
+
+    def write_ascii_values(self,message,values,converter='f',separator=','):
+        return self.write(message+separator.join([("{:"+converter+"}").format(value) for value in values]))
+
+    def __pop__(self):
+        ##############################################
+        #Wait for next reply within timeout
+        ##############################################
+        timeout = None if self.timeout is None else self.timeout/1000.
+        start = time.time()
+        while True:
+            with self.lock:
+                reply = self.replies[0] if len(self.replies) != 0 else None
+            now = time.time()
+            ready = reply[0] if reply is not None else None
+            if ready is not None and ready <= now:
+                with self.lock:
+                    self.replies.pop(0)
+                return reply[1]
+            if timeout is not None and now-start >= timeout:
+                raise SimTimeout("VI_ERROR_TMO (-1073807339): Timeout expired before operation completed.")
+            wait = 0.01 if ready is None else ready-now
+            if timeout is not None:
+                wait = min(wait,start+timeout-now)
+            time.sleep(max(wait,1e-4))
+
+    def read(self,termination=None,encoding=None):
+        reply = self.__pop__()
+        if isinstance(reply,np.ndarray):
+            reply = ",".join(["%.6E"%(value) for value in reply])
+        self.instrument.stats['bytes'] += len(reply)+1
+        time.sleep((len(reply)+1)*settings['visaByteTime'])
+        return reply+"\n"
+
+    def query(self,message,delay=None):
+        self.write(message)
+        return self.read()
+
+    def query_binary_values(self,message,datatype='f',is_big_endian=False,container=list,**kwargs):
+        ##############################################
+        #Binary block reply, refused in ASCII format
+        ##############################################
+        self.write(message)
+        reply = self.__pop__()
+        if not isinstance(reply,np.ndarray) or not self.instrument.format.startswith("REAL"):
+            raise ValueError("Could not find valid binary block header in reply.")
+        raw = reply.astype((">" if is_big_endian else "<")+datatype).tobytes()
+        self.instrument.stats['bytes'] += len(raw)+len(str(len(raw)))+3
+        time.sleep((len(raw)+len(str(len(raw)))+3)*settings['visaByteTime'])
+        values = np.frombuffer(raw,dtype=(">" if is_big_endian else "<")+datatype)
+        if container is np.array or container is np.ndarray:
+            return values
+        return container(values.tolist())
+
+class SimConnection():
+    def __init__(self,instrument):
+        ###########################################################
+        #Socket connection stand-in (SocketConnection API)
+        ###########################################################
+        self.instrument = instrument
+        self.timeout = 2.0
+
+    def connect(self):
+        return self
+
+    def close(self):
+        pass
+
+    def send(self,cmd):
+        self.instrument.handle(cmd.strip(),time.time())
+        return True
+
+    def pipeline(self,cmds,timeout=None):
+        ##############################################
+        #Requests sent back-to-back, one latency paid
+        ##############################################
+        if timeout is None:
+            timeout = self.timeout
+        now = time.time()
+        replies = [self.instrument.handle(cmd.strip(),now) for cmd in cmds]
+        ready = max(now,self.instrument.busyUntil)+self.instrument.latency
+        time.sleep(max(min(ready-now,timeout),0.))
+        if ready-now > timeout:
+            return [None for cmd in cmds]
+        return [str(reply[0])+"\n" if len(reply) != 0 else "\n" for reply in replies]
+
+    def request(self,cmd,timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        now = time.time()
+        replies = self.instrument.handle(cmd.strip(),now)
+        ready = max(now,self.instrument.busyUntil)+self.instrument.latency
+        time.sleep(max(min(ready-now,timeout),0.))
+        if ready-now > timeout or len(replies) == 0:
+            return ""
+        return str(replies[0])+"\n"
@@ -1,12 +1,192 @@
 #!/usr/bin/env python
 
 import os, sys
+import time
+import socket
+import threading
 import ColorLogger
+import Simulator
 
 #def log(log_type="i",text=""):
 #    clogger = ColorLogger.ColorLogger("SocketConnector: ")
 #    return clogger.log(log_type,text)
 
+#Long-lived connections shared per (host,port)
+connections = {}
+connectionsLock = threading.Lock()
+
+class SocketConnection():
+    def __init__(self,host,port,term='\n',timeout=2.0,gap=0.05):
+        ###########################################################
+        #Persistent, auto-reconnecting TCP connection. Each request
+        #is answered by one reply which ends either by terminator,
+        #by server closing connection or by short idle gap after
+        #last received data.
+        ###########################################################
+        self.host = host
+        self.port = port
+        self.term = term.encode()
+        self.timeout = timeout
+        self.gap = gap
+        self.sock = None
+        self.lock = threading.Lock()
+        self.isFramed = True
+
+    def connect(self):
+        ##############################################
+        #Open connection unless it is already open
+        ##############################################
+        if self.sock is None:
+            self.sock = socket.create_connection((self.host,self.port),timeout=self.timeout)
+            self.sock.setsockopt(socket.IPPROTO_TCP,socket.TCP_NODELAY,1)
+        return self.sock
+
+    def close(self):
+        ##############################################
+        #Close connection, next request reconnects
+        ##############################################
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+
+    def __flush__(self):
+        ###############################################
+        #Discard late replies left from previous request
+        ###############################################
+        self.sock.setblocking(False)
+        try:
+            while True:
+                part = self.sock.recv(4096)
+                if len(part) == 0:
+                    self.close()
+                    break
+        except (BlockingIOError,socket.timeout):
+            pass
+        if self.sock is not None:
+            self.sock.settimeout(self.timeout)
+
+    def __receive__(self,timeout):
+        ###############################################
+        #Collect single reply. Empty reply on closed
+        #connection means the connection went stale.
+        ###############################################
+        reply = bytearray()
+        deadline = time.time()+timeout
+        while True:
+            remaining = deadline-time.time()
+            if remaining <= 0:
+                break
+            #once some data arrived, wait only for short gap
+            self.sock.settimeout(min(remaining,self.gap) if len(reply) != 0 else remaining)
+            try:
+                part = self.sock.recv(4096)
+            except socket.timeout:
+                break
+            except BlockingIOError:
+                break
+            if len(part) == 0:
+                #server closed connection after (or before) reply
+                self.close()
+                if len(reply) == 0:
+                    raise ConnectionResetError("Connection closed by server.")
+                break
+            reply += part
+            if self.term in part:
+                break
+        if self.sock is not None:
+            self.sock.settimeout(self.timeout)
+        return bytes(reply)
+
+    def send(self,cmd):
+        ###############################################
+        #Send command without waiting for reply. Stale
+        #connection is reopened and send repeated once.
+        ###############################################
+        with self.lock:
+            for iAttempt in range(2):
+                try:
+                    self.connect()
+                    self.__flush__()
+                    self.connect().sendall(cmd.encode())
+                    return True
+                except ConnectionRefusedError:
+                    self.close()
+                    raise
+                except OSError:
+                    self.close()
+                    if iAttempt != 0:
+                        raise
+
+    def pipeline(self,cmds,timeout=None):
+        ###############################################
+        #Send all commands back-to-back, then collect
+        #terminated replies. Replies not received in
+        #time are returned as None. Server sending
+        #unterminated replies cannot be pipelined,
+        #this is remembered for the connection.
+        ###############################################
+        if timeout is None:
+            timeout = self.timeout
+        replies = [None for cmd in cmds]
+        if not self.isFramed:
+            return replies
+        with self.lock:
+            self.connect()
+            self.__flush__()
+            for cmd in cmds:
+                self.sock.sendall(cmd.encode())
+            received = bytearray()
+            deadline = time.time()+timeout
+            while received.count(self.term) < len(cmds) and time.time() < deadline:
+                try:
+                    part = self.__receive__(deadline-time.time())
+                except ConnectionResetError:
+                    break
+                received += part
+                if len(part) == 0 or self.sock is None:
+                    break
+                if self.term not in part:
+                    self.isFramed = False
+                    break
+        framed = bytes(received).split(self.term)[:-1]
+        for ireply,reply in enumerate(framed[:len(cmds)]):
+            replies[ireply] = reply.decode()
+        return replies
+
+    def request(self,cmd,timeout=None):
+        ###############################################
+        #Send command and return reply. Stale connection
+        #is reopened and request repeated once.
+        ###############################################
+        if timeout is None:
+            timeout = self.timeout
+        with self.lock:
+            for iAttempt in range(2):
+                try:
+                    self.connect()
+                    self.__flush__()
+                    self.connect().sendall(cmd.encode())
+                    return self.__receive__(timeout).decode()
+                except ConnectionRefusedError:
+                    self.close()
+                    raise
+                except OSError:
+                    self.close()
+                    if iAttempt != 0:
+                        raise
+
+def connection(host,port,timeout=2.0):
+    ##############################################
+    #Return shared connection for given host/port
+    ##############################################
+    with connectionsLock:
+        if (host,port) not in connections:
+            connections[(host,port)] = SocketConnection(host,port,timeout=timeout)
+        return connections[(host,port)]
+
 class SocketConnector:
     def __init__(self,args):
         self.args = args
@@ -46,6 +226,11 @@ class SocketConnector:
 
         for dev in self.args.addSocket:
             if dev in _devs:
-                devs[dev] = { 'id' : _devs[dev]['id'], 'model' : _devs[dev]['model'], 'com' : { 'host' : _devs[dev]['host'], 'port' : _devs[dev]['port'] }}
+                if getattr(self.args,'simulate',None) is not None:
+                    _connection = Simulator.connection(_devs[dev]['id'])
+                else:
+                    _connection = connection(_devs[dev]['host'],_devs[dev]['port'])
+                devs[dev] = { 'id' : _devs[dev]['id'], 'model' : _devs[dev]['model'], 'com' : { 'host' : _devs[dev]['host'], 'port' : _devs[dev]['port'], 
+                                                                                               'connection' : _connection }}
         return devs
 
@@ -3,6 +3,7 @@
 import os, sys
 import time
 import datetime as dt
+from Transport import Transport
 
 ########################################################
 #----------------------COMMANDS------------------------#
@@ -73,6 +74,8 @@ pars = { 'minBias' : { 'par' : -100, 'vital' : True, 'alt' : "minV" },
          'tShort'  : { 'par' :  0.5, 'vital' : True, 'alt' : "" },                  #@Basic sleep time in seconds needed for proper running of device routines
          'tMedium' : { 'par' :  1.5, 'vital' : True, 'alt' : "" },                  #@Medium sleep time  
          'tLong'   : { 'par' :  3.0, 'vital' : True, 'alt' : "" },                  #@Long sleep time
+         'tTimeout'   : { 'par' : 2.0, 'vital' : False, 'alt' : "readTimeout" },    #@Default time in seconds to wait for reply terminator
+         'fixedSleep' : { 'par' : False, 'vital' : False, 'alt' : "" },             #@Use fixed sleeps around write/read instead of terminator-driven reads (fallback)
          'minSampleTime' : { 'par' : 0.50, 'vital' : False, 'alt' : "minSTime"},    #@Minimum sample time for a single IV measurement
          'maxNSamples'   : { 'par' : 8,    'vital' : False, 'alt' : "" },           #@Maximum number of samples per single IV measurement
          'fCurr'         : { 'par' : 'CURR', 'vital' : True, 'alt' : "" },          #@SENSE argument defining CurrentMeasurement function 
@@ -94,6 +97,7 @@ class TEMPLATE():
         self.sleep_time = 0.5
         self.medium_sleep_time = 1.5
         self.long_sleep_time = 3.0 
+        self.transport = Transport(self.test(),self.delim,'\n',pars['tTimeout']['par'],self.sleep_time,self.medium_sleep_time,pars['fixedSleep']['par'],cmds)
         now = dt.datetime.now()
         self.year = str(now.year)
         self.month = str(now.month)
@@ -143,22 +147,15 @@ class TEMPLATE():
         ############################################
         #Define device-specific 'write' routine here
         ############################################
-        time.sleep(self.sleep_time)
-        write_status = com.write((cmd+self.delim).encode())
+        write_status = self.transport.write(com,cmd)
         return write_status
 
     def read(self,com,cmd):
         ###########################################
         #Define device-specific 'read' routine here
         ###########################################
-        time.sleep(self.sleep_time)
-        com.write((cmd+self.delim).encode())
-        time.sleep(self.medium_sleep_time)
-        read_value = ""
-        while com.inWaiting() > 0:
-            part = com.read(1).decode().strip('\r')
-            read_value += part
-        return read_value.rstrip()
+        read_value = self.transport.query(com,cmd)
+        return read_value
 
     def pre(self,com):
         ####################################################
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+
+import os, sys
+import time
+import threading
+
+#Time spent in driver sleeps, accounted per thread (see Transport.sleep)
+clock = threading.local()
+
+class BufferedReader():
+    def __init__(self,com,term='\n',encoding="utf-8"):
+        ###########################################################
+        #Buffered reader for serial ports. Everything waiting in
+        #input buffer is drained in bulk into bytearray, decoded
+        #once and split on terminator. Residual bytes following
+        #the terminator are kept for the next line.
+        ###########################################################
+        self.com = com
+        self.term = term.encode(encoding)
+        self.encoding = encoding
+        self.buffer = bytearray()
+
+    def fill(self):
+        ##############################################
+        #Move all waiting bytes into buffer at once
+        ##############################################
+        nbytes = self.com.in_waiting
+        if nbytes > 0:
+            self.buffer += self.com.read(nbytes)
+        return nbytes
+
+    def reset(self):
+        ##############################################
+        #Forget residual bytes and flush input buffer
+        ##############################################
+        self.buffer.clear()
+        self.com.reset_input_buffer()
+
+    def readline(self,timeout=1.0):
+        ###############################################
+        #Return bytes up to and including terminator.
+        #Partial line is returned if timeout expires.
+        ###############################################
+        deadline = time.time()+timeout
+        while True:
+            index = self.buffer.find(self.term)
+            if index >= 0:
+                line = bytes(self.buffer[:index+len(self.term)])
+                del self.buffer[:index+len(self.term)]
+                return line
+            if self.fill() > 0:
+                continue
+            remaining = deadline-time.time()
+            if remaining <= 0:
+                break
+            #block until next byte arrives or timeout expires
+            previous = self.com.timeout
+            self.com.timeout = remaining
+            try:
+                part = self.com.read(1)
+            finally:
+                self.com.timeout = previous
+            if len(part) == 0:
+                break
+            self.buffer += part
+        line = bytes(self.buffer)
+        self.buffer.clear()
+        return line
+
+    def readbytes(self,nbytes,timeout=1.0):
+        ##############################################
+        #Return exactly nbytes unless timeout expires
+        ##############################################
+        deadline = time.time()+timeout
+        while len(self.buffer) < nbytes:
+            if self.fill() > 0:
+                continue
+            remaining = deadline-time.time()
+            if remaining <= 0:
+                break
+            previous = self.com.timeout
+            self.com.timeout = remaining
+            try:
+                part = self.com.read(nbytes-len(self.buffer))
+            finally:
+                self.com.timeout = previous
+            if len(part) == 0:
+                break
+            self.buffer += part
+        raw = bytes(self.buffer[:nbytes])
+        del self.buffer[:nbytes]
+        return raw
+
+    def drain(self):
+        ##############################################
+        #Return everything waiting as raw bytes
+        ##############################################
+        while self.fill() > 0:
+            pass
+        raw = bytes(self.buffer)
+        self.buffer.clear()
+        return raw
+
+    def lines(self):
+        ###############################################
+        #Drain buffer, decode once and split into lines
+        ###############################################
+        return self.drain().decode(self.encoding,errors="ignore").split(self.term.decode(self.encoding))
+
+class Transport():
+    def __init__(self,name="",delim='\n',term='\n',timeout=1.0,sleep_time=0.,medium_sleep_time=0.,fixedSleep=False,cmds={}):
+        ###########################################################
+        #Shared line transport used by device-specific classes.
+        #Replies are read until the line terminator 'term' arrives
+        #or per-command timeout expires. Fixed sleeps are applied
+        #only if 'fixedSleep' is requested (slow firmware fallback).
+        ###########################################################
+        self.name = name
+        self.delim = delim
+        self.term = term
+        self.timeout = timeout
+        self.sleep_time = sleep_time
+        self.medium_sleep_time = medium_sleep_time
+        self.fixedSleep = fixedSleep
+        self.readers = {}
+
+        #Per-command timeouts can be specified in cmds tables using 'timeout' key
+        self.timeouts = {}
+        for cat in cmds:
+            for cmd_type in cmds[cat]:
+                if 'timeout' in cmds[cat][cmd_type] and len(cmds[cat][cmd_type]['cmd'].strip()) != 0:
+                    self.timeouts[cmds[cat][cmd_type]['cmd'].strip()] = cmds[cat][cmd_type]['timeout']
+
+    @staticmethod
+    def sleep(seconds):
+        ##############################################
+        #Sleep and account time slept by this thread
+        ##############################################
+        start = time.time()
+        time.sleep(seconds)
+        clock.slept = getattr(clock,'slept',0.)+time.time()-start
+
+    @staticmethod
+    def slept():
+        ##############################################
+        #Total time slept in drivers by this thread
+        ##############################################
+        return getattr(clock,'slept',0.)
+
+    def timeoutFor(self,cmd):
+        ##############################################
+        #Return timeout in seconds for given raw command
+        ##############################################
+        for _cmd in self.timeouts:
+            if cmd.strip().startswith(_cmd):
+                return self.timeouts[_cmd]
+        return self.timeout
+
+    def reader(self,com,encoding="utf-8"):
+        ##############################################
+        #Return buffered reader attached to given port
+        ##############################################
+        if id(com) not in self.readers or self.readers[id(com)].com is not com:
+            self.readers[id(com)] = BufferedReader(com,self.term,encoding)
+        return self.readers[id(com)]
+
+    def pace(self,sleep_time=None):
+        #####################################################
+        #Sleep before command only if fixed sleeps are enabled
+        #####################################################
+        if self.fixedSleep:
+            if sleep_time is None:
+                sleep_time = self.sleep_time
+            Transport.sleep(sleep_time)
+
+    def setTimeout(self,com,timeout):
+        #########################################################
+        #Set com timeout in seconds and return the previous value.
+        #VISA resources use milliseconds, serial ports seconds.
+        #########################################################
+        if hasattr(com,'query'):
+            previous = com.timeout
+            com.timeout = int(timeout*1000) if timeout is not None else None
+            return previous/1000. if previous is not None else None
+        else:
+            previous = com.timeout
+            com.timeout = timeout
+            return previous
+
+    def decode(self,raw,encoding="utf-8"):
+        ###############################################
+        #Decode raw bytes, residual bits are not fatal
+        ###############################################
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            WARNING = '\033[93;1m'
+            ENDC    = '\033[0m'
+            print(WARNING+" "+(self.name+":").ljust(18)+" [WARNING]   Decoding error detected. Residual bits found in buffer."+ENDC)
+            return raw.decode(encoding,errors="ignore")
+
+    def joinCommands(self,raw_cmds):
+        #################################################
+        #Join SCPI commands into single program message.
+        #Every command is rooted (':') so that its header
+        #path does not depend on the previous command.
+        #################################################
+        parts = []
+        for raw_cmd in raw_cmds:
+            for _cmd in raw_cmd.split(";"):
+                _cmd = _cmd.strip()
+                if len(_cmd) == 0:
+                    continue
+                if not _cmd.startswith("*") and not _cmd.startswith(":"):
+                    _cmd = ":"+_cmd
+                parts.append(_cmd)
+        return ";".join(parts)
+
+    def write(self,com,cmd,encoding="utf-8"):
+        ##############################################
+        #Write single command followed by delimiter
+        ##############################################
+        self.pace()
+        if cmd.endswith(self.delim):
+            return com.write(cmd.encode(encoding))
+        return com.write((cmd+self.delim).encode(encoding))
+
+    def readline(self,com,timeout=None,encoding="utf-8"):
+        ###############################################
+        #Read single reply line ended by terminator.
+        #Returns whatever arrived if timeout expires.
+        ###############################################
+        if timeout is None:
+            timeout = self.timeout
+        raw = self.reader(com,encoding).readline(timeout)
+        return self.decode(raw,encoding)
+
+    def drain(self,com,encoding="utf-8"):
+        ##############################################
+        #Read everything currently waiting in buffer
+        ##############################################
+        return self.decode(self.reader(com,encoding).drain(),encoding)
+
+    def query(self,com,cmd,lines=1,encoding="utf-8",timeout=None):
+        ##################################################
+        #Write command and return reply line(s). In fixed
+        #sleep mode wait and drain buffer as before.
+        ##################################################
+        if timeout is None:
+            timeout = self.timeoutFor(cmd)
+        if self.fixedSleep:
+            self.pace()
+            com.write((cmd+self.delim).encode(encoding))
+            Transport.sleep(self.medium_sleep_time)
+            read_value = self.drain(com,encoding)
+        else:
+            self.reader(com,encoding).reset()
+            com.write((cmd+self.delim).encode(encoding))
+            read_value = ""
+            for iline in range(max(lines,1)):
+                read_value += self.readline(com,timeout,encoding)
+        return read_value.replace('\r','').strip()
@@ -237,6 +237,8 @@ if __name__ == '__main__':
     parser.add_argument('--sampleTime', type=arg_list, dest='sampleTime', metavar='<sample_time>', help='Sample time for each range point.', action='store', default=[0.50])
     parser.add_argument('--nSamples', type=arg_list, dest='nSamples', metavar='<n_samples>', help='Number of samples for each range point.', action='store', default=[10])
     parser.add_argument('--debug'      , dest='debug'         , help='Bypass several options.',                  action='store_true',            default=False )
+    parser.add_argument('--simulate'   , dest='simulate', nargs='?', const="", metavar='<sim_config>', help='Use software instrument simulator instead of hardware. Optional JSON file overrides simulator settings.', action='store', default=None)
+    parser.add_argument('--trace'      , dest='trace', nargs='?', const="", metavar='<trace_file>', help='Trace latency of every instrument command and print summary at the end. Optional file receives Chrome-trace (Perfetto) JSON.', action='store', default=None)
 
     #add immediate one-go functions
     immGroup.add_argument('--term'      , dest='terminate'         , help='Immediately terminate all devices.',                       action='store_true',            default=False )
@@ -460,7 +462,9 @@ if __name__ == '__main__':
         #-----------------------------------------------------------------
         try:
             if not args.isEnviroOnly:
-                dev.load(COMS,SOCKETS,EMG)                   
+                attempt = dev.load(COMS,SOCKETS,EMG)                   
+                if "success" in attempt.keys():
+                    connectorSerial.remember_RS232(COMS,dev.realIds)
             else:
                 if len(args.addPort) == 0:
                     dev.load_socket(SOCKETS,EMG)
@@ -488,6 +492,7 @@ if __name__ == '__main__':
             attempt = dev.load(COMS,SOCKETS,EMG,iAttempt)
             if "success" in attempt.keys():
                 allMatched = True
+                connectorSerial.remember_RS232(COMS,dev.realIds)
             else:
                 for key in attempt.keys():
                     _port,valid = attempt[key]
@@ -531,6 +536,7 @@ if __name__ == '__main__':
                 attempt = dev.load_serial(COMS, EMG) 
                 if "success" in attempt.keys():
                     allMatched = True
+                    connectorSerial.remember_RS232(COMS,dev.realIds)
                 else:
                     for key in attempt.keys():
                         _port,valid = attempt[key]
@@ -560,6 +566,7 @@ if __name__ == '__main__':
     #------------------------------------
     if isOut:
         outputHandler = OutputHandler.OutputHandler(args)
+        dev.resultStream = outputHandler.point
 
     #-------------------------
     #All device test status
@@ -594,13 +601,12 @@ if __name__ == '__main__':
                     dev.abort()
                     dev.terminate()
         elif "cont" in sequence[0]['type']:
-            #Keyboard interruption handled internally
+            #Keyboard interruption handled internally, samples are streamed to output
+            if isOut:
+                outputHandler.begin(0,sequence[0]['type'])
             _result = dev.contENV(str(sequence[0]['subtype']),sequence[0]['timeStep'],sequence[0]['nSteps'],isLast=True,isFirst=True)
             dev.finalize()
             if isOut:
-                _results = { 'type' : sequence[0]['type'], 'data' : [], 'enviro' : [] }
-                _results['enviro'] = _result
-                outputHandler.load(0,_results)
                 outputHandler.save() 
         sys.exit(0)
 
@@ -690,7 +696,7 @@ if __name__ == '__main__':
         isLast = (iseq == len(sequence)-1 or not isIV())
         isFirst = (iseq == 0) 
         if 'singleIV' in seq['type']:
-            _results = { 'type' : seq['type'], 'data' : [], 'enviro' : []}
+            _results = { 'type' : seq['type'], 'data' : [], 'enviro' : [], 'stats' : []}
             if 'bias' in seq and abs(seq['bias'][0]) > 0.:
                 try:
                     current, bias, enviro = dev.singleIV(biasPoint=seq['bias'][0],sampleTime=seq['sampleTime'][0],nSamples=seq['nSamples'][0],isLast=isLast,isFirst=isFirst)
@@ -702,6 +708,7 @@ if __name__ == '__main__':
                 if bias != None:
                     _results['data'].append((current,bias))
                     _results['enviro'].append(enviro)
+                    _results['stats'].append(dev.lastStats)
                     if isOut:
                         outputHandler.load(iseq,_results)    
                     if args.verbosity > 1:
@@ -716,6 +723,9 @@ if __name__ == '__main__':
                 log("i","Bias voltage = 0 V. Doing nothing...")
         elif 'contIV' in seq['type']:
             if  'bias' in seq:
+                if isOut:
+                    #bias points are streamed to output
+                    outputHandler.begin(iseq,seq['type'])
                 if 'waitingTime' in seq.keys() and int(seq['waitingTime']) != 0:
                     try:
                         _results = dev.standbyIV(biasPoint=seq['bias'][0],sampleTime=seq['sampleTime'][0],nSamples=seq['nSamples'][0],waitingTime=seq['waitingTime'],isLast=isLast,isFirst=isFirst)
@@ -736,8 +746,7 @@ if __name__ == '__main__':
                     log("i","#"+str(iseq)+" RESULTS CONTINUOUS:")
                     log("i","-----------------")
                     if isOut:
-                        _results['type'] = seq['type']
-                        outputHandler.load(iseq,_results)
+                        outputHandler.end()
                     for imeas, (current, bias) in enumerate(_results['data']):
                         if current is None or bias is None:
                             log("f","Measurement failed but should not reach this point.")
@@ -754,6 +763,9 @@ if __name__ == '__main__':
 
         elif 'multiIV' in seq['type']:
             if  'bias' in seq:
+                if isOut:
+                    #bias points are streamed to output
+                    outputHandler.begin(iseq,seq['type'])
                 try:
                     _results = dev.multiIV(biasRange=seq['bias'],sampleTime=seq['sampleTime'],nSamples=seq['nSamples'],isLast=isLast,isFirst=isFirst)
                 except KeyboardInterrupt:
@@ -765,8 +777,7 @@ if __name__ == '__main__':
                     log("i","#"+str(irep)+" RESULTS MULTIPLE POINT:")
                     log("i","-----------------")
                     if isOut:
-                        _results['type'] = seq['type']
-                        outputHandler.load(iseq,_results)
+                        outputHandler.end()
                     for imeas, (current, bias) in enumerate(_results['data']):
                         if current is None or bias is None:
                             log("f","Measurement failed but should not reach this point.")
@@ -800,16 +811,18 @@ if __name__ == '__main__':
 
         elif 'standbyZ' in seq['type']: 
             _results = { 'type' : seq['type'], 'data' : [], 'enviro' : [] }
+            if isOut:
+                #enviro samples are streamed to output
+                outputHandler.begin(iseq,seq['type'])
             try:
                 _results['enviro'] = dev.standbyZ(waitingTime=int(seq['waitingTime']),isLast=isLast,isFirst=isFirst) 
             except KeyboardInterrupt:
                 with warden.DelayedKeyboardInterrupt(force=False, logfile=args.logname):
-                    log("w","Keyboard interruption during standby mode detected! Results will not be saved!") 
+                    log("w","Keyboard interruption during standby mode detected!"+(" Samples taken so far are kept in output." if isOut else "")) 
                     dev.abort()
                     dev.terminate()
-            if len(_results['enviro']) > 0:
-                if isOut:
-                    outputHandler.load(iseq,_results)
+            if isOut:
+                outputHandler.end()
             
 
     #-------------------------------------
@@ -0,0 +1,50 @@
+import os,sys
+import argparse
+
+import pytest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","source"))
+import Simulator
+
+@pytest.fixture(autouse=True)
+def simulator():
+    ##############################################
+    #Fresh simulated instruments for every test
+    ##############################################
+    Simulator.reset()
+    yield Simulator
+    Simulator.reset()
+
+@pytest.fixture
+def serialPort(simulator):
+    ##############################################
+    #Return simulated serial port of given device
+    ##############################################
+    def openPort(dev_id,baudrate=9600):
+        return Simulator.openPort({ 'id' : dev_id, 'port' : "SIM::"+dev_id, 'visa' : False, 'baudrate' : baudrate })
+    return openPort
+
+@pytest.fixture
+def args(simulator,tmp_path):
+    ##############################################
+    #Arguments as prepared by mkMeasure for single
+    #IV measurement on simulated instruments
+    ##############################################
+    return argparse.Namespace(logname="pytest",verbosity=0,debug=False,simulate="",
+                              selectPort=False,extVSource=False,addPort=[],addSocket=[],
+                              isEnviroOnly=False,isStandByZOnly=False,probeFast=False,
+                              autoRange=False,autoSensing=False,expOhm=[1e9],isDB=False,
+                              outputDir=str(tmp_path),outputFile="singleIV",outTXT=True,outJSON=True,outCSV=True,
+                              outXML=False,outROOT=False,outPNG=False,outPDF=False)
+
+@pytest.fixture
+def device(args):
+    ##############################################
+    #Device connected to simulated instruments
+    ##############################################
+    import SerialConnector, SocketConnector, Device
+    coms = SerialConnector.SerialConnector(args).connect_RS232()
+    socks = SocketConnector.SocketConnector(args).gateway()
+    dev = Device.Device(args)
+    dev.load(coms,socks,False)
+    return dev
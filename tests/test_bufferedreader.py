@@ -0,0 +1,65 @@
+from Transport import BufferedReader
+
+class FakeSerial():
+    ##############################################
+    #In-memory port delivering given chunks, one
+    #chunk becomes waiting per read call
+    ##############################################
+    def __init__(self,chunks):
+        self.chunks = [chunk.encode() for chunk in chunks]
+        self.waiting = bytearray()
+        self.timeout = 1
+        self.nReads = 0
+
+    @property
+    def in_waiting(self):
+        if len(self.waiting) == 0 and len(self.chunks) != 0:
+            self.waiting += self.chunks.pop(0)
+        return len(self.waiting)
+
+    def read(self,size=1):
+        self.nReads += 1
+        self.in_waiting
+        data = bytes(self.waiting[:size])
+        del self.waiting[:size]
+        return data
+
+    def reset_input_buffer(self):
+        self.waiting.clear()
+        self.chunks = []
+
+def test_readline_splits_lines_and_keeps_residual():
+    reader = BufferedReader(FakeSerial(["first\r\nsec","ond\r\nthi"]),'\n')
+    assert reader.readline(0.1) == b"first\r\n"
+    assert reader.readline(0.1) == b"second\r\n"
+    #partial line is returned when timeout expires
+    assert reader.readline(0.05) == b"thi"
+    assert reader.readline(0.05) == b""
+
+def test_readline_drains_in_bulk():
+    com = FakeSerial([",".join(["+1.0E-09"]*500)+"\n"])
+    reader = BufferedReader(com,'\n')
+    assert reader.readline(0.1).count(b",") == 499
+    assert com.nReads == 1
+
+def test_multi_character_terminator():
+    reader = BufferedReader(FakeSerial(["a\rb\r\nc\r\n"]),'\r\n')
+    assert reader.readline(0.1) == b"a\rb\r\n"
+    assert reader.readline(0.1) == b"c\r\n"
+
+def test_readbytes_and_reset():
+    reader = BufferedReader(FakeSerial(["#205abcde","rest\n"]),'\n')
+    assert reader.readbytes(4,0.1) == b"#205"
+    assert reader.readbytes(5,0.1) == b"abcde"
+    reader.reset()
+    assert reader.readline(0.05) == b""
+
+def test_lines_decodes_once():
+    reader = BufferedReader(FakeSerial(["one\ntwo\n","three"]),'\n')
+    assert reader.lines() == ["one","two","three"]
+
+def test_readline_against_simulated_port(serialPort):
+    com = serialPort("ESP100")
+    reader = BufferedReader(com,'\r\n')
+    com.write(b"1TP\r\n")
+    assert reader.readline(1.).replace(b"\r",b"").strip() != b""
@@ -0,0 +1,50 @@
+import pytest
+
+import NHQ201
+
+@pytest.fixture(autouse=True)
+def lineModes(monkeypatch):
+    ##############################################
+    #Line-mode detection is cached per port
+    ##############################################
+    monkeypatch.setattr(NHQ201,"lineModes",{})
+    return NHQ201.lineModes
+
+def droppingPort(serialPort,port):
+    ##############################################
+    #Firmware dropping second char of whole lines
+    ##############################################
+    com = serialPort(port)
+    write = com.write
+    com.write = lambda data: write(data[:1]+data[2:] if len(data) > 3 else data)
+    return com
+
+def test_line_mode_detected_once(serialPort,lineModes):
+    device = NHQ201.NHQ201()
+    com = serialPort("NHQ201")
+    assert device.lineMode(com)
+    assert device.write(com,"D1=100") == "D1=100"
+    assert NHQ201.Readout.toFloat(device.read(com,"D1")) == 100.
+    assert list(lineModes.values()) == [True]
+
+def test_dropped_chars_fall_back_to_char_mode(serialPort):
+    device = NHQ201.NHQ201()
+    com = droppingPort(serialPort,"NHQ201")
+    assert not device.lineMode(com)
+    assert device.write(com,"D1=100") == "D1=100"
+    assert NHQ201.Readout.toFloat(device.read(com,"D1")) == 100.
+
+def test_line_write_disabled(serialPort,monkeypatch):
+    monkeypatch.setitem(NHQ201.pars['lineWrite'],'par',False)
+    device = NHQ201.NHQ201()
+    assert not device.lineMode(serialPort("NHQ201"))
+
+def test_garbled_setpoint_is_verified(serialPort,lineModes,capsys):
+    device = NHQ201.NHQ201()
+    com = droppingPort(serialPort,"NHQ201")
+    #detection missed dropping firmware
+    lineModes[com.port] = True
+    assert device.write(com,"D1=100") == "D1=100"
+    assert "Resending" in capsys.readouterr().out
+    assert lineModes[com.port] is False
+    assert NHQ201.Readout.toFloat(device.read(com,"D1")) == 100.
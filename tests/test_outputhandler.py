@@ -0,0 +1,71 @@
+import csv
+import json
+import sys
+import types
+
+import pytest
+
+@pytest.fixture
+def handler(args,tmp_path,monkeypatch):
+    ##############################################
+    #OutputHandler writing to temporary directory,
+    #OutputPlotter (pandas, matplotlib) is stubbed
+    ##############################################
+    monkeypatch.setitem(sys.modules,"OutputPlotter",types.ModuleType("OutputPlotter"))
+    monkeypatch.delitem(sys.modules,"OutputHandler",raising=False)
+    import OutputHandler
+    args.outputDir = str(tmp_path/"results")
+    handler = OutputHandler.OutputHandler(args)
+    yield handler
+    handler.finalize(True)
+
+enviro = { 'temp1' : 21.5, 'temp2' : 22., 'temp3' : 20.5, 'humi' : 30., 'lumi' : 0. }
+
+def readLines(handler,ext):
+    with open(handler.fileNames[ext]) as f:
+        return f.read().splitlines()
+
+def test_points_are_streamed(handler):
+    handler.begin(0,"contIV")
+    handler.point(enviro,(-1e-9,-10),{ 'std' : 1e-11, 'n_kept' : 5 })
+    #point is on disk before measurement ends
+    assert readLines(handler,"jsonl") == [json.dumps({ 'type' : "contIV", 'irep' : 0, 'bias' : -10, 'curr' : -1e-9, 'std' : 1e-11, 'nkept' : 5,
+                                                      'tmp1' : 21.5, 'tmp2' : 22., 'tmp3' : 20.5, 'humi' : 30., 'lumi' : 0. })]
+    assert readLines(handler,"txt")[-1].split() == ["-10","-1e-09","21.5","22.0","20.5","30.0","0.0"]
+    #current in nA, made positive for negative bias
+    with open(handler.fileNames['csv']) as f:
+        assert list(csv.reader(f))[-1] == ["-10","1.0","21.5","22.0","20.5","30.0","0.0"]
+
+def test_finalize_builds_json_index(handler):
+    handler.load(0,{ 'type' : "singleIV", 'data' : [(-1e-9,-10)], 'enviro' : [enviro], 'stats' : [{ 'std' : 1e-11, 'n_kept' : 5 }] })
+    handler.begin(1,"contIV")
+    handler.point(enviro,(-1e-9,-10))
+    handler.point(enviro,(-2e-9,-20))
+    jsonFile = handler.finalize()
+    with open(jsonFile) as f:
+        results = json.load(f)
+    assert results['singleIV'][0]['std'] == [1e-11]
+    assert results['contIV'][0]['curr'] == [-1e-9,-2e-9]
+    assert results['contIV'][0]['bias'] == [-10,-20]
+    #missing statistics are dropped, not misaligned
+    assert 'std' not in results['contIV'][0]
+    assert handler.finalize() is None
+
+def test_quiet_finalize_keeps_cut_stream(handler,capsys):
+    handler.begin(0,"contIV")
+    handler.point(enviro,(-1e-9,-10))
+    #line cut by emergency exit
+    handler.files['jsonl'].write("{\"type\" : \"con")
+    jsonFile = handler.finalize(True)
+    assert "Saving" not in capsys.readouterr().out
+    with open(jsonFile) as f:
+        assert json.load(f)['contIV'][0]['curr'] == [-1e-9]
+
+def test_device_streams_points(device,handler):
+    device.resultStream = handler.point
+    handler.begin(0,"contIV")
+    results = device.continuousIV([-10,-20],[0.5],[5],isLast=True,isFirst=True)
+    assert len(readLines(handler,"jsonl")) == len(results['data']) == 2
+    handler.end()
+    txtLines = readLines(handler,"txt")
+    assert len(txtLines)-txtLines.index("**********#0 contIV**********") == 4
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+import PortCache
+
+@pytest.fixture
+def portCache(tmp_path,monkeypatch):
+    ##############################################
+    #Cache kept in temporary directory
+    ##############################################
+    cache = PortCache.PortCache()
+    monkeypatch.setattr(cache,"cacheDir",str(tmp_path/"cache"))
+    monkeypatch.setattr(cache,"cacheFile",str(tmp_path/"cache"/"portCache.json"))
+    cache.cache = {}
+    return cache
+
+visaPort = "USB0::0x05E6::0x2470::04512345::INSTR"
+
+def test_identity_of_visa_resource(portCache):
+    assert portCache.identity(visaPort) == "0x05E6::0x2470::04512345"
+    assert portCache.identity("ASRL1::INSTR") is None
+
+def test_identity_of_onboard_and_simulated_ports(portCache):
+    assert portCache.identity("/dev/ttyS0") == "/dev/ttyS0"
+    assert portCache.identity("SIM::KEITHLEY") is None
+    assert portCache.identity("/dev/notThere") is None
+
+def test_store_and_lookup(portCache):
+    assert portCache.store("meas","KEITHLEY","2470",visaPort,"KEITHLEY,MODEL 2470")
+    ports = ["/dev/ttyS0","USB0::0x05E6::0x2470::04512345::INSTR"]
+    assert portCache.lookup("meas","KEITHLEY","2470",ports) == visaPort
+    #different device or model configured for same type
+    assert portCache.lookup("meas","NEWKEITHLEY","2470",ports) is None
+    assert portCache.lookup("meas","KEITHLEY","6517A",ports) is None
+    #port no longer present
+    assert portCache.lookup("meas","KEITHLEY","2470",["/dev/ttyS0"]) is None
+    assert portCache.lookup("hv","KEITHLEY","2470",ports) is None
+
+def test_store_skips_port_without_identity(portCache):
+    assert not portCache.store("meas","KEITHLEY","6517A","SIM::KEITHLEY")
+    assert portCache.cache == {}
+
+def test_save_and_load(portCache):
+    portCache.store("meas","KEITHLEY","2470",visaPort)
+    assert portCache.save()
+    with open(portCache.cacheFile) as f:
+        assert json.load(f)['meas']['identity'] == "0x05E6::0x2470::04512345"
+    portCache.cache = {}
+    assert portCache.load()['meas']['port'] == visaPort
+
+def test_broken_cache_is_ignored(portCache):
+    portCache.save()
+    with open(portCache.cacheFile,"w") as f:
+        f.write("{broken")
+    assert portCache.load() == {}
@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+
+import Readout
+from Transport import Transport
+
+def test_parse_with_identifier():
+    values,nInvalid = Readout.parse("+1.0E-09NADC,+0.5secs,+1RDNG#,-2.5E-09NADC,+1.0secs,+2RDNG#",",","NADC")
+    assert values.tolist() == [1e-9,-2.5e-9]
+    assert nInvalid == 0
+
+def test_parse_counts_invalid_readings():
+    values,nInvalid = Readout.parse("1e-9,OVERFLOW,,3e-9")
+    assert values.tolist() == [1e-9,3e-9]
+    assert nInvalid == 2
+
+def test_parse_takes_binary_array():
+    values,nInvalid = Readout.parse(np.array([1.,2.],dtype=np.float32))
+    assert values.dtype == np.float64
+    assert values.tolist() == [1.,2.]
+
+def test_parse_simulated_buffer(serialPort):
+    transport = Transport("KEITHLEY",'\n','\n',1.0)
+    com = serialPort("KEITHLEY")
+    transport.write(com,"TRAC:CLE;:INIT:CONT ON")
+    time.sleep(0.3)
+    readout = transport.query(com,"TRAC:DATA?")
+    values,nInvalid = Readout.parse(readout,",","NADC")
+    assert values.size == readout.count("NADC") > 0
+    assert nInvalid == 0
+
+def test_to_float():
+    assert Readout.toFloat(" 1.5E-3\r") == 1.5e-3
+    assert Readout.toFloat("-01234-01") == -123.4
+    assert Readout.toFloat("+10000-02") == 100.
+    assert Readout.toFloat("ON") is None
+    assert Readout.toFloat("") is None
+
+def test_statistics():
+    stats = Readout.statistics([1.,2.,3.,4.])
+    assert stats['mean'] == 2.5
+    assert stats['median'] == 2.5
+    assert stats['std'] == np.std([1.,2.,3.,4.],ddof=1)
+    assert stats['n'] == stats['n_kept'] == 4
+
+def test_statistics_masks_outliers():
+    stats = Readout.statistics([1.,1.1,0.9,10.],sigma=1.)
+    assert stats['mask'].tolist() == [True,True,True,False]
+    assert stats['n_kept'] == 3
+    assert abs(stats['mean']-1.) < 1e-12
+    assert Readout.summary(stats) == { 'std' : stats['std'], 'median' : stats['median'], 'n_kept' : 3 }
+
+def test_statistics_keeps_all_if_none_survive():
+    stats = Readout.statistics([-1.,1.],sigma=0.5)
+    assert stats['n_kept'] == 2
+    assert stats['mean'] == 0.
+
+def test_statistics_of_empty_and_single():
+    assert Readout.statistics([])['mean'] is None
+    assert Readout.statistics([5.])['std'] == 0.
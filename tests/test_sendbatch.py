@@ -0,0 +1,44 @@
+import pytest
+
+import Simulator
+
+@pytest.fixture
+def sent(device):
+    ##############################################
+    #Lines received by simulated meter
+    ##############################################
+    lines = []
+    sim = Simulator.instrument(device.coms['meas']['id'])
+    handle = sim.handle
+    def record(line,*args):
+        lines.append(line)
+        return handle(line,*args)
+    sim.handle = record
+    return lines
+
+def sendBatch(device,cmds):
+    with device.__batch__('meas'):
+        for cmd in cmds:
+            device.__write__(cmd)
+
+def test_clean_batch_single_transfer_and_status_check(device,sent):
+    com = device.coms['meas']
+    sendBatch(device,[device.__cmd__(com,"SCURRLIM",arg="1e-5"),device.__cmd__(com,"CLRBUFF")])
+    assert sent == ["*CLS;:SOUR:VOLT:ILIM 1e-5;:TRAC:CLE;*WAI","*ESR?"]
+
+def test_stale_error_is_cleared(device,sent):
+    com = device.coms['meas']
+    Simulator.instrument(com['id']).error(-113,"Undefined header")
+    sendBatch(device,[device.__cmd__(com,"SCURRLIM",arg="1e-5"),device.__cmd__(com,"CLRBUFF")])
+    assert "SYST:ERR?" not in sent
+
+def test_failed_batch_resends_set_commands_only(device,sent):
+    com = device.coms['meas']
+    bogus = dict(device.__cmd__(com,"SCURRLIM",arg="1e-5"))
+    bogus['cmd'] = "BOGUS 1"
+    clear = device.__cmd__(com,"CLRBUFF")
+    sendBatch(device,[bogus,clear])
+    assert sent[:2] == ["*CLS;:BOGUS 1;:TRAC:CLE;*WAI","*ESR?"]
+    resent = [line for line in sent[2:] if line != "SYST:ERR?"]
+    assert resent == ["BOGUS 1"]
+    assert clear['cmd'] not in resent
@@ -0,0 +1,42 @@
+import time
+
+from Transport import Transport
+
+cmds = { 'get' : { 'ID'      : { 'cmd' : "*IDN?", 'vital' : True },
+                   'READOUT' : { 'cmd' : "TRAC:DATA?", 'vital' : True, 'timeout' : 10.0 } } }
+
+def test_query_returns_reply_line(serialPort):
+    transport = Transport("KEITHLEY",'\n','\n',1.0,cmds=cmds)
+    com = serialPort("KEITHLEY")
+    assert transport.query(com,"*IDN?") == "KEITHLEY INSTRUMENTS INC.,MODEL 6517A,1234567,A13/700X"
+
+def test_query_does_not_take_stale_reply(serialPort):
+    transport = Transport("KEITHLEY",'\n','\n',1.0,cmds=cmds)
+    com = serialPort("KEITHLEY")
+    com.write(b"*IDN?\n")
+    time.sleep(0.2)
+    #unread reply of previous command is flushed before next query
+    assert transport.query(com,"SYST:ERR?") == "0,\"No error\""
+
+def test_query_waits_for_terminator_not_sleep(serialPort):
+    transport = Transport("KEITHLEY",'\n','\n',1.0,sleep_time=0.5,medium_sleep_time=1.5,cmds=cmds)
+    com = serialPort("KEITHLEY")
+    start = time.time()
+    transport.query(com,"*IDN?")
+    assert time.time()-start < 0.5
+
+def test_fixed_sleep_fallback(serialPort):
+    transport = Transport("KEITHLEY",'\n','\n',1.0,sleep_time=0.01,medium_sleep_time=0.2,fixedSleep=True,cmds=cmds)
+    com = serialPort("KEITHLEY")
+    slept = Transport.slept()
+    assert transport.query(com,"*IDN?").startswith("KEITHLEY")
+    assert Transport.slept()-slept >= 0.2
+
+def test_timeout_per_command():
+    transport = Transport("KEITHLEY",'\n','\n',1.0,cmds=cmds)
+    assert transport.timeoutFor("TRAC:DATA? 1, 10") == 10.0
+    assert transport.timeoutFor("*IDN?") == 1.0
+
+def test_join_commands_roots_headers():
+    transport = Transport()
+    assert transport.joinCommands(["SOUR:VOLT 10","TRAC:CLE;*WAI",":INIT",""]) == ":SOUR:VOLT 10;:TRAC:CLE;*WAI;:INIT"